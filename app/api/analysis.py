@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Response
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 from ..models import User, FinancialReport
-from ..database import get_db
-from ..services.math_engine import FinancialAnalyzer, AnalysisResultSchema
+from ..database import get_read_db
+from ..schemas import (BatchAnalysisRequest, BatchAnalysisResponse, TrendResponse, ScreenRequest, ScreenResponse,
+                       ScenarioRequest, ScenarioResponse)
+from ..services.math_engine import (PartialAnalysisResultSchema, BatchFinancialAnalyzer, ANALYZER_VERSION,
+                                    resolve_fields, evaluate_metrics, select_fields,
+                                    TrendAnalyzer, LINE_ITEM_COLUMNS, ScenarioAnalyzer)
+from ..services.analysis_store import load_analyzer_inputs, load_report_analysis, load_report_version, current_analysis
+from ..services.http_cache import cache_headers, etag_matches, not_modified, report_etag
+from ..services.line_items import analyzer_inputs, line_item_values
+from ..services.peer_sketch import peer_percentiles
+from ..services.screening import screen_reports, ScreenExpressionError
 from .auth import get_current_user
 
 
@@ -15,34 +23,199 @@ router = APIRouter(
 )
 
 @router.get("/{report_id}/json", 
-            response_model=AnalysisResultSchema, 
+            response_model=PartialAnalysisResultSchema,
+            response_model_exclude_unset=True,
             status_code=status.HTTP_200_OK
 )
 async def analyze_report(
+    response: Response,
     report_id: int = Path(gt=0),
-    db: AsyncSession = Depends(get_db),
+    fields: str | None = Query(None, description="Например: liquidity.current_ratio,bankruptcy_altman.score"),
+    percentiles: bool = Query(False, description="Добавить процентили показателей среди отчетов того же периода"),
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
+    """
+    Результат берется из report_analysis; если его нет или он устарел, считается без сохранения.
+    С fields отдаются только эти поля (можно указать целую группу, например liquidity);
+    если сохраненного результата нет, считаются только они по line_items из того же запроса.
+    С percentiles=true добавляется блок percentiles из скетчей peer_sketches.
+    Ответ без percentiles отдается с ETag; при совпадении If-None-Match - 304 после
+    одного запроса версии отчета (процентили зависят от других отчетов, их не кэшируем).
+    """
     if current_user is None:
          raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication Failed")
 
-    stmt = select(FinancialReport)\
-        .options(
-            selectinload(FinancialReport.assets),
-            selectinload(FinancialReport.liabilities),
-            selectinload(FinancialReport.profit_loss)
-        )\
-        .where(FinancialReport.id == report_id)
-        
-    result = await db.execute(stmt)
-    report: FinancialReport | None = result.scalar_one_or_none()
-
-    if report is None:
+    selected = None
+    if fields is not None:
+        try:
+            selected = resolve_fields([f.strip() for f in fields.split(",") if f.strip()])
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if if_none_match and not percentiles:
+        head = await load_report_version(db, report_id)
+        if head is None:
+            raise HTTPException(status_code=404, detail="Report not found")
+        if head.user_id != current_user.id and current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Not authorized")
+
+        etag = _analysis_etag(report_id, head.version, selected)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+    row = await load_report_analysis(db, report_id, line_items=selected is not None)
+
+    if row is None:
         raise HTTPException(status_code=404, detail="Report not found")
 
-    if report.user_id != current_user.id and current_user.role != "admin": # type: ignore
+    if row.user_id != current_user.id and current_user.role != "admin": # type: ignore
         raise HTTPException(status_code=403, detail="Not authorized")
 
+    if selected is None:
+        result = await current_analysis(db, row)
+    elif row.result is not None and row.analyzer_version == ANALYZER_VERSION:
+        result = select_fields(row.result, selected)
+    else:
+        result = evaluate_metrics(selected, analyzer_inputs(row.line_items))
+
+    if percentiles:
+        result = {**result, "percentiles": await peer_percentiles(db, row.period, result)}
+    else:
+        response.headers.update(cache_headers(_analysis_etag(report_id, row.version, selected)))
+    return result
+
+
+def _analysis_etag(report_id: int, version: int, selected: list[str] | None) -> str:
+    return report_etag("analysis", report_id, version, ANALYZER_VERSION,
+                       variant=None if selected is None else ",".join(sorted(selected)))
+
+
+@router.post("/{report_id}/scenarios",
+             response_model=ScenarioResponse,
+             status_code=status.HTTP_200_OK
+)
+async def report_scenarios(
+    request: ScenarioRequest,
+    report_id: int = Path(gt=0),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Сценарный анализ Альтмана и Таффлера: распределения оценок по случайным
+    изменениям входов (Monte Carlo), вероятности выводов и торнадо-чувствительность.
+    """
+    row = await load_report_analysis(db, report_id, line_items=True)
+
+    if row is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    if row.user_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    analyzer = ScenarioAnalyzer(analyzer_inputs(row.line_items))
+    try:
+        distributions = analyzer.simulate(request.perturbations, request.scenarios, request.seed)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    sensitivity = analyzer.sensitivities(request.sensitivity_shock)
+
+    return ScenarioResponse(
+        report_id=report_id,
+        scenarios=request.scenarios,
+        sensitivity_shock=request.sensitivity_shock,
+        altman_sensitivity=sensitivity["altman"],
+        taffler_sensitivity=sensitivity["taffler"],
+        **distributions
+    )
+
+
+@router.get("/trend",
+            response_model=TrendResponse,
+            status_code=status.HTTP_200_OK
+)
+async def organization_trend(
+    organization: str = Query(min_length=1),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Динамика всех строк отчетности организации по периодам:
+    изменения к предыдущему периоду и CAGR, по одному ряду на показатель.
+    Все отчеты организации читаются одним запросом.
+    """
+    stmt = select(FinancialReport.id, FinancialReport.period, FinancialReport.line_items)\
+        .where(FinancialReport.organization_name == organization)\
+        .order_by(FinancialReport.id)
+    if current_user.role != "admin":
+        stmt = stmt.where(FinancialReport.user_id == current_user.id)
+
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Reports not found")
+
+    analyzer = TrendAnalyzer.from_rows(
+        [(row[0], row[1], *line_item_values(row[2])) for row in rows], list(LINE_ITEM_COLUMNS)
+    )
+    return TrendResponse(organization=organization, **analyzer.get_trend())
+
+
+@router.post("/screen",
+             response_model=ScreenResponse,
+             status_code=status.HTTP_200_OK
+)
+async def screen_reports_endpoint(
+    request: ScreenRequest,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Отбор отчетов по условию на показатели, например
+    "bankruptcy_altman.score < 1.23 and liquidity.current_ratio < 1 or bankruptcy_taffler.score < 0.2".
+    Условие выполняется в БД по индексированным колонкам report_analysis (METRIC_COLUMNS):
+    коэффициенты ликвидности, рентабельности, оборачиваемости и bankruptcy_{модель}.score
+    для каждой модели реестра SCORING_MODELS.
+    """
+    try:
+        items, next_after_id = await screen_reports(
+            db,
+            request.filter,
+            limit=request.limit,
+            after_id=request.after_id,
+            user_id=None if current_user.role == "admin" else current_user.id,
+            fields=request.fields
+        )
+    except ScreenExpressionError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return ScreenResponse(items=items, next_after_id=next_after_id)
+
+
+@router.post("/batch",
+             response_model=BatchAnalysisResponse,
+             status_code=status.HTTP_200_OK
+)
+async def analyze_reports_batch(
+    request: BatchAnalysisRequest,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Анализ многих отчетов за раз. Нужные колонки выбираются одним запросом
+    (без загрузки ORM-объектов) и считаются векторно в BatchFinancialAnalyzer.
+    """
+    report_ids = list(dict.fromkeys(request.report_ids))
+
+    rows_by_id = await load_analyzer_inputs(
+        db, report_ids, user_id=None if current_user.role == "admin" else current_user.id
+    )
+
+    found_ids = [report_id for report_id in report_ids if report_id in rows_by_id]
+    analyzer = BatchFinancialAnalyzer.from_rows([rows_by_id[report_id] for report_id in found_ids])
 
-    analyzer = FinancialAnalyzer(report)
-    return analyzer.get_full_analysis()
+    return BatchAnalysisResponse(
+        report_ids=found_ids,
+        missing_ids=[report_id for report_id in report_ids if report_id not in rows_by_id],
+        **analyzer.get_full_analysis()
+    )
@@ -1,18 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status, UploadFile, File
+import asyncio
+import logging
+from typing import Any, Literal
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response, status, UploadFile, File, Form
+from pydantic import ValidationError
 from starlette import status
+import zipfile
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from sqlalchemy.orm import selectinload
+from sqlalchemy import delete, select
 
-from app.services.pdf_generator import PDFGenerator
-from ..database import get_db
+from app.services.pdf_generator import PDFGenerator, PDF_GENERATOR_VERSION
+from ..database import get_db, get_read_db
 from ..models import User, FinancialReport, ReportAssets, ReportLiabilities, ReportProfitLoss
-from ..schemas import FinancialReportCreate, FinancialReportResponse, ReportSummary, CompareResponse
+from ..schemas import (FinancialReportCreate, FinancialReportResponse, ReportPage, CompareResponse,
+                       CompareMatrixRequest, CompareMatrixResponse,
+                       MultiImportResponse, ImportedPeriod, SkippedPeriod, ZipImportResponse,
+                       BulkCreateResponse, BulkItemError)
 from .auth import get_current_user 
-from ..services.math_engine import FinancialAnalyzer, ReportComparator
-from ..services.excel_parser import parse_balance_sheet
+from ..services.math_engine import AnalysisResultSchema, BatchFinancialAnalyzer, ReportComparator, ANALYZER_VERSION
+from ..services.analysis_store import (add_analysis, load_report_analysis, load_report_version, current_analysis,
+                                       forget_analysis)
+from ..services.http_cache import cache_headers, etag_matches, not_modified, report_etag, SendFileResponse
+from ..services.pdf_cache import pdf_cache
+from ..services.line_items import pack_line_items, line_item_values
+from ..services.excel_parser import build_report_payload, describe_validation_error
+from ..services.upload_store import upload_store, parse_stored_balance_sheet, parse_stored_periods, is_valid_digest
+from ..services.bulk_import import bulk_insert_reports, import_zip
+from ..services.report_list import InvalidCursorError, list_reports
+from ..services.consistency import consistency_validator, describe_findings, save_findings
+from ..config import BULK_CREATE_MAX_REPORTS, CONSISTENCY_MODE, REPORTS_MAX_PAGE_SIZE, REPORTS_PAGE_SIZE
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/reports",
     tags=["reports"]
@@ -20,22 +39,37 @@ router = APIRouter(
 
 
 @router.get("/", 
-            response_model=list[ReportSummary],
+            response_model=ReportPage,
             status_code=status.HTTP_200_OK
             )
 async def get_my_reports(
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(REPORTS_PAGE_SIZE, ge=1, le=REPORTS_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    organization: str | None = Query(None, max_length=500),
+    period: str | None = Query(None, max_length=50),
+    order: Literal["desc", "asc"] = "desc",
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
+    """
+    Отчеты пользователя постранично, новые первыми (order=asc - старые первыми).
+    Следующая страница - с cursor = next_cursor из ответа; фильтры и order те же.
+    organization - часть названия организации, period - период целиком.
+    """
+    try:
+        rows, next_cursor = await list_reports(
+            db,
+            current_user.id,
+            limit,
+            cursor=cursor,
+            organization=organization,
+            period=period,
+            order=order
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    stmt = select(FinancialReport)\
-        .where(FinancialReport.user_id == current_user.id)\
-        .order_by(desc(FinancialReport.created_at))
-        
-    result = await db.execute(stmt)
-    reports = result.scalars().all()
-    
-    return reports
+    return ReportPage(items=rows, next_cursor=next_cursor)
 
 @router.post("/", response_model=FinancialReportResponse, status_code=status.HTTP_201_CREATED)
 async def create_financial_report(
@@ -53,11 +87,16 @@ async def create_financial_report(
     if current_user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
 
+    findings = consistency_validator.check_reports([report])[0]
+    if findings and CONSISTENCY_MODE == "reject":
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail={"message": "Report totals do not add up", "findings": findings})
 
     new_report = FinancialReport(
         user_id=current_user.id,
         organization_name=report.organization_name,
-        period=report.period
+        period=report.period,
+        line_items=pack_line_items(report)
     )
     
     db.add(new_report)
@@ -82,41 +121,130 @@ async def create_financial_report(
     )
 
     db.add_all([new_assets, new_liabilities, new_profit_loss])
+    await add_analysis(db, [new_report.id], [new_report.period], BatchFinancialAnalyzer.from_reports([report]))
+    await save_findings(db, [new_report.id], [findings])
     await db.commit()
-    await db.refresh(new_report, attribute_names=["assets", "liabilities", "profit_loss"])
+    await db.refresh(new_report, attribute_names=["assets", "liabilities", "profit_loss", "findings"])
 
     return new_report
 
 
+@router.post("/bulk", response_model=BulkCreateResponse, status_code=status.HTTP_201_CREATED)
+async def create_financial_reports_bulk(
+    reports: list[Any] = Body(..., max_length=BULK_CREATE_MAX_REPORTS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Загрузка многих отчетов одним запросом (массив FinancialReportCreate).
+    Каждый отчет проверяется отдельно: ошибочные попадают в errors, остальные
+    вставляются пачками многострочных INSERT (bulk_insert_reports) в одной транзакции.
+    В режиме CONSISTENCY_MODE=reject отчеты с несходящимися итогами тоже не сохраняются.
+    """
+    ids: list[int | None] = [None] * len(reports)
+    errors = []
+    positions = []
+    payloads = []
+    for i, data in enumerate(reports):
+        try:
+            payloads.append(FinancialReportCreate.model_validate(data))
+            positions.append(i)
+        except ValidationError as e:
+            errors.append(BulkItemError(index=i, detail=describe_validation_error(e)))
+
+    if CONSISTENCY_MODE == "reject":
+        kept = []
+        for i, payload, report_findings in zip(positions, payloads, consistency_validator.check_reports(payloads)):
+            if report_findings:
+                errors.append(BulkItemError(index=i,
+                                            detail=f"Totals do not add up: {describe_findings(report_findings)}"))
+            else:
+                kept.append((i, payload))
+        positions = [i for i, _ in kept]
+        payloads = [payload for _, payload in kept]
+
+    if not payloads:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail={"message": "No valid reports in request",
+                                    "errors": [e.model_dump() for e in errors]})
+
+    for i, report_id in zip(positions, await bulk_insert_reports(db, current_user.id, payloads)):
+        ids[i] = report_id
+    await db.commit()
+
+    errors.sort(key=lambda e: e.index)
+    return BulkCreateResponse(ids=ids, errors=errors)
+
+
 @router.post("/compare", response_model=CompareResponse)
 async def compare_reports(
     base_report_id: int, 
     curr_report_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    # 1. Загрузка данных (это ответственность роутера/DB слоя)
-    stmt = select(FinancialReport).options(
-        selectinload(FinancialReport.assets),
-        selectinload(FinancialReport.liabilities),
-        selectinload(FinancialReport.profit_loss)
+    # 1. Загрузка данных (это ответственность роутера/DB слоя): оба отчета со строками - один запрос
+    stmt = select(
+        FinancialReport.id,
+        FinancialReport.user_id,
+        FinancialReport.organization_name,
+        FinancialReport.period,
+        FinancialReport.line_items
     ).where(FinancialReport.id.in_([base_report_id, curr_report_id]))
     
     result = await db.execute(stmt)
-    reports = result.scalars().all()
-    
+    reports = {row.id: row for row in result.all()}
+
     if len(reports) != 2:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reports not found")
 
-    base_rep = next(r for r in reports if r.id == base_report_id)
-    curr_rep = next(r for r in reports if r.id == curr_report_id)
+    base_rep = reports[base_report_id]
+    curr_rep = reports[curr_report_id]
 
     if base_rep.user_id != current_user.id or curr_rep.user_id != current_user.id:
         if current_user.role != "admin":
              raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
 
-    # 2. Вызов бизнес-логики (чистая функция)
-    return ReportComparator.compare(base_rep, curr_rep)
+    # 2. Вызов бизнес-логики (чистая функция): тот же расчет, что и у /compare/matrix
+    return ReportComparator.compare(
+        base_rep.organization_name,
+        (base_rep.period, curr_rep.period),
+        [line_item_values(base_rep.line_items), line_item_values(curr_rep.line_items)]
+    )
+
+@router.post("/compare/matrix", response_model=CompareMatrixResponse)
+async def compare_reports_matrix(
+    request: CompareMatrixRequest,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Горизонтальный и вертикальный анализ по всем строкам для N отчетов.
+    Первый отчет в списке - базовый. Все отчеты читаются одним запросом.
+    """
+    report_ids = list(dict.fromkeys(request.report_ids))
+    stmt = select(
+            FinancialReport.id, FinancialReport.user_id, FinancialReport.organization_name, FinancialReport.period,
+            FinancialReport.line_items
+        ).where(FinancialReport.id.in_(report_ids))
+
+    result = await db.execute(stmt)
+    rows = {row[0]: row for row in result.all()}
+
+    if len(rows) != len(report_ids):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reports not found")
+
+    if any(row[1] != current_user.id for row in rows.values()) and current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+
+    ordered = [rows[report_id] for report_id in report_ids]
+
+    return CompareMatrixResponse(
+        report_ids=report_ids,
+        organizations=[row[2] for row in ordered],
+        periods=[row[3] for row in ordered],
+        **ReportComparator.compare_matrix([line_item_values(row[4]) for row in ordered])
+    )
 
 @router.delete("/{report_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_report(
@@ -129,73 +257,200 @@ async def delete_report(
     Пользователь может удалить только свой отчет. Админ - любой.
     """
     
-    stmt = select(FinancialReport).where(FinancialReport.id == report_id)
-    result = await db.execute(stmt)
-    report = result.scalar_one_or_none()
-    
-    if not report:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report not found")
+    scope = [FinancialReport.id == report_id]
+    if current_user.role != "admin":
+        scope.append(FinancialReport.user_id == current_user.id)
+
+    # Разделы, анализ и замечания отчета удалит ON DELETE CASCADE
+    await forget_analysis(db, *scope)
+    result = await db.execute(delete(FinancialReport).where(*scope).returning(FinancialReport.id))
 
-    if report.user_id != current_user.id or current_user.role != "admin":
-         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this report")
+    if result.scalar_one_or_none() is None:
+        exists = await db.execute(select(FinancialReport.id).where(FinancialReport.id == report_id))
+        if exists.first() is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report not found")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this report")
 
-    await db.delete(report)
     await db.commit()
 
 @router.post("/parse_excel")
-async def parse_excel_file(file: UploadFile = File(...)):
-    content = await file.read()
+async def parse_excel_file(
+    response: Response,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Файл сохраняется в хранилище по SHA-256 (заголовок X-Upload-Digest),
+    повторная загрузка того же файла отдается из кэша без разбора.
+    """
+    digest = await upload_store.save(file.file)
+    response.headers["X-Upload-Digest"] = digest
     try:
-        data = parse_balance_sheet(content)
+        data = await parse_stored_balance_sheet(digest)
         return data 
     except Exception as e:
         raise HTTPException(400, f"Error parsing file: {e}")
-    
+
+
+@router.post("/parse_excel/{digest}")
+async def reparse_excel_file(digest: str, current_user: User = Depends(get_current_user)):
+    """Повторный разбор ранее загруженного файла (например, после обновления парсера)"""
+    if not is_valid_digest(digest) or not upload_store.exists(digest):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    try:
+        return await parse_stored_balance_sheet(digest)
+    except Exception as e:
+        raise HTTPException(400, f"Error parsing file: {e}")
+
+
+@router.post("/import_multi", response_model=MultiImportResponse, status_code=status.HTTP_201_CREATED)
+async def import_multi_period(
+    organization_name: str = Form(...),
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Импорт книги РСБУ с несколькими колонками периодов.
+    Каждый период сохраняется отдельным отчетом, все - в одной транзакции.
+    Периоды без обязательных итогов пропускаются и попадают в skipped,
+    как и периоды с несходящимися итогами в режиме CONSISTENCY_MODE=reject.
+    """
+    digest = await upload_store.save(file.file)
+    try:
+        periods = await parse_stored_periods(digest)
+    except Exception as e:
+        raise HTTPException(400, f"Error parsing file: {e}")
+
+    payloads = []
+    skipped = []
+    for entry in periods:
+        try:
+            payloads.append(build_report_payload(organization_name, entry["period"], entry["values"]))
+        except ValidationError as e:
+            skipped.append(SkippedPeriod(period=entry["period"], detail=describe_validation_error(e)))
+
+    new_reports = []
+    findings = []
+    for payload, report_findings in zip(payloads, consistency_validator.check_reports(payloads)):
+        if report_findings and CONSISTENCY_MODE == "reject":
+            skipped.append(SkippedPeriod(period=payload.period,
+                                         detail=f"Totals do not add up: {describe_findings(report_findings)}"))
+            continue
+
+        findings.append(report_findings)
+        new_reports.append(FinancialReport(
+            user_id=current_user.id,
+            organization_name=payload.organization_name,
+            period=payload.period,
+            line_items=pack_line_items(payload),
+            assets=ReportAssets(**payload.assets.model_dump()),
+            liabilities=ReportLiabilities(**payload.liabilities.model_dump()),
+            profit_loss=ReportProfitLoss(**payload.profit_loss.model_dump()),
+        ))
+
+    if not new_reports:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail={"message": "No complete periods found in file",
+                                    "skipped": [s.model_dump() for s in skipped]})
+
+    db.add_all(new_reports)
+    await db.flush()
+    await add_analysis(db, [r.id for r in new_reports], [r.period for r in new_reports],
+                       BatchFinancialAnalyzer.from_reports(new_reports))
+    await save_findings(db, [r.id for r in new_reports], findings)
+    await db.commit()
+
+    return MultiImportResponse(
+        organization=organization_name,
+        created=[ImportedPeriod(id=r.id, period=r.period) for r in new_reports],
+        skipped=skipped
+    )
+
+
+@router.post("/import_zip", response_model=ZipImportResponse, status_code=status.HTTP_201_CREATED)
+async def import_zip_archive(
+    file: UploadFile = File(...),
+    organization_name: str | None = Form(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Массовый импорт: ZIP-архив с файлами отчетности.
+    Название организации берется из формы, а если его нет - из имени файла.
+    Возвращает манифест с результатом по каждому файлу.
+    """
+    try:
+        manifest = await import_zip(db, current_user.id, file.file, organization_name)
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid ZIP archive: {e}")
+
+    return ZipImportResponse(
+        total_files=len(manifest),
+        created_reports=sum(len(entry.report_ids) for entry in manifest),
+        files=manifest
+    )
+
 
 @router.get("/{report_id}/export/pdf")
 async def export_report_pdf(
     report_id: int,
-    db: AsyncSession = Depends(get_db),
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
+    """
+    PDF с анализом отчета. Отдается с ETag (версия отчета, анализатора и генератора PDF);
+    при совпадении If-None-Match - 304. Отрисованный PDF хранится в pdf_cache под тем же
+    ETag: при попадании файл отдается с диска без загрузки анализа и без отрисовки.
+    """
+    head = await load_report_version(db, report_id)
+    if head is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if head.user_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
 
-    stmt = (
-        select(FinancialReport)
-        .where(FinancialReport.id == report_id)
-        .options(
-            selectinload(FinancialReport.assets),
-            selectinload(FinancialReport.liabilities),
-            selectinload(FinancialReport.profit_loss),
-        )
-    )
-    result = await db.execute(stmt)
-    report: FinancialReport | None = result.scalar_one_or_none()
+    etag = _pdf_etag(report_id, head.version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
-    if report is None:
-        raise HTTPException(status_code=404, detail="Report not found")
+    path = await pdf_cache.get(etag)
+    if path is None:
+        row = await load_report_analysis(db, report_id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Report not found")
+        etag = _pdf_etag(report_id, row.version)
 
-    if report.user_id != current_user.id and current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
+        try:
+            analysis_result = AnalysisResultSchema(**await current_analysis(db, row))
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to perform analysis: {e}",
+            )
 
-    try:
-        analyzer = FinancialAnalyzer(report)
-        analysis_result = analyzer.get_full_analysis()  
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to perform analysis: {e}",
+        # ReportLab - чистый Python на процессоре, рисуем не в event loop
+        pdf_buffer = await asyncio.to_thread(
+            PDFGenerator.generate_report,
+            organization=row.organization_name,
+            period=row.period,
+            data=analysis_result,
         )
+        try:
+            path = await pdf_cache.put(etag, pdf_buffer.getbuffer())
+        except OSError as e:
+            # Кэш - только ускорение: при ошибке записи (нет места, нет прав) отдаем PDF из памяти
+            logger.warning("PDF cache write failed for report %s: %s", report_id, e)
+            path = None
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="report_{report_id}.pdf"',
+        **cache_headers(etag),
+    }
+    if path is None:
+        return Response(content=pdf_buffer.getvalue(), media_type="application/pdf", headers=headers)
+    return SendFileResponse(path, media_type="application/pdf", headers=headers)
 
-    pdf_buffer = PDFGenerator.generate_report(
-        organization=report.organization_name,
-        period=report.period,
-        data=analysis_result,
-    )
 
-    return Response(
-        content=pdf_buffer.getvalue(),
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f'attachment; filename="report_{report_id}.pdf"'
-        },
-    )
\ No newline at end of file
+def _pdf_etag(report_id: int, version: int) -> str:
+    return report_etag("pdf", report_id, version, ANALYZER_VERSION, PDF_GENERATOR_VERSION)
\ No newline at end of file
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
 from starlette import status
-from ..database import get_db
-from ..models import User, UserRole
+from ..database import get_db, get_read_db
+from ..models import FinancialReport, User, UserRole
+from ..services.analysis_store import forget_analysis
 from ..schemas import UserResponse, ChangePasswordRequest, UpdateProfileRequest, UpdateRoleRequest, TokenData
 from .auth import get_current_user, bcrypt_context
 
@@ -17,7 +19,7 @@ router = APIRouter(
 # ==========================================
 @router.get("/me", response_model=UserResponse)
 async def read_user_profile(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     token_data: TokenData = Depends(get_current_user)
 ):
 
@@ -40,31 +42,26 @@ async def update_user_profile(
     token_data: TokenData = Depends(get_current_user)
 ):
 
-    result = await db.execute(select(User).where(User.id == token_data.id))
-    user_in_db = result.scalar_one_or_none()
-    
+    # Один UPDATE ... RETURNING; занятый email ловится уникальным индексом
+    values = update_data.model_dump(exclude_none=True)
+    if values:
+        stmt = update(User).where(User.id == token_data.id).values(**values).returning(User)
+    else:
+        stmt = select(User).where(User.id == token_data.id)
+
+    try:
+        user_in_db = (await db.execute(stmt)).scalar_one_or_none()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Email already registered")
+
     if not user_in_db:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
                             detail="User not found"
         )
 
-    if update_data.email != user_in_db.email:
-        email_check = await db.execute(select(User).where(User.email == update_data.email))
-        if email_check.scalar_one_or_none():
-             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
-                                 detail="Email already registered")
-        user_in_db.email = update_data.email
-
-    # 3. Обновление полей
-    if update_data.first_name is not None:
-        user_in_db.first_name = update_data.first_name
-    
-    if update_data.last_name is not None:
-        user_in_db.last_name = update_data.last_name
-
-    db.add(user_in_db)
     await db.commit()
-    await db.refresh(user_in_db)
     return user_in_db
 
 # ==========================================
@@ -77,21 +74,23 @@ async def change_password(
     token_data: TokenData = Depends(get_current_user)
 ):
  
-    result = await db.execute(select(User).where(User.id == token_data.id))
-    user_in_db = result.scalar_one_or_none()
+    # Хеш читается отдельно: старый пароль проверяется bcrypt в приложении
+    result = await db.execute(select(User.hashed_password).where(User.id == token_data.id))
+    hashed_password = result.scalar_one_or_none()
 
-    if not user_in_db:
+    if not hashed_password:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
                             detail="User not found")
 
-    if not bcrypt_context.verify(password_data.old_password, 
-                                 user_in_db.hashed_password):
+    if not bcrypt_context.verify(password_data.old_password, hashed_password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
                             detail="Invalid old password")
     
-    user_in_db.hashed_password = bcrypt_context.hash(password_data.new_password)
-    
-    db.add(user_in_db)
+    await db.execute(
+        update(User)
+        .where(User.id == token_data.id)
+        .values(hashed_password=bcrypt_context.hash(password_data.new_password))
+    )
     await db.commit()
     
     return {"message": "Password updated successfully"}
@@ -111,18 +110,16 @@ async def change_user_role(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, 
                             detail="Not authorized to change roles")
 
-    result = await db.execute(select(User).where(User.id == user_id))
+    result = await db.execute(
+        update(User).where(User.id == user_id).values(role=role_data.role).returning(User)
+    )
     target_user = result.scalar_one_or_none()
     
     if not target_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
                             detail="User not found")
 
-    target_user.role = role_data.role
-    
-    db.add(target_user)
     await db.commit()
-    await db.refresh(target_user)
     
     return target_user
 
@@ -140,12 +137,12 @@ async def delete_user(
          raise HTTPException(status_code=403,
                               detail="Not authorized to delete this user")
 
-    result = await db.execute(select(User).where(User.id == user_id))
-    user_to_delete = result.scalar_one_or_none()
+    # Отчеты пользователя с разделами, анализом и замечаниями удалит ON DELETE CASCADE
+    await forget_analysis(db, FinancialReport.user_id == user_id)
+    result = await db.execute(delete(User).where(User.id == user_id).returning(User.id))
 
-    if not user_to_delete:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, 
                             detail="User not found")
 
-    await db.delete(user_to_delete)
-    await db.commit()
\ No newline at end of file
+    await db.commit()
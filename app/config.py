@@ -20,4 +20,74 @@ if not _database_url:
 
 SECRET_KEY: str = _secret_key
 ALGORITHM: str = _algorithm
-SQLALCHEMY_DATABASE_URL: str = _database_url
\ No newline at end of file
+SQLALCHEMY_DATABASE_URL: str = _database_url
+
+# Количество процессов для разбора Excel-файлов вне event loop
+EXCEL_PARSER_WORKERS: int = int(os.getenv("EXCEL_PARSER_WORKERS", os.cpu_count() or 1))
+
+# Размер пачки при массовой вставке отчетов (строк в одном INSERT)
+BULK_INSERT_BATCH_SIZE: int = int(os.getenv("BULK_INSERT_BATCH_SIZE", 500))
+
+# Наибольшее число отчетов в одном запросе POST /reports/bulk
+BULK_CREATE_MAX_REPORTS: int = int(os.getenv("BULK_CREATE_MAX_REPORTS", 10_000))
+
+# Максимальный размер одного файла внутри импортируемого ZIP-архива
+IMPORT_MAX_MEMBER_BYTES: int = int(os.getenv("IMPORT_MAX_MEMBER_BYTES", 20 * 1024 * 1024))
+
+# Каталог для загруженных файлов (хранятся по SHA-256 содержимого)
+UPLOAD_STORE_DIR: str = os.getenv("UPLOAD_STORE_DIR", "uploads")
+# Лимит размера хранилища загрузок; при превышении удаляются давно не использованные файлы. 0 - без лимита
+UPLOAD_STORE_MAX_BYTES: int = int(os.getenv("UPLOAD_STORE_MAX_BYTES", 1024 * 1024 * 1024))
+
+# Лимит памяти под кэш результатов разбора (LRU по размеру)
+PARSE_CACHE_MAX_BYTES: int = int(os.getenv("PARSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Реестр выученных шаблонов Excel-отчетов (отпечаток разметки -> координаты ячеек)
+TEMPLATE_REGISTRY_PATH: str = os.getenv("TEMPLATE_REGISTRY_PATH", os.path.join(UPLOAD_STORE_DIR, "templates.json"))
+TEMPLATE_REGISTRY_MAX_ENTRIES: int = int(os.getenv("TEMPLATE_REGISTRY_MAX_ENTRIES", 256))
+
+# Кэш отрисованных PDF на диске (ключ - версия отчета, анализатора и генератора PDF)
+# и лимит его размера; при превышении удаляются давно не запрошенные файлы. 0 - без кэша
+PDF_CACHE_DIR: str = os.getenv("PDF_CACHE_DIR", os.path.join(UPLOAD_STORE_DIR, "pdf"))
+PDF_CACHE_MAX_BYTES: int = int(os.getenv("PDF_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Скетчи квантилей для сравнения с другими компаниями: относительная точность
+# значения бакета и максимум бакетов на знак (при превышении схлопываются младшие)
+PEER_SKETCH_ACCURACY: float = float(os.getenv("PEER_SKETCH_ACCURACY", 0.01))
+PEER_SKETCH_MAX_BUCKETS: int = int(os.getenv("PEER_SKETCH_MAX_BUCKETS", 2048))
+# Как часто приложение сливает накопленные изменения скетчей в peer_sketches, секунд.
+# 0 - не сливать в приложении (тогда по расписанию: python -m app.services.peer_sketch)
+PEER_SKETCH_MERGE_SECONDS: float = float(os.getenv("PEER_SKETCH_MERGE_SECONDS", 60))
+# Сколько дельт периода процесс может записать до внеочередного слияния: чтение процентилей
+# складывает все неслитые дельты периода, и их число не должно расти с потоком загрузок
+PEER_SKETCH_MAX_PENDING_DELTAS: int = int(os.getenv("PEER_SKETCH_MAX_PENDING_DELTAS", 50))
+
+# Проверка сходимости итогов отчетности: допустимое расхождение (абсолютное,
+# в единицах отчета, и относительное - доля итога) и реакция на нарушение:
+# warn - сохранить отчет и записать замечания, reject - не сохранять
+CONSISTENCY_ABS_TOLERANCE: float = float(os.getenv("CONSISTENCY_ABS_TOLERANCE", 1.0))
+CONSISTENCY_REL_TOLERANCE: float = float(os.getenv("CONSISTENCY_REL_TOLERANCE", 0.001))
+CONSISTENCY_MODE: str = os.getenv("CONSISTENCY_MODE", "warn")
+
+if CONSISTENCY_MODE not in ("warn", "reject"):
+    raise ValueError(f"CONSISTENCY_MODE must be warn or reject, got {CONSISTENCY_MODE!r}")
+
+# Список отчетов (GET /reports/): размер страницы по умолчанию и наибольший допустимый
+REPORTS_PAGE_SIZE: int = int(os.getenv("REPORTS_PAGE_SIZE", 50))
+REPORTS_MAX_PAGE_SIZE: int = int(os.getenv("REPORTS_MAX_PAGE_SIZE", 500))
+
+# Учет запросов к БД: запрос не короче DB_SLOW_QUERY_MS (и HTTP-запрос с таким общим временем в БД)
+# пишется в журнал; DB_SERVER_TIMING - добавлять ли заголовок Server-Timing к ответам.
+# DB_N_PLUS_ONE_LIMIT - для разработки: предупреждать, если запрос одного вида выполнился
+# за HTTP-запрос больше этого числа раз (0 - не проверять)
+DB_SLOW_QUERY_MS: float = float(os.getenv("DB_SLOW_QUERY_MS", 200))
+DB_SERVER_TIMING: bool = os.getenv("DB_SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+DB_N_PLUS_ONE_LIMIT: int = int(os.getenv("DB_N_PLUS_ONE_LIMIT", 0))
+
+# Реплики для чтения: URL через запятую (пусто - все запросы идут в SQLALCHEMY_DATABASE_URL).
+# Локально можно указать копию файла SQLite. Реплика, к которой не удалось подключиться,
+# исключается на REPLICA_EJECT_SECONDS; после своих изменений пользователь
+# READ_YOUR_WRITES_SECONDS читает из основной БД (запас на отставание реплик)
+SQLALCHEMY_REPLICA_URLS: list[str] = [url.strip() for url in os.getenv("SQLALCHEMY_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_EJECT_SECONDS: float = float(os.getenv("REPLICA_EJECT_SECONDS", 30))
+READ_YOUR_WRITES_SECONDS: float = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
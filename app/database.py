@@ -3,26 +3,191 @@
 This file needed for get database connection 
 
 """
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import itertools
+import logging
+import time
+from pathlib import Path
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
 from typing import Annotated
-from fastapi import Depends
-from .config import SQLALCHEMY_DATABASE_URL
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from fastapi import Depends, Request
+from .config import (SQLALCHEMY_DATABASE_URL, SQLALCHEMY_REPLICA_URLS, REPLICA_EJECT_SECONDS,
+                     READ_YOUR_WRITES_SECONDS)
+from .services.query_stats import instrument_engine
 
-async_engine = create_async_engine(SQLALCHEMY_DATABASE_URL)
+logger = logging.getLogger(__name__)
+
+# Схема БД ведется миграциями Alembic (migrations/), приложение само таблицы не создает
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite проверяет внешние ключи и выполняет ON DELETE CASCADE, только если включить это на соединении
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def make_engine(url: str, **kwargs) -> AsyncEngine:
+    """Движок приложения: учет запросов (query_stats), для SQLite - внешние ключи"""
+    engine = create_async_engine(url, **kwargs)
+    instrument_engine(engine)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+    return engine
+
+
+async_engine = make_engine(SQLALCHEMY_DATABASE_URL)
+
+
+class ReplicaPool:
+    """
+    Реплики для чтения по очереди (round-robin). Реплика, к которой не удалось
+    подключиться (или соединение с которой оборвалось), исключается на eject_seconds,
+    потом снова получает запросы. Без живых реплик choose() возвращает None - читаем из основной БД.
+    """
+
+    def __init__(self, engines: list[AsyncEngine], eject_seconds: float = REPLICA_EJECT_SECONDS):
+        self.engines = list(engines)
+        self.eject_seconds = eject_seconds
+        self._ejected_until: dict[AsyncEngine, float] = {}
+        self._turn = itertools.count()
+        for engine in self.engines:
+            event.listen(engine.sync_engine, "handle_error", self._on_error(engine))
+
+    def _on_error(self, engine: AsyncEngine):
+        def handle_error(exception_context):
+            # connection is None - ошибка при подключении; ошибки самих запросов реплику не исключают
+            if exception_context.connection is None or exception_context.is_disconnect:
+                self.eject(engine, exception_context.original_exception)
+        return handle_error
+
+    def eject(self, engine: AsyncEngine, reason=None):
+        self._ejected_until[engine] = time.monotonic() + self.eject_seconds
+        logger.warning("Replica %s ejected for %.0f s: %s", engine.url.render_as_string(), self.eject_seconds, reason)
+
+    def choose(self) -> AsyncEngine | None:
+        now = time.monotonic()
+        healthy = [engine for engine in self.engines if self._ejected_until.get(engine, 0) <= now]
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+
+class RecentWrites:
+    """Когда пользователь (ключ - его токен) последний раз писал в БД; в памяти процесса"""
+
+    MAX_KEYS = 10_000
+
+    def __init__(self, window_seconds: float = READ_YOUR_WRITES_SECONDS):
+        self.window_seconds = window_seconds
+        self._last: dict[str, float] = {}
+
+    def mark(self, key: str | None):
+        if key is None or self.window_seconds <= 0:
+            return
+        now = time.monotonic()
+        if len(self._last) >= self.MAX_KEYS:
+            self._last = {k: t for k, t in self._last.items() if now - t < self.window_seconds}
+        self._last[key] = now
+
+    def recent(self, key: str | None) -> bool:
+        last = self._last.get(key) if key is not None else None
+        return last is not None and time.monotonic() - last < self.window_seconds
+
+
+class RoutingSession(Session):
+    """
+    Сессия, которая читает из реплики info["replica"] (если она задана), а пишет в основную БД.
+    Запись - flush, INSERT/UPDATE/DELETE и SELECT ... FOR UPDATE; после первой записи
+    вся сессия работает с основной БД, чтобы видеть свои же изменения.
+    Записи отмечаются в recent_writes по info["writer"].
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase) or getattr(clause, "_for_update_arg", None) is not None:
+            self.info["replica"] = None
+            recent_writes.mark(self.info.get("writer"))
+        replica = self.info.get("replica")
+        if replica is not None:
+            return replica.sync_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+replica_engines = [make_engine(url, pool_pre_ping=True) for url in SQLALCHEMY_REPLICA_URLS]
+replica_pool = ReplicaPool(replica_engines)
+recent_writes = RecentWrites()
 
 AsyncSessionLocal = async_sessionmaker(
     autocommit = False,
     autoflush= False,
     bind= async_engine,
     class_= AsyncSession,
+    sync_session_class= RoutingSession,
     expire_on_commit= False
 )
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
+
+def _writer_key(request: Request) -> str | None:
+    return request.headers.get("authorization")
+
+
+async def get_db(request: Request):
+    async with AsyncSessionLocal(info={"writer": _writer_key(request)}) as session:
+        try:
+            yield session
+        finally:
+            await session.aclose()
+
+
+async def get_read_db(request: Request):
+    """
+    Сессия для обработчиков, которые в основном читают: запросы идут в реплику,
+    кроме READ_YOUR_WRITES_SECONDS после записи этого же пользователя.
+    Если обработчик все же пишет, сессия переключается на основную БД (см. RoutingSession).
+    """
+    writer = _writer_key(request)
+    replica = None if recent_writes.recent(writer) else replica_pool.choose()
+    async with AsyncSessionLocal(info={"writer": writer, "replica": replica}) as session:
         try:
             yield session
         finally:
             await session.aclose()
 
 db_dependency = Annotated[AsyncSession, Depends(get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
+
+
+def _current_revision(connection) -> str | None:
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+async def check_schema_version():
+    """
+    Проверка при старте: база должна быть на последней миграции, иначе приложение не запускается.
+    Недоступная или отстающая реплика только исключается из пула.
+    """
+    head = ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_current_head()
+    async with async_engine.connect() as conn:
+        current = await conn.run_sync(_current_revision)
+
+    if current != head:
+        raise RuntimeError(
+            f"Database schema revision is {current}, expected {head}. Run `alembic upgrade head`"
+        )
+
+    for engine in replica_engines:
+        try:
+            async with engine.connect() as conn:
+                replica_revision = await conn.run_sync(_current_revision)
+        except Exception:
+            # Ошибку подключения реплика уже получила в handle_error и исключена
+            continue
+        if replica_revision != head:
+            replica_pool.eject(engine, f"schema revision is {replica_revision}, expected {head}")
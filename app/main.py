@@ -4,26 +4,37 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from .database import async_engine
-from .models import Base, User, FinancialReport, ReportAssets, ReportLiabilities, ReportProfitLoss
+import asyncio
+from .config import PEER_SKETCH_MERGE_SECONDS
+from .database import check_schema_version
 from .api import auth, analysis,reports, user
+from .services.excel_parser import shutdown_executor
+from .services.peer_sketch import merge_peer_sketches_periodically
+from .services.query_stats import QueryStatsMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
 
 
-    async with async_engine.begin() as conn:
+    await check_schema_version()
+    print("--- DATABASE SCHEMA IS UP TO DATE ---")
 
-        await conn.run_sync(Base.metadata.create_all)
-        print("--- TABLES CREATED SUCCESSFULLY ---")
+    merge_task = None
+    if PEER_SKETCH_MERGE_SECONDS > 0:
+        merge_task = asyncio.create_task(merge_peer_sketches_periodically(PEER_SKETCH_MERGE_SECONDS))
     
     yield
-    
+
+    if merge_task is not None:
+        merge_task.cancel()
+    shutdown_executor()
     print("--- SHUTDOWN ---")
 
 app = FastAPI(lifespan=lifespan)
 
+app.add_middleware(QueryStatsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
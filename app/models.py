@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Enum, ForeignKey, Integer, String, DateTime, Float, func
+from sqlalchemy import Column, Enum, ForeignKey, Index, Integer, String, DateTime, Float, JSON, desc, func, insert_sentinel
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from sqlalchemy.ext.declarative import declarative_base
 import enum
 
+from .services.scoring_models import SCORING_MODELS
+
 
 
 Base = declarative_base()
@@ -29,34 +32,79 @@ class User(Base):
     email = Column(String, unique=True, nullable=False)
     role = Column(Enum(UserRole), nullable=False)
 
+# func.now() в SQLite пишет CURRENT_TIMESTAMP без долей секунды ('YYYY-MM-DD HH:MM:SS'),
+# а DateTime по умолчанию передает значения из Python с '.000000'. Строки сравниваются как текст,
+# поэтому значения из Python (ключ страницы списка отчетов) приводятся к тому же виду
+REPORT_TIMESTAMP = DateTime().with_variant(sqlite.DATETIME(truncate_microseconds=True), "sqlite")
+
+
+def _fold_organization_name(context) -> str:
+    return context.get_current_parameters()["organization_name"].casefold()
+
+
 class FinancialReport(Base):
     """
     Financial report class
     """
     __tablename__ = 'financial_reports'
+    __table_args__ = (
+        # Список отчетов пользователя (GET /reports/): отбор по user_id, сортировка и ключ страницы
+        # (created_at, id) без отдельного шага. Он же служит индексом по user_id
+        Index("ix_financial_reports_user_id_created_at_id", "user_id", desc("created_at"), desc("id")),
+    )
 
     id = Column(Integer, index= True, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     organization_name = Column(String, nullable=False)
+    # Название в str.casefold() для поиска без учета регистра (GET /reports/?organization=):
+    # lower() в SQLite меняет регистр только латиницы. Заполняется при INSERT - и через ORM,
+    # и в bulk_insert_reports; название после создания отчета не меняется
+    organization_name_folded = Column(String, nullable=False, default=_fold_organization_name)
     period = Column(String, nullable=False)
-    created_at = Column(DateTime,  default= func.now())
+    created_at = Column(REPORT_TIMESTAMP,  default= func.now(), index=True)
+    # Растет при каждом изменении строк отчета (services/line_items.py) - для ETag анализа и PDF
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # Служебная колонка для массовой вставки: по ней SQLAlchemy сопоставляет id из
+    # многострочного INSERT ... RETURNING с порядком отчетов (SQLite не гарантирует порядок RETURNING)
+    _insert_sentinel = insert_sentinel("insert_sentinel")
 
+    # Все строки отчета одной записью {код строки: значение} - основной источник для всех чтений.
+    # Дочерние таблицы пишутся при создании отчета из тех же данных; UPDATE строк в обход ORM
+    # должен вызывать repack_line_items (services/line_items.py)
+    line_items = Column(JSON)
+
+    # Дочерние строки удаляет сама БД (ON DELETE CASCADE), ORM их перед удалением не загружает
     assets = relationship("ReportAssets", 
                           back_populates="report", 
                           uselist=False, 
-                          cascade="all, delete-orphan"
+                          cascade="all, delete-orphan",
+                          passive_deletes=True
     )
     
     
     liabilities = relationship ("ReportLiabilities", 
                                 back_populates="report", 
                                 uselist=False,
-                                cascade="all, delete-orphan"
+                                cascade="all, delete-orphan",
+                                passive_deletes=True
     )
     profit_loss = relationship("ReportProfitLoss", 
                                back_populates="report", 
                                uselist=False,
-                               cascade="all, delete-orphan"
+                               cascade="all, delete-orphan",
+                               passive_deletes=True
+    )
+    analysis = relationship("ReportAnalysis",
+                            back_populates="report",
+                            uselist=False,
+                            cascade="all, delete-orphan",
+                            passive_deletes=True
+    )
+    findings = relationship("ReportFinding",
+                            back_populates="report",
+                            cascade="all, delete-orphan",
+                            passive_deletes=True
     )
 
 class ReportAssets(Base):
@@ -66,7 +114,7 @@ class ReportAssets(Base):
     __tablename__ = 'report_assets'
 
     id = Column(Integer, primary_key=True, index=True)
-    report_id = Column(Integer, ForeignKey("financial_reports.id"))
+    report_id = Column(Integer, ForeignKey("financial_reports.id", ondelete="CASCADE"), index=True)
 
     # --- РАЗДЕЛ I. ВНЕОБОРОТНЫЕ АКТИВЫ ---
     intangible_assets = Column(Float)                   # Code: 1110 Нематериальные активы
@@ -101,7 +149,7 @@ class ReportLiabilities(Base):
     __tablename__ = "report_liabilities"
 
     id = Column(Integer, primary_key=True, index=True)
-    report_id = Column(Integer, ForeignKey("financial_reports.id"))
+    report_id = Column(Integer, ForeignKey("financial_reports.id", ondelete="CASCADE"), index=True)
 
     # --- III. КАПИТАЛ И РЕЗЕРВЫ ---
     authorized_capital = Column(Float)          # 1310 Уставный капитал
@@ -143,7 +191,7 @@ class ReportProfitLoss(Base):
     __tablename__ = "report_profit_loss"
 
     id = Column(Integer, primary_key=True, index= True)
-    report_id = Column(Integer, ForeignKey("financial_reports.id"))
+    report_id = Column(Integer, ForeignKey("financial_reports.id", ondelete="CASCADE"), index=True)
 
         # Основные показатели деятельности
     revenue = Column(Float)                     # Code: 2110 Выручка
@@ -172,3 +220,81 @@ class ReportProfitLoss(Base):
     net_profit = Column(Float)                  # Code: 2400 Чистая прибыль (убыток)
 
     report = relationship("FinancialReport", back_populates="profit_loss")
+
+
+class ReportAnalysis(Base):
+    """
+    Saved result of FinancialAnalyzer for a report (AnalysisResultSchema as JSON).
+    A row is valid only for the analyzer_version it was computed with.
+    """
+    __tablename__ = "report_analysis"
+
+    report_id = Column(Integer, ForeignKey("financial_reports.id", ondelete="CASCADE"), primary_key=True)
+    analyzer_version = Column(Integer, nullable=False)
+    result = Column(JSON, nullable=False)
+    computed_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    # Числовые показатели из result отдельными колонками с индексами - для отбора (screening)
+    current_ratio = Column(Float, index=True)       # liquidity.current_ratio
+    quick_ratio = Column(Float, index=True)         # liquidity.quick_ratio
+    absolute_ratio = Column(Float, index=True)      # liquidity.absolute_ratio
+    ros = Column(Float, index=True)                 # profitability.ros
+    roa = Column(Float, index=True)                 # profitability.roa
+    roe = Column(Float, index=True)                 # profitability.roe
+    asset_turnover = Column(Float, index=True)      # activity.asset_turnover
+    inventory_days = Column(Float, index=True)      # activity.inventory_days
+    # + колонка {name}_score (bankruptcy_{name}.score) на каждую модель из SCORING_MODELS - ниже
+
+    report = relationship("FinancialReport", back_populates="analysis")
+
+
+# Баллы моделей оценки банкротства: новая модель в реестре = новая колонка (и миграция)
+for _model in SCORING_MODELS:
+    setattr(ReportAnalysis, f"{_model.name}_score", Column(Float, index=True))
+
+
+
+class PeerSketch(Base):
+    """
+    Quantile sketches of analysis metrics over all reports of one period.
+    Mirrors report_analysis together with the pending rows of peer_sketch_deltas,
+    which are folded in by the merge job (see services/peer_sketch.py).
+    """
+    __tablename__ = "peer_sketches"
+
+    period = Column(String, primary_key=True)
+    report_count = Column(Integer, nullable=False, default=0)
+    sketches = Column(JSON, nullable=False)     # metric -> QuantileSketch.to_dict()
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class PeerSketchDelta(Base):
+    """
+    Not yet merged change to the sketches of one period: written (insert only)
+    whenever analysis rows are added or removed, so ingest never locks peer_sketches.
+    """
+    __tablename__ = "peer_sketch_deltas"
+
+    id = Column(Integer, primary_key=True)
+    period = Column(String, nullable=False, index=True)
+    report_count = Column(Integer, nullable=False)  # signed: added minus removed
+    sketches = Column(JSON, nullable=False)         # "added" / "removed" -> metric -> QuantileSketch.to_dict()
+    created_at = Column(DateTime, default=func.now())
+
+
+class ReportFinding(Base):
+    """
+    Broken accounting identity in a report (see services/consistency.py).
+    Written on upload and replaced by the full scan.
+    """
+    __tablename__ = "report_findings"
+
+    id = Column(Integer, primary_key=True)
+    report_id = Column(Integer, ForeignKey("financial_reports.id", ondelete="CASCADE"), nullable=False, index=True)
+    rule = Column(String, nullable=False, index=True)
+    expected = Column(Float, nullable=False)        # Сумма составляющих
+    actual = Column(Float, nullable=False)          # Итог в отчете
+    difference = Column(Float, nullable=False)
+    checked_at = Column(DateTime, default=func.now())
+
+    report = relationship("FinancialReport", back_populates="findings")
\ No newline at end of file
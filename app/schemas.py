@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, model_validator
+from typing import Literal, Optional
 from datetime import datetime
 from .models import UserRole
 
@@ -41,6 +41,158 @@ class CompareResponse(BaseModel):
     period_curr: str
     rows: list[CompareRow]
 
+class CompareMatrixRequest(BaseModel):
+    report_ids: list[int] = Field(min_length=2, max_length=100)   # Первый - базовый
+
+class CompareMatrixResponse(BaseModel):
+    """
+    Сравнение N отчетов по всем строкам. Матрицы - по строкам indicators
+    (строки отчета и расчетная валюта баланса balance_total),
+    j-й элемент строки относится к report_ids[j].
+    """
+    report_ids: list[int]
+    organizations: list[str]
+    periods: list[str]
+    indicators: list[str]
+    values: list[list[float]]
+    abs_change: list[list[float]]   # Изменение к базовому отчету
+    growth_rate: list[list[float]]  # Темп прироста к базовому отчету (%)
+    share: list[list[float]]        # Доля в валюте баланса (баланс) или в выручке (ОФР), %
+
+class BatchAnalysisRequest(BaseModel):
+    report_ids: list[int] = Field(min_length=1, max_length=100_000)
+
+class BatchAnalysisResponse(BaseModel):
+    """
+    Результат по колонкам: i-й элемент каждого списка относится к report_ids[i].
+    Кроме перечисленных групп - bankruptcy_<модель> для каждой модели из SCORING_MODELS.
+    """
+    model_config = ConfigDict(extra="allow")
+
+    report_ids: list[int]
+    missing_ids: list[int]      # Не найдены или нет доступа
+    liquidity: dict[str, list[float]]
+    profitability: dict[str, list[float]]
+    activity: dict[str, list[float]]
+    bankruptcy_altman: dict[str, list[float] | list[str]]
+    bankruptcy_taffler: dict[str, list[float] | list[str]]
+
+class PeerPercentiles(BaseModel):
+    """Положение показателей отчета среди всех отчетов того же периода"""
+    period: str
+    peers: int                      # Сколько отчетов в сравнении
+    ranks: dict[str, float]         # Поле анализа -> процентиль (0-100)
+
+class ScreenRequest(BaseModel):
+    # Например: "bankruptcy_altman.score < 1.23 and liquidity.current_ratio < 1 or bankruptcy_taffler.score < 0.2"
+    filter: str = Field(min_length=1, max_length=2000)
+    fields: list[str] = []          # Показатели, которые вернуть кроме упомянутых в filter
+    limit: int = Field(100, ge=1, le=1000)
+    after_id: int | None = None     # next_after_id из предыдущей страницы
+
+class ScreenMatch(BaseModel):
+    report_id: int
+    organization_name: str
+    period: str
+    metrics: dict[str, float | None]
+
+class ScreenResponse(BaseModel):
+    items: list[ScreenMatch]
+    next_after_id: int | None       # None - страниц больше нет
+
+class ScenarioPerturbation(BaseModel):
+    """Распределение относительного изменения входа: -0.15 = минус 15%"""
+    input: str                      # Имя входа анализатора: revenue, receivables, cash, ...
+    distribution: Literal["normal", "uniform", "triangular"] = "normal"
+    mean: float = 0.0               # normal
+    std: float = Field(0.0, ge=0)   # normal
+    low: float = 0.0                # uniform, triangular
+    mode: float = 0.0               # triangular
+    high: float = 0.0               # uniform, triangular
+
+    @model_validator(mode="after")
+    def check_bounds(self):
+        if self.distribution != "normal" and not self.low <= self.high:
+            raise ValueError("low must not exceed high")
+        if self.distribution == "triangular" and not self.low <= self.mode <= self.high:
+            raise ValueError("mode must be between low and high")
+        return self
+
+class ScenarioRequest(BaseModel):
+    perturbations: list[ScenarioPerturbation] = Field(default=[], max_length=50)
+    scenarios: int = Field(10_000, ge=100, le=200_000)
+    seed: int | None = None
+    sensitivity_shock: float = Field(0.15, gt=0, le=1)     # Шаг для торнадо-диаграммы
+
+class ScoreDistribution(BaseModel):
+    base: float                         # Оценка без изменений
+    mean: float
+    std: float
+    percentiles: dict[str, float]       # p5, p25, p50, p75, p95
+    zones: dict[str, float]             # Вывод модели -> доля сценариев
+    histogram_edges: list[float]
+    histogram_counts: list[int]
+
+class Sensitivity(BaseModel):
+    input: str
+    low: float                          # Оценка при -shock
+    high: float                         # Оценка при +shock
+
+class ScenarioResponse(BaseModel):
+    report_id: int
+    scenarios: int
+    altman: ScoreDistribution
+    taffler: ScoreDistribution
+    sensitivity_shock: float
+    altman_sensitivity: list[Sensitivity]       # По убыванию размаха
+    taffler_sensitivity: list[Sensitivity]
+
+class TrendSeries(BaseModel):
+    """Ряд одного показателя; i-й элемент списков относится к periods[i]"""
+    indicator: str                      # Имя строки отчета (revenue, total_capital, ...)
+    values: list[float | None]
+    abs_change: list[float | None]      # Изменение к предыдущему периоду (для первого - None)
+    growth_rate: list[float | None]     # Темп прироста к предыдущему периоду (%)
+    cagr: float | None                  # Среднегодовой темп роста за весь ряд (%)
+
+class TrendResponse(BaseModel):
+    organization: str
+    periods: list[str]
+    report_ids: list[int]
+    series: list[TrendSeries]
+
+class ImportedPeriod(BaseModel):
+    id: int
+    period: str
+
+class SkippedPeriod(BaseModel):
+    period: str
+    detail: str     # Почему период не сохранен (не хватает обязательных итогов и т.п.)
+
+class MultiImportResponse(BaseModel):
+    organization: str
+    created: list[ImportedPeriod]
+    skipped: list[SkippedPeriod]
+
+class BulkItemError(BaseModel):
+    index: int      # Позиция отчета в запросе
+    detail: str
+
+class BulkCreateResponse(BaseModel):
+    ids: list[int | None]           # Позиция i - id отчета i из запроса, None - отчет не сохранен (см. errors)
+    errors: list[BulkItemError]
+
+class ImportManifestEntry(BaseModel):
+    file: str
+    status: str = "pending"         # created / skipped / error
+    report_ids: list[int] = []
+    detail: Optional[str] = None
+
+class ZipImportResponse(BaseModel):
+    total_files: int
+    created_reports: int
+    files: list[ImportManifestEntry]
+
 # ==========================================
 # Вложенные компоненты (Активы, Пассивы, ОПУ)
 # ==========================================
@@ -138,11 +290,22 @@ class FinancialReportCreate(BaseModel):
     profit_loss: ProfitLossSchema
 
 
+class ConsistencyFinding(BaseModel):
+    """Нарушенное контрольное соотношение"""
+    rule: str
+    expected: float         # Сумма составляющих
+    actual: float           # Итог в отчете
+    difference: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 # 2. Схема для ЧТЕНИЯ отчета (выходные данные с ID и датой)
 class FinancialReportResponse(FinancialReportCreate):
     id: int
     user_id: int
     created_at: datetime
+    findings: list[ConsistencyFinding] = []
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -211,4 +374,8 @@ class ReportSummary(BaseModel):
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ReportPage(BaseModel):
+    items: list[ReportSummary]
+    next_cursor: str | None         # Передать в cursor для следующей страницы; None - страниц больше нет
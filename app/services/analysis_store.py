@@ -0,0 +1,280 @@
+"""
+
+Сохраненные результаты анализа (таблица report_analysis)
+
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import delete, event, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import BULK_INSERT_BATCH_SIZE
+from ..models import FinancialReport, ReportAnalysis, ReportAssets, ReportLiabilities, ReportProfitLoss
+from .line_items import ANALYZER_CODES, analyzer_inputs, line_item_values
+from .math_engine import ALL_FIELDS, ANALYZER_INPUTS, ANALYZER_VERSION, BatchFinancialAnalyzer, evaluate_metrics
+from .peer_sketch import update_peer_sketches
+from .scoring_models import SCORING_MODELS
+
+
+# Ограничение на число id в одном IN (...): у SQLite лимит на параметры запроса
+ID_CHUNK_SIZE = 10_000
+
+LINE_ITEM_MODELS = (ReportAssets, ReportLiabilities, ReportProfitLoss)
+
+# Поле анализа -> индексируемая колонка report_analysis (для отбора по показателям)
+METRIC_COLUMNS = {
+    "liquidity.current_ratio": ReportAnalysis.current_ratio,
+    "liquidity.quick_ratio": ReportAnalysis.quick_ratio,
+    "liquidity.absolute_ratio": ReportAnalysis.absolute_ratio,
+    "profitability.ros": ReportAnalysis.ros,
+    "profitability.roa": ReportAnalysis.roa,
+    "profitability.roe": ReportAnalysis.roe,
+    "activity.asset_turnover": ReportAnalysis.asset_turnover,
+    "activity.inventory_days": ReportAnalysis.inventory_days,
+    # Баллы всех моделей из реестра SCORING_MODELS
+    **{f"bankruptcy_{model.name}.score": getattr(ReportAnalysis, f"{model.name}_score") for model in SCORING_MODELS},
+}
+
+
+def _metric_values(result: dict) -> dict[str, float]:
+    """Значения для колонок METRIC_COLUMNS из результата анализа"""
+    values = {}
+    for field, column in METRIC_COLUMNS.items():
+        group, name = field.split(".", 1)
+        values[column.key] = result[group][name]
+    return values
+
+
+async def load_analyzer_inputs(
+    db: AsyncSession,
+    report_ids: list[int],
+    user_id: int | None = None
+) -> dict[int, tuple]:
+    """
+    Входы анализатора для отчетов: id -> значения в порядке ANALYZER_INPUTS.
+    Один SELECT по financial_reports (строки берутся из line_items) на каждые ID_CHUNK_SIZE id.
+    Если задан user_id, возвращаются только отчеты этого пользователя.
+    """
+    rows_by_id = {}
+    for start in range(0, len(report_ids), ID_CHUNK_SIZE):
+        chunk = report_ids[start:start + ID_CHUNK_SIZE]
+        stmt = select(FinancialReport.id, FinancialReport.line_items).where(FinancialReport.id.in_(chunk))
+        if user_id is not None:
+            stmt = stmt.where(FinancialReport.user_id == user_id)
+
+        result = await db.execute(stmt)
+        for report_id, packed in result.all():
+            rows_by_id[report_id] = line_item_values(packed, ANALYZER_CODES)
+    return rows_by_id
+
+
+def _drop_analysis(session: Session, report_ids: list[int], delete_rows: bool = True) -> dict[int, str]:
+    """
+    Убирает сохраненный анализ отчетов из скетчей сравнения и (если delete_rows)
+    удаляет сами строки. Синхронная: вызывается из before_flush и через run_sync.
+    Возвращает периоды отчетов: id -> period.
+    """
+    periods = {}
+    removed = []
+    for start in range(0, len(report_ids), ID_CHUNK_SIZE):
+        chunk = report_ids[start:start + ID_CHUNK_SIZE]
+        stmt = select(FinancialReport.id, FinancialReport.period, ReportAnalysis.result)\
+            .outerjoin(ReportAnalysis, ReportAnalysis.report_id == FinancialReport.id)\
+            .where(FinancialReport.id.in_(chunk))
+        for report_id, period, result in session.execute(stmt):
+            periods[report_id] = period
+            if result is not None:
+                removed.append((period, result))
+
+        if delete_rows:
+            session.execute(
+                delete(ReportAnalysis)
+                .where(ReportAnalysis.report_id.in_(chunk))
+                .execution_options(synchronize_session=False)
+            )
+
+    update_peer_sketches(session, removed=removed)
+    return periods
+
+
+async def add_analysis(
+    db: AsyncSession,
+    report_ids: list[int],
+    periods: list[str],
+    analyzer: BatchFinancialAnalyzer
+) -> dict[int, dict]:
+    """
+    Сохраняет результаты пакетного анализатора для отчетов без сохраненного анализа
+    (позиция i - отчет report_ids[i] за период periods[i]) и учитывает их в скетчах.
+    Коммит остается за вызывающим кодом.
+    """
+    results = {
+        report_id: analysis.model_dump()
+        for report_id, analysis in zip(report_ids, analyzer.get_analysis_list())
+    }
+    if not results:
+        return results
+
+    for start in range(0, len(report_ids), BULK_INSERT_BATCH_SIZE):
+        await db.execute(insert(ReportAnalysis), [
+            {
+                "report_id": report_id,
+                "analyzer_version": ANALYZER_VERSION,
+                "result": results[report_id],
+                **_metric_values(results[report_id]),
+            }
+            for report_id in report_ids[start:start + BULK_INSERT_BATCH_SIZE]
+        ])
+
+    added = [(period, results[report_id]) for report_id, period in zip(report_ids, periods)]
+    await db.run_sync(update_peer_sketches, added=added)
+    return results
+
+
+async def refresh_analysis(db: AsyncSession, report_ids: list[int]) -> dict[int, dict]:
+    """Пересчет анализа по данным из БД. Коммит остается за вызывающим кодом."""
+    rows_by_id = await load_analyzer_inputs(db, report_ids)
+    found_ids = [report_id for report_id in report_ids if report_id in rows_by_id]
+    periods = await db.run_sync(_drop_analysis, found_ids)
+
+    analyzer = BatchFinancialAnalyzer.from_rows([rows_by_id[report_id] for report_id in found_ids])
+    return await add_analysis(db, found_ids, [periods[report_id] for report_id in found_ids], analyzer)
+
+
+async def load_report_analysis(db: AsyncSession, report_id: int, line_items: bool = False):
+    """
+    Одна строка: шапка отчета и сохраненный анализ (result и analyzer_version
+    равны None, если анализа еще нет). None, если отчета нет.
+    line_items - выбрать тем же запросом и строки отчета (см. line_items.analyzer_inputs).
+    """
+    columns = [FinancialReport.line_items] if line_items else []
+    stmt = select(
+            FinancialReport.id,
+            FinancialReport.user_id,
+            FinancialReport.organization_name,
+            FinancialReport.period,
+            FinancialReport.version,
+            ReportAnalysis.analyzer_version,
+            ReportAnalysis.result,
+            *columns
+        )\
+        .outerjoin(ReportAnalysis, ReportAnalysis.report_id == FinancialReport.id)\
+        .where(FinancialReport.id == report_id)
+
+    result = await db.execute(stmt)
+    return result.one_or_none()
+
+
+async def load_report_version(db: AsyncSession, report_id: int):
+    """
+    Владелец и версия отчета - для проверки If-None-Match до загрузки строк и анализа.
+    None, если отчета нет.
+    """
+    stmt = select(FinancialReport.user_id, FinancialReport.version).where(FinancialReport.id == report_id)
+    return (await db.execute(stmt)).one_or_none()
+
+
+async def current_analysis(db: AsyncSession, row) -> dict:
+    """
+    Результат из строки load_report_analysis. Если анализа нет или он посчитан
+    другой версией анализатора, он считается по строкам отчета, но не сохраняется:
+    обработчики чтения работают с репликой и ничего не пишут. Сохраняют анализ
+    создание и импорт отчетов и backfill_analysis (после смены версии анализатора).
+    Строки берутся из row.line_items, если они выбраны тем же запросом, иначе - одним SELECT.
+    """
+    if row.result is not None and row.analyzer_version == ANALYZER_VERSION:
+        return row.result
+
+    if "line_items" in row._fields:
+        inputs = analyzer_inputs(row.line_items)
+    else:
+        values = (await load_analyzer_inputs(db, [row.id]))[row.id]
+        inputs = dict(zip(ANALYZER_INPUTS, values))
+    return evaluate_metrics(ALL_FIELDS, inputs)
+
+
+@event.listens_for(Session, "before_flush")
+def _invalidate_changed_reports(session, flush_context, instances):
+    """
+    Изменение строк отчета через ORM удаляет сохраненный анализ: до backfill_analysis
+    чтение считает его заново без сохранения (см. current_analysis). При удалении отчета его анализ
+    убирается из скетчей сравнения (саму строку удалит каскад).
+    Массовые UPDATE в обход ORM должны вызывать invalidate_analysis сами.
+    """
+    changed_ids = {
+        obj.report_id for obj in session.dirty
+        if isinstance(obj, LINE_ITEM_MODELS) and session.is_modified(obj) and obj.report_id is not None
+    }
+    deleted_ids = {obj.id for obj in session.deleted if isinstance(obj, FinancialReport)}
+
+    if changed_ids - deleted_ids:
+        _drop_analysis(session, list(changed_ids - deleted_ids))
+    if deleted_ids:
+        _drop_analysis(session, list(deleted_ids), delete_rows=False)
+
+
+async def invalidate_analysis(db: AsyncSession, report_ids: list[int]):
+    """Удаляет сохраненный анализ отчетов. Коммит остается за вызывающим кодом."""
+    await db.run_sync(_drop_analysis, report_ids)
+
+
+def _forget_analysis(session: Session, *criteria):
+    stmt = select(FinancialReport.period, ReportAnalysis.result)\
+        .join(ReportAnalysis, ReportAnalysis.report_id == FinancialReport.id)\
+        .where(*criteria)
+    update_peer_sketches(session, removed=session.execute(stmt).all())
+
+
+async def forget_analysis(db: AsyncSession, *criteria):
+    """
+    Убирает из скетчей сравнения анализ отчетов, отобранных условиями criteria, -
+    перед удалением этих отчетов одним DELETE в обход ORM (строки report_analysis
+    удалит ON DELETE CASCADE). Один SELECT; коммит остается за вызывающим кодом.
+    """
+    await db.run_sync(_forget_analysis, *criteria)
+
+
+# ============================
+# ЗАПОЛНЕНИЕ ДЛЯ СУЩЕСТВУЮЩИХ ОТЧЕТОВ
+# ============================
+
+async def backfill_analysis(db: AsyncSession, batch_size: int = BULK_INSERT_BATCH_SIZE) -> int:
+    """
+    Считает анализ для отчетов, у которых его нет или он устарел.
+    Отчеты идут по возрастанию id пачками по batch_size, каждая пачка - отдельный коммит,
+    поэтому прерванный backfill можно просто запустить снова.
+    """
+    total = 0
+    last_id = 0
+    while True:
+        stmt = select(FinancialReport.id)\
+            .outerjoin(ReportAnalysis, ReportAnalysis.report_id == FinancialReport.id)\
+            .where(FinancialReport.id > last_id)\
+            .where(or_(ReportAnalysis.report_id.is_(None), ReportAnalysis.analyzer_version != ANALYZER_VERSION))\
+            .order_by(FinancialReport.id)\
+            .limit(batch_size)
+        report_ids = list((await db.execute(stmt)).scalars().all())
+        if not report_ids:
+            return total
+
+        await refresh_analysis(db, report_ids)
+        await db.commit()
+        total += len(report_ids)
+        last_id = report_ids[-1]
+
+
+async def _main(batch_size: int):
+    from ..database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        total = await backfill_analysis(db, batch_size)
+    print(f"Analysis computed for {total} reports")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill report_analysis for existing reports")
+    parser.add_argument("--batch-size", type=int, default=BULK_INSERT_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(_main(args.batch_size))
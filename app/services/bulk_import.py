@@ -0,0 +1,205 @@
+"""
+
+Массовый импорт отчетов из ZIP-архива
+
+"""
+import asyncio
+import zipfile
+from pathlib import PurePosixPath
+from typing import BinaryIO
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import BULK_INSERT_BATCH_SIZE, CONSISTENCY_MODE, EXCEL_PARSER_WORKERS, IMPORT_MAX_MEMBER_BYTES
+from ..models import FinancialReport, ReportAssets, ReportLiabilities, ReportProfitLoss
+from ..schemas import FinancialReportCreate, ImportManifestEntry
+from .analysis_store import add_analysis
+from .consistency import consistency_validator, describe_findings, save_findings
+from .line_items import pack_line_items
+from .math_engine import BatchFinancialAnalyzer
+from .excel_parser import parse_balance_sheet_periods_async, build_report_payload, describe_validation_error
+
+
+SUPPORTED_SUFFIXES = {".xlsx", ".xlsm"}
+
+
+# ============================
+# МАССОВАЯ ВСТАВКА
+# ============================
+
+async def bulk_insert_reports(
+    db: AsyncSession,
+    user_id: int,
+    reports: list[FinancialReportCreate]
+) -> list[int]:
+    """
+    Вставка отчетов пачками: один многострочный INSERT ... RETURNING
+    для шапок и по одному многострочному INSERT на каждую дочернюю таблицу,
+    на report_analysis и на замечания проверки итогов (report_findings).
+    Строки передаются списком параметров, а не через .values([...]): так SQLAlchemy
+    компилирует запрос один раз и сам собирает многострочные INSERT (insertmanyvalues).
+    Коммит остается за вызывающим кодом.
+    """
+    ids: list[int] = []
+    for start in range(0, len(reports), BULK_INSERT_BATCH_SIZE):
+        chunk = reports[start:start + BULK_INSERT_BATCH_SIZE]
+
+        result = await db.execute(
+            insert(FinancialReport).returning(FinancialReport.id, sort_by_parameter_order=True),
+            [
+                {
+                    "user_id": user_id,
+                    "organization_name": r.organization_name,
+                    "period": r.period,
+                    "line_items": pack_line_items(r),
+                }
+                for r in chunk
+            ]
+        )
+        chunk_ids = list(result.scalars().all())
+
+        await db.execute(insert(ReportAssets), [
+            {"report_id": rid, **r.assets.model_dump()} for rid, r in zip(chunk_ids, chunk)
+        ])
+        await db.execute(insert(ReportLiabilities), [
+            {"report_id": rid, **r.liabilities.model_dump()} for rid, r in zip(chunk_ids, chunk)
+        ])
+        await db.execute(insert(ReportProfitLoss), [
+            {"report_id": rid, **r.profit_loss.model_dump()} for rid, r in zip(chunk_ids, chunk)
+        ])
+        await add_analysis(db, chunk_ids, [r.period for r in chunk], BatchFinancialAnalyzer.from_reports(chunk))
+        await save_findings(db, chunk_ids, consistency_validator.check_reports(chunk))
+        ids.extend(chunk_ids)
+
+    return ids
+
+
+# ============================
+# ИМПОРТ ZIP
+# ============================
+
+async def _parse_member(
+    entry: ImportManifestEntry,
+    content: bytes,
+    organization_name: str
+) -> list[FinancialReportCreate]:
+    try:
+        periods = await parse_balance_sheet_periods_async(content)
+    except Exception as e:
+        entry.status = "error"
+        entry.detail = f"Error parsing file: {e}"
+        return []
+
+    payloads = []
+    problems = []
+    for period in periods:
+        try:
+            payloads.append(build_report_payload(organization_name, period["period"], period["values"]))
+        except ValidationError as e:
+            problems.append(f"{period['period']}: {describe_validation_error(e)}")
+
+    if problems:
+        entry.detail = " | ".join(problems)
+    if not payloads:
+        entry.status = "skipped"
+        entry.detail = entry.detail or "No complete periods found in file"
+    return payloads
+
+
+async def import_zip(
+    db: AsyncSession,
+    user_id: int,
+    archive: BinaryIO,
+    organization_name: str | None = None
+) -> list[ImportManifestEntry]:
+    """
+    Разбор всех файлов архива в пуле процессов и вставка пачками.
+
+    Память ограничена: архив читается с диска по одному файлу,
+    в работе одновременно не больше 2 * EXCEL_PARSER_WORKERS файлов,
+    а готовые отчеты копятся только до BULK_INSERT_BATCH_SIZE штук.
+    Каждая пачка коммитится отдельно, итог по каждому файлу - в манифесте.
+    """
+    manifest: list[ImportManifestEntry] = []
+    pending: set[asyncio.Task] = set()
+    batch: list[tuple[ImportManifestEntry, FinancialReportCreate]] = []
+    window = EXCEL_PARSER_WORKERS * 2
+
+    async def flush():
+        if CONSISTENCY_MODE == "reject":
+            reject_inconsistent()
+        if not batch:
+            return
+        try:
+            ids = await bulk_insert_reports(db, user_id, [payload for _, payload in batch])
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            for entry, _ in batch:
+                entry.status = "error"
+                entry.detail = f"Failed to save reports: {e}"
+        else:
+            for (entry, _), report_id in zip(batch, ids):
+                entry.status = "created"
+                entry.report_ids.append(report_id)
+        batch.clear()
+
+    def reject_inconsistent():
+        """Отчеты с несходящимися итогами не сохраняются, причина - в манифесте файла"""
+        findings = consistency_validator.check_reports([payload for _, payload in batch])
+        kept = []
+        for (entry, payload), report_findings in zip(batch, findings):
+            if not report_findings:
+                kept.append((entry, payload))
+                continue
+            problem = f"{payload.period}: totals do not add up: {describe_findings(report_findings)}"
+            entry.detail = f"{entry.detail} | {problem}" if entry.detail else problem
+            if entry.status == "pending":
+                entry.status = "skipped"
+        batch[:] = kept
+
+    async def collect(return_when):
+        done, _ = await asyncio.wait(pending, return_when=return_when)
+        for task in done:
+            pending.discard(task)
+            entry, payloads = task.result()
+            batch.extend((entry, payload) for payload in payloads)
+        if len(batch) >= BULK_INSERT_BATCH_SIZE:
+            await flush()
+
+    async def parse_task(entry, content, org):
+        return entry, await _parse_member(entry, content, org)
+
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+
+            entry = ImportManifestEntry(file=info.filename)
+            manifest.append(entry)
+            path = PurePosixPath(info.filename)
+
+            if path.suffix.lower() not in SUPPORTED_SUFFIXES:
+                entry.status = "skipped"
+                entry.detail = "Unsupported file type"
+                continue
+            if info.file_size > IMPORT_MAX_MEMBER_BYTES:
+                entry.status = "skipped"
+                entry.detail = f"File is larger than {IMPORT_MAX_MEMBER_BYTES} bytes"
+                continue
+
+            if len(pending) >= window:
+                await collect(asyncio.FIRST_COMPLETED)
+
+            content = await asyncio.to_thread(zf.read, info)
+            pending.add(asyncio.create_task(
+                parse_task(entry, content, organization_name or path.stem)
+            ))
+
+        while pending:
+            await collect(asyncio.ALL_COMPLETED)
+
+    await flush()
+    return manifest
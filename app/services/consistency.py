@@ -0,0 +1,238 @@
+"""
+
+Проверка сходимости итогов отчетности (контрольные соотношения)
+
+"""
+import argparse
+import asyncio
+from operator import attrgetter
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import CONSISTENCY_ABS_TOLERANCE, CONSISTENCY_REL_TOLERANCE
+from ..models import FinancialReport, ReportAssets, ReportFinding, ReportLiabilities, ReportProfitLoss
+from .line_items import line_item_values
+from .math_engine import LINE_ITEM_COLUMNS
+
+
+# Размер пачки при полной проверке базы
+SCAN_BATCH_SIZE = 5000
+
+
+class ConsistencyRule(NamedTuple):
+    """
+    Сумма строк totals должна равняться сумме строк parts.
+    Строка parts с минусом ("-cost_of_sales") - расход: вычитается по модулю,
+    потому что в отчетах расходы пишут то в скобках, то без знака.
+    Правило пропускается, если итог не заполнен или детализация пустая (все строки 0 или NULL).
+    """
+    name: str
+    description: str
+    totals: tuple[str, ...]
+    parts: tuple[str, ...]
+
+
+CONSISTENCY_RULES = (
+    ConsistencyRule(
+        "non_current_assets", "1100 = 1110 + ... + 1190",
+        ("total_non_current_assets",),
+        ("intangible_assets", "research_and_dev_results", "intangible_search_assets", "tangible_search_assets",
+         "fixed_assets", "income_bearing_investments", "long_term_financial_investments",
+         "deferred_tax_assets", "other_non_current_assets"),
+    ),
+    ConsistencyRule(
+        "current_assets", "1200 = 1210 + ... + 1260",
+        ("total_current_assets",),
+        ("inventory", "vat_receivable", "accounts_receivable", "financial_investments_sec_section",
+         "cash_and_equivalents", "other_current_assets"),
+    ),
+    ConsistencyRule(
+        "capital", "1300 = 1310 - 1320 + 1340 + 1350 + 1360 + 1370",
+        ("total_capital",),
+        ("authorized_capital", "-own_shares_bought", "non_current_assets_revaluation", "additional_capital",
+         "reserve_capital", "retained_earnings"),
+    ),
+    ConsistencyRule(
+        "long_term_liabilities", "1400 = 1410 + ... + 1450",
+        ("total_long_term_liabilities",),
+        ("long_term_borrowings", "deferred_tax_liabilities", "estimated_liabilities", "other_long_term_liabilities"),
+    ),
+    ConsistencyRule(
+        "short_term_liabilities", "1500 = 1510 + ... + 1550",
+        ("total_short_term_liabilities",),
+        ("short_term_borrowings", "accounts_payable", "future_income", "estimated_short_term_liabilities",
+         "other_short_term_liabilities"),
+    ),
+    ConsistencyRule(
+        "balance", "1600 (1100 + 1200) = 1700",
+        ("total_non_current_assets", "total_current_assets"),
+        ("total_balance_liabilities",),
+    ),
+    ConsistencyRule(
+        "balance_liabilities", "1700 = 1300 + 1400 + 1500",
+        ("total_balance_liabilities",),
+        ("total_capital", "total_long_term_liabilities", "total_short_term_liabilities"),
+    ),
+    ConsistencyRule(
+        "gross_profit", "2100 = 2110 - 2120",
+        ("gross_profit",),
+        ("revenue", "-cost_of_sales"),
+    ),
+    ConsistencyRule(
+        "sales_profit", "2200 = 2100 - 2210 - 2220",
+        ("sales_profit",),
+        ("gross_profit", "-commercial_expenses", "-administrative_expenses"),
+    ),
+    ConsistencyRule(
+        "profit_before_tax", "2300 = 2200 + 2310 + 2320 - 2330 + 2340 - 2350",
+        ("profit_before_tax",),
+        ("sales_profit", "participation_income", "interest_receivable", "-interest_payable",
+         "other_income", "-other_expenses"),
+    ),
+)
+
+for _rule in CONSISTENCY_RULES:
+    for _field in (*_rule.totals, *(part.lstrip("-") for part in _rule.parts)):
+        if _field not in LINE_ITEM_COLUMNS:
+            raise ValueError(f"Consistency rule {_rule.name}: unknown line item {_field}")
+
+
+class ConsistencyValidator:
+    """
+    Все правила над пачкой отчетов сразу: каждая строка отчета - массив NumPy,
+    NULL - NaN. Нарушение - расхождение больше max(abs_tolerance, rel_tolerance * итог).
+    """
+
+    def __init__(self, abs_tolerance: float = CONSISTENCY_ABS_TOLERANCE,
+                 rel_tolerance: float = CONSISTENCY_REL_TOLERANCE):
+        self.abs_tolerance = abs_tolerance
+        self.rel_tolerance = rel_tolerance
+
+    def check_columns(self, columns: dict[str, np.ndarray], size: int) -> list[list[dict]]:
+        """Замечания по каждому отчету: список словарей rule, description, expected, actual, difference"""
+        findings: list[list[dict]] = [[] for _ in range(size)]
+        for rule in CONSISTENCY_RULES:
+            totals = np.stack([columns[name] for name in rule.totals])
+            parts = np.stack([
+                -np.abs(columns[part[1:]]) if part.startswith("-") else columns[part] for part in rule.parts
+            ])
+
+            actual = np.nansum(totals, axis=0)
+            expected = np.nansum(parts, axis=0)
+            difference = actual - expected
+            tolerance = np.maximum(self.abs_tolerance,
+                                   self.rel_tolerance * np.maximum(np.abs(actual), np.abs(expected)))
+
+            applicable = ~np.isnan(totals).any(axis=0) & (np.nan_to_num(parts) != 0).any(axis=0)
+            for i in np.flatnonzero(applicable & (np.abs(difference) > tolerance)):
+                findings[i].append({
+                    "rule": rule.name,
+                    "description": rule.description,
+                    "expected": float(expected[i]),
+                    "actual": float(actual[i]),
+                    "difference": float(difference[i]),
+                })
+        return findings
+
+    def check_rows(self, rows) -> list[list[dict]]:
+        """rows - кортежи значений в порядке LINE_ITEM_COLUMNS"""
+        matrix = np.array(rows, dtype=float).reshape(-1, len(LINE_ITEM_COLUMNS))
+        return self.check_columns({name: matrix[:, i] for i, name in enumerate(LINE_ITEM_COLUMNS)}, len(matrix))
+
+    def check_reports(self, reports) -> list[list[dict]]:
+        """Отчеты ORM или FinancialReportCreate: разделы assets, liabilities, profit_loss"""
+        sections = {ReportAssets: "assets", ReportLiabilities: "liabilities", ReportProfitLoss: "profit_loss"}
+        getters = [
+            (section, attrgetter(*[c.key for c in LINE_ITEM_COLUMNS.values() if c.class_ is model]))
+            for model, section in sections.items()
+        ]
+        return self.check_rows([
+            [value for section, getter in getters for value in getter(getattr(report, section))]
+            for report in reports
+        ])
+
+
+consistency_validator = ConsistencyValidator()
+
+
+def describe_findings(findings: list[dict]) -> str:
+    return "; ".join(
+        f"{f['description']}: {f['actual']:g} != {f['expected']:g}" for f in findings
+    )
+
+
+async def save_findings(db: AsyncSession, report_ids: list[int], findings: list[list[dict]]):
+    """Записывает замечания отчетов (позиция i - отчет report_ids[i]). Коммит остается за вызывающим кодом."""
+    values = [
+        {
+            "report_id": report_id,
+            "rule": f["rule"],
+            "expected": f["expected"],
+            "actual": f["actual"],
+            "difference": f["difference"],
+        }
+        for report_id, report_findings in zip(report_ids, findings)
+        for f in report_findings
+    ]
+    if values:
+        await db.execute(insert(ReportFinding), values)
+
+
+# ============================
+# ПРОВЕРКА ВСЕЙ БАЗЫ
+# ============================
+
+async def scan_consistency(
+    db: AsyncSession,
+    batch_size: int = SCAN_BATCH_SIZE,
+    validator: ConsistencyValidator = consistency_validator
+) -> tuple[int, int]:
+    """
+    Проверяет все сохраненные отчеты и заменяет их замечания в report_findings.
+    Отчеты идут по возрастанию id пачками, каждая пачка - один SELECT и отдельный
+    коммит, поэтому память не зависит от размера базы, а прерванную проверку
+    можно запустить снова. Возвращает (проверено отчетов, отчетов с замечаниями).
+    """
+    checked = flagged = 0
+    last_id = 0
+    while True:
+        stmt = select(FinancialReport.id, FinancialReport.line_items)\
+            .where(FinancialReport.id > last_id)\
+            .order_by(FinancialReport.id)\
+            .limit(batch_size)
+        rows = (await db.execute(stmt)).all()
+        if not rows:
+            return checked, flagged
+
+        report_ids = [row[0] for row in rows]
+        findings = validator.check_rows([line_item_values(row[1]) for row in rows])
+
+        await db.execute(
+            delete(ReportFinding)
+            .where(ReportFinding.report_id > last_id)
+            .where(ReportFinding.report_id <= report_ids[-1])
+        )
+        await save_findings(db, report_ids, findings)
+        await db.commit()
+
+        checked += len(rows)
+        flagged += sum(1 for report_findings in findings if report_findings)
+        last_id = report_ids[-1]
+
+
+async def _main(batch_size: int):
+    from ..database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        checked, flagged = await scan_consistency(db, batch_size)
+    print(f"Checked {checked} reports, {flagged} with findings")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check accounting identities for all stored reports")
+    parser.add_argument("--batch-size", type=int, default=SCAN_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(_main(args.batch_size))
@@ -0,0 +1,76 @@
+"""
+
+Разбор баланса из CSV-выгрузки
+
+"""
+import csv
+import io
+from pathlib import Path
+
+from .excel_parser import Source, lookup_code, parse_number
+
+
+SNIFF_BYTES = 16 * 1024
+DELIMITERS = ";,\t|"
+
+
+def _detect_encoding(head: bytes) -> str:
+    """Выгрузки 1С бывают и в UTF-8 (часто с BOM), и в windows-1251"""
+    if head.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Обрезанный в середине символа хвост - это еще UTF-8
+        if e.start < len(head) - 3:
+            return "cp1251"
+    return "utf-8"
+
+
+def _detect_delimiter(sample: str) -> str:
+    """
+    Разделитель, который стабильно встречается в первых строках.
+    csv.Sniffer здесь не годится: он медленный и путается
+    в десятичных запятых ("1234,5") при разделителе ";".
+    """
+    lines = [line for line in sample.splitlines()[:10] if line.strip()]
+    if len(lines) > 1:
+        lines = lines[:-1]  # последняя строка образца может быть обрезана
+    best, best_count = ";", 0
+    for delimiter in DELIMITERS:
+        count = min((line.count(delimiter) for line in lines), default=0)
+        if count > best_count:
+            best, best_count = delimiter, count
+    return best
+
+
+def parse_csv_statement(file_content: Source) -> dict:
+    """
+    Потоковый разбор CSV: файл читается построчно, в памяти только текущая строка.
+    Правило то же, что и для Excel: код строки ждет первое число правее себя.
+    """
+    raw = io.BytesIO(file_content) if isinstance(file_content, bytes) else open(Path(file_content), "rb")
+    with raw:
+        head = raw.read(SNIFF_BYTES)
+        raw.seek(0)
+        encoding = _detect_encoding(head)
+        delimiter = _detect_delimiter(head.decode(encoding, errors="ignore"))
+
+        text = io.TextIOWrapper(raw, encoding=encoding, errors="replace", newline="")
+        data = {}
+        for row in csv.reader(text, delimiter=delimiter):
+            pending = []
+            for cell in row:
+                if pending:
+                    value = parse_number(cell)
+                    if value is not None:
+                        for key in pending:
+                            data[key] = value
+                        pending = []
+
+                key = lookup_code(cell.strip())
+                if key is not None:
+                    pending.append(key)
+        text.detach()
+
+    return data
@@ -1,12 +1,17 @@
+import asyncio
+import re
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
+from pathlib import Path
 import openpyxl
+from pydantic import ValidationError
 
-def parse_balance_sheet(file_content: bytes):
+from ..config import EXCEL_PARSER_WORKERS, TEMPLATE_REGISTRY_PATH, TEMPLATE_REGISTRY_MAX_ENTRIES
+from ..schemas import AssetsSchema, LiabilitiesSchema, ProfitLossSchema, FinancialReportCreate
+from .template_registry import TemplateRegistry, XlsxSheetReader, fingerprint_header, row_tuple
 
-    wb = openpyxl.load_workbook(BytesIO(file_content), data_only=True)
-    sheet = wb.active 
-    data = {}
-    code_map = {
+
+CODE_MAP = {
     # --- АКТИВЫ ---
     "1110": "intangible_assets",
     "1120": "research_and_dev_results",
@@ -48,7 +53,7 @@ def parse_balance_sheet(file_content: bytes):
     "1540": "estimated_short_term_liabilities",
     "1550": "other_short_term_liabilities",
     "1500": "total_short_term_liabilities", # ИТОГО V
-    
+
     "1700": "total_balance_liabilities", # БАЛАНС
 
     # --- ПРИБЫЛИ И УБЫТКИ ---
@@ -67,17 +72,347 @@ def parse_balance_sheet(file_content: bytes):
     "2410": "income_tax",
     "2460": "other_operations",
     "2400": "net_profit"
-    }
-
-
-    for row in sheet.iter_rows(min_row=1, max_row=100, values_only=True):
-        for cell in row:
-            if str(cell) in code_map:
-                key = code_map[str(cell)]
-                idx = row.index(cell)
-                for val in row[idx+1:]:
-                    if isinstance(val, (int, float)):
-                        data[key] = float(val)
-                        break
-    
+}
+
+# Индекс "значение ячейки -> поле". Коды в файлах встречаются и строкой ("1110"),
+# и числом (1110), поэтому заранее кладем в индекс оба варианта,
+# чтобы не вызывать str() для каждой ячейки листа.
+_CODE_INDEX = {}
+for _code, _field in CODE_MAP.items():
+    _CODE_INDEX[_code] = _field
+    _CODE_INDEX[int(_code)] = _field
+
+MAX_ROWS = 100
+
+# Увеличивать при любом изменении логики разбора:
+# кэш результатов привязан к версии и после обновления разбирает файлы заново
+PARSER_VERSION = 3
+
+Source = bytes | str | Path
+
+template_registry = TemplateRegistry(TEMPLATE_REGISTRY_PATH, TEMPLATE_REGISTRY_MAX_ENTRIES)
+
+
+def _open_workbook(source: Source):
+    """
+    Книга открывается из байтов или из файла в хранилище загрузок.
+    Файлы хранилища без расширения, а openpyxl проверяет расширение у путей,
+    поэтому файл передается как поток.
+    """
+    if not isinstance(source, bytes):
+        source = Path(source).read_bytes()
+    return openpyxl.load_workbook(BytesIO(source), read_only=True, data_only=True)
+
+
+def lookup_code(cell):
+    """Поле отчета по коду строки ("1110" или 1110), None - если это не код"""
+    if cell is None or isinstance(cell, bool):
+        return None
+    if isinstance(cell, (str, int)):
+        return _CODE_INDEX.get(cell)
+    return None
+
+
+def parse_number(text: str) -> float | None:
+    """
+    Число из текстовой выгрузки: "1 234,5" -> 1234.5, "(123)" -> -123.0.
+    Прочерк и пустая строка - None.
+    """
+    text = text.strip().replace("\xa0", "").replace(" ", "")
+    if not text or text in ("-", "—", "–"):
+        return None
+    negative = text.startswith("(") and text.endswith(")")
+    if negative:
+        text = text[1:-1]
+    try:
+        value = float(text.replace(",", "."))
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def _full_scan(rows) -> tuple[dict, dict, list]:
+    """
+    Полный просмотр строк: найденный код ждет первое число правее себя.
+    Кроме значений возвращает их координаты для реестра шаблонов:
+    поле -> [строка, колонка кода, колонка значения],
+    и координаты всех найденных кодов, в том числе без значения: [строка, колонка]
+    """
+    data = {}
+    cells = {}
+    codes = []
+    for row_idx, row in enumerate(rows, start=1):
+        pending = []
+        for col, cell in enumerate(row):
+            if pending and isinstance(cell, (int, float)):
+                for key, code_col in pending:
+                    data[key] = float(cell)
+                    cells[key] = [row_idx, code_col, col]
+                pending = []
+
+            key = lookup_code(cell)
+            if key is not None:
+                pending.append((key, col))
+                codes.append([row_idx, col])
+    return data, cells, codes
+
+
+def _read_template(reader: XlsxSheetReader, template: dict) -> dict | None:
+    """
+    Чтение только известных ячеек шаблона.
+    Возвращает None - тогда нужен полный просмотр, - если в ожидаемой ячейке
+    оказался другой код (разметка не совпала) или в колонках кодов есть код,
+    которого не было в файле, по которому выучен шаблон (лишняя строка формы),
+    либо у кода, который тогда был без значения, значение появилось.
+    """
+    cells = template["cells"]
+    code_columns = {code_col for _, code_col, _ in cells.values()}
+    value_columns = {value_col for _, _, value_col in cells.values()}
+    # В шаблонах без "codes" (записаны до их появления) известны только коды со значениями
+    known_codes = {tuple(code) for code in template.get("codes", [])}
+    known_codes.update((row_idx, code_col) for row_idx, code_col, _ in cells.values())
+    learned_codes = {(row_idx, code_col) for row_idx, code_col, _ in cells.values()}
+
+    # Колонки кодов читаются до конца области разбора, а не до последней известной строки:
+    # иначе новая строка ниже нее потерялась бы молча
+    rows = dict(reader.iter_rows(MAX_ROWS, code_columns | value_columns))
+
+    for row_idx, row in rows.items():
+        for code_col in code_columns:
+            if lookup_code(row.get(code_col)) is None:
+                continue
+            if (row_idx, code_col) not in known_codes:
+                return None
+            if (row_idx, code_col) not in learned_codes and any(
+                isinstance(row.get(col), (int, float)) for col in value_columns if col > code_col
+            ):
+                return None
+
+    data = {}
+    for key, (row_idx, code_col, value_col) in cells.items():
+        row = rows.get(row_idx, {})
+        if lookup_code(row.get(code_col)) != key:
+            return None
+        val = row.get(value_col)
+        if isinstance(val, (int, float)):
+            data[key] = float(val)
+    return data
+
+
+def _parse_with_template(raw: bytes) -> tuple[dict | None, str | None]:
+    """
+    Быстрый путь: отпечаток разметки по строке заголовка с ячейкой "Код"
+    и, если шаблон уже известен, чтение только его ячеек прямо из XML листа.
+    Возвращает (данные или None, отпечаток или None).
+    """
+    try:
+        reader = XlsxSheetReader(raw, MAX_ROWS)
+    except Exception:
+        return None, None
+
+    try:
+        fingerprint = None
+        for row_idx, values in reader.iter_rows():
+            if any(_is_code_header(value) for value in values.values()):
+                fingerprint = fingerprint_header(row_idx, row_tuple(values))
+                break
+        if fingerprint is None:
+            return None, None
+
+        template = template_registry.get(fingerprint)
+        if template is None:
+            return None, fingerprint
+        return _read_template(reader, template), fingerprint
+    except Exception:
+        # Быстрый путь - только ускорение: любой сбой на нем значит полный просмотр через openpyxl
+        return None, None
+    finally:
+        reader.close()
+
+
+def parse_balance_sheet(file_content: Source):
+    """
+    Синхронный разбор баланса.
+    Если разметка листа уже встречалась, читаются только известные ячейки
+    шаблона, без openpyxl. Иначе (или если разметка не совпала) книга
+    читается в потоковом режиме (read_only) целиком, после чего
+    координаты найденных значений запоминаются в реестре шаблонов.
+    """
+    raw = file_content if isinstance(file_content, bytes) else Path(file_content).read_bytes()
+
+    data, fingerprint = _parse_with_template(raw)
+    if data is not None:
+        return data
+
+    wb = _open_workbook(raw)
+    try:
+        sheet = wb.active
+        # Экспорт из учетных систем часто пишет неверный размер листа,
+        # поэтому не доверяем ему и читаем строки целиком
+        sheet.reset_dimensions()
+        data, cells, codes = _full_scan(sheet.iter_rows(min_row=1, max_row=MAX_ROWS, values_only=True))
+    finally:
+        wb.close()
+
+    if fingerprint is not None and cells:
+        template_registry.remember(fingerprint, {
+            "cells": cells,
+            "codes": codes,
+        })
     return data
+
+
+# ============================
+# НЕСКОЛЬКО ПЕРИОДОВ
+# ============================
+
+_YEAR_RE = re.compile(r"(19|20)\d{2}")
+
+
+def _period_key(label: str) -> str:
+    """
+    "На 31 декабря 2023 г." -> "2023".
+    Ключ нужен, чтобы склеить колонки баланса и ОФР за один и тот же год.
+    """
+    match = _YEAR_RE.search(label)
+    return match.group(0) if match else label
+
+
+def _is_code_header(cell) -> bool:
+    return isinstance(cell, str) and cell.strip().lower() == "код"
+
+
+def _parse_sheet_periods(sheet) -> list[tuple[str, dict]]:
+    """
+    Разбор одного листа формы 1 или 2 с несколькими колонками периодов.
+    Колонки периодов определяются один раз на лист: по строке заголовка
+    с ячейкой "Код", а если ее нет - по числам в первой строке с кодом.
+    """
+    sheet.reset_dimensions()
+
+    labels: dict[int, str] = {}
+    code_col: int | None = None
+    period_cols: list[int] | None = None
+    values: dict[int, dict] = {}
+
+    for row in sheet.iter_rows(min_row=1, max_row=MAX_ROWS, values_only=True):
+        if period_cols is None:
+            for idx, cell in enumerate(row):
+                if _is_code_header(cell):
+                    code_col = idx
+                    for col in range(idx + 1, len(row)):
+                        if isinstance(row[col], str) and row[col].strip():
+                            labels[col] = row[col].strip()
+                    if labels:
+                        period_cols = sorted(labels)
+                    break
+            else:
+                idx = next((i for i, cell in enumerate(row) if lookup_code(cell)), None)
+                if idx is not None:
+                    code_col = idx
+                    period_cols = [
+                        col for col in range(idx + 1, len(row))
+                        if isinstance(row[col], (int, float)) and not isinstance(row[col], bool)
+                    ]
+            if period_cols is None:
+                continue
+
+        if code_col is None or code_col >= len(row):
+            continue
+        key = lookup_code(row[code_col])
+        if key is None:
+            continue
+        for col in period_cols:
+            val = row[col] if col < len(row) else None
+            if isinstance(val, (int, float)) and not isinstance(val, bool):
+                values.setdefault(col, {})[key] = float(val)
+
+    result = []
+    for i, col in enumerate(period_cols or []):
+        label = labels.get(col, f"Период {i + 1}")
+        result.append((label, values.get(col, {})))
+    return result
+
+
+def parse_balance_sheet_periods(file_content: Source) -> list[dict]:
+    """
+    Разбор книги РСБУ с несколькими периодами.
+    Просматриваются все листы (баланс и ОФР часто лежат на разных листах),
+    колонки за один и тот же год объединяются.
+
+    Возвращает список периодов в порядке колонок:
+    [{"period": "2024", "label": "На 31 декабря 2024 г.", "values": {field: value}}, ...]
+    """
+    wb = _open_workbook(file_content)
+    try:
+        periods: dict[str, dict] = {}
+        for sheet in wb.worksheets:
+            for label, data in _parse_sheet_periods(sheet):
+                if not data:
+                    continue
+                key = _period_key(label)
+                entry = periods.setdefault(key, {"period": key, "label": label, "values": {}})
+                entry["values"].update(data)
+    finally:
+        wb.close()
+
+    return list(periods.values())
+
+
+def build_report_payload(organization_name: str, period: str, values: dict) -> FinancialReportCreate:
+    """
+    Раскладывает плоский словарь "поле -> значение" по разделам отчета.
+    Бросает ValidationError, если не хватает обязательных итогов.
+    """
+    return FinancialReportCreate(
+        organization_name=organization_name,
+        period=period,
+        assets={k: v for k, v in values.items() if k in AssetsSchema.model_fields},
+        liabilities={k: v for k, v in values.items() if k in LiabilitiesSchema.model_fields},
+        profit_loss={k: v for k, v in values.items() if k in ProfitLossSchema.model_fields},
+    )
+
+
+def describe_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+
+# ============================
+# ПУЛ ПРОЦЕССОВ
+# ============================
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=EXCEL_PARSER_WORKERS)
+    return _executor
+
+
+async def run_in_pool(func, file_content: Source):
+    """
+    Разбор в отдельном процессе, чтобы не блокировать event loop.
+    Одновременно выполняется не больше EXCEL_PARSER_WORKERS разборов,
+    остальные ждут своей очереди в пуле.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), func, file_content)
+
+
+async def parse_balance_sheet_async(file_content: Source):
+    return await run_in_pool(parse_balance_sheet, file_content)
+
+
+async def parse_balance_sheet_periods_async(file_content: Source) -> list[dict]:
+    return await run_in_pool(parse_balance_sheet_periods, file_content)
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,118 @@
+"""
+
+Разбор бухгалтерской отчетности в электронном формате ФНС (КНД 0710099)
+
+"""
+import io
+from pathlib import Path
+from xml.etree.ElementTree import iterparse
+
+from .excel_parser import Source, CODE_MAP, parse_number
+
+
+# Значение за отчетный период. Предыдущие годы лежат в СумПрдщ и СумПрдшв.
+VALUE_ATTR = "СумОтч"
+
+# Элементы формата 5.0x: (родитель, элемент) -> код строки.
+# Одни и те же имена (ФинВлож, ЗаемСредств, ОценОбяз, ПрочОбяз) встречаются
+# в разных разделах, поэтому ключ включает родителя.
+ELEMENT_CODES = {
+    # --- Баланс, актив ---
+    ("Актив", "ВнеОбА"): "1100",
+    ("ВнеОбА", "НематАкт"): "1110",
+    ("ВнеОбА", "РезИсслРазр"): "1120",
+    ("ВнеОбА", "НеМатПоискАкт"): "1130",
+    ("ВнеОбА", "МатПоискАкт"): "1140",
+    ("ВнеОбА", "ОснСр"): "1150",
+    ("ВнеОбА", "ДохВлМатЦен"): "1160",
+    ("ВнеОбА", "ФинВлож"): "1170",
+    ("ВнеОбА", "ОтлНалАкт"): "1180",
+    ("ВнеОбА", "ПрочВнеОбА"): "1190",
+
+    ("Актив", "ОбА"): "1200",
+    ("ОбА", "Запасы"): "1210",
+    ("ОбА", "НДСПриобрЦен"): "1220",
+    ("ОбА", "ДебЗад"): "1230",
+    ("ОбА", "ФинВлож"): "1240",
+    ("ОбА", "ДенежнСр"): "1250",
+    ("ОбА", "ПрочОбА"): "1260",
+
+    # --- Баланс, пассив ---
+    ("Пассив", "КапРез"): "1300",
+    ("КапРез", "УставКапитал"): "1310",
+    ("КапРез", "СобствАкц"): "1320",
+    ("КапРез", "ПереоцВнеОбА"): "1340",
+    ("КапРез", "ДобКапитал"): "1350",
+    ("КапРез", "РезКапитал"): "1360",
+    ("КапРез", "НераспПриб"): "1370",
+
+    ("Пассив", "ДолгосрОбяз"): "1400",
+    ("ДолгосрОбяз", "ЗаемСредств"): "1410",
+    ("ДолгосрОбяз", "ОтлНалОбяз"): "1420",
+    ("ДолгосрОбяз", "ОценОбяз"): "1430",
+    ("ДолгосрОбяз", "ПрочОбяз"): "1450",
+
+    ("Пассив", "КраткосрОбяз"): "1500",
+    ("КраткосрОбяз", "ЗаемСредств"): "1510",
+    ("КраткосрОбяз", "КредитЗадолж"): "1520",
+    ("КраткосрОбяз", "ДоходБудущ"): "1530",
+    ("КраткосрОбяз", "ОценОбяз"): "1540",
+    ("КраткосрОбяз", "ПрочОбяз"): "1550",
+
+    ("Баланс", "Актив"): "1600",
+    ("Баланс", "Пассив"): "1700",
+
+    # --- Отчет о финансовых результатах ---
+    ("ФинРез", "Выруч"): "2110",
+    ("ФинРез", "СебестПрод"): "2120",
+    ("ФинРез", "ВалПрибыль"): "2100",
+    ("ФинРез", "КомРасход"): "2210",
+    ("ФинРез", "УпрРасход"): "2220",
+    ("ФинРез", "ПрибПрод"): "2200",
+    ("ФинРез", "ДоходОтУчаст"): "2310",
+    ("ФинРез", "ПроцПолуч"): "2320",
+    ("ФинРез", "ПроцУпл"): "2330",
+    ("ФинРез", "ПрочДоход"): "2340",
+    ("ФинРез", "ПрочРасход"): "2350",
+    ("ФинРез", "ПрибУбДоНал"): "2300",
+    ("ФинРез", "НалПриб"): "2410",
+    ("ФинРез", "Прочее"): "2460",
+    ("ФинРез", "ЧистПрибУб"): "2400",
+}
+
+
+def _field_for(parent: str | None, elem) -> str | None:
+    # Строки с явным кодом (<Строка Код="1110" СумОтч="..."/>) тоже принимаем
+    code = elem.get("Код") or elem.get("КодСтр")
+    if code is None:
+        code = ELEMENT_CODES.get((parent, elem.tag))
+    return CODE_MAP.get(code) if code else None
+
+
+def parse_fns_xml_statement(file_content: Source) -> dict:
+    """
+    Потоковый разбор XML через iterparse: обработанные элементы сразу
+    удаляются из дерева, так что память не зависит от размера файла.
+    """
+    source = io.BytesIO(file_content) if isinstance(file_content, bytes) else open(Path(file_content), "rb")
+    data = {}
+    with source:
+        stack = []
+        for event, elem in iterparse(source, events=("start", "end")):
+            if event == "start":
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            parent = stack[-1] if stack else None
+            key = _field_for(parent.tag if parent is not None else None, elem)
+            if key is not None:
+                value = parse_number(elem.get(VALUE_ATTR, ""))
+                if value is not None:
+                    data[key] = value
+
+            elem.clear()
+            if parent is not None:
+                parent.remove(elem)
+
+    return data
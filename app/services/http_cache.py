@@ -0,0 +1,68 @@
+"""
+
+Условные запросы (ETag / If-None-Match) для ответов, которые определяются версией отчета
+
+"""
+import hashlib
+import os
+
+import anyio
+from fastapi import Response
+from fastapi.responses import FileResponse
+from starlette import status
+
+
+# private - ответ отдается только после проверки прав пользователя;
+# no-cache - браузер хранит ответ, но перед показом сверяет ETag (дешевый 304)
+CACHE_CONTROL = "private, no-cache"
+
+
+def report_etag(kind: str, report_id: int, version: int, *versions, variant: str | None = None) -> str:
+    """
+    Строгий ETag: вид ответа, id и версия отчета, версии кода, который строит ответ
+    (анализатор, генератор PDF), и хеш варианта ответа (например, набора полей)
+    """
+    tag = "-".join(str(part) for part in (kind, report_id, version, *versions))
+    if variant is not None:
+        tag += "-" + hashlib.blake2b(variant.encode(), digest_size=6).hexdigest()
+    return f'"{tag}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match сравнивается слабо (RFC 9110): префикс W/ не учитывается, * совпадает с любым"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+def cache_headers(etag: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
+
+
+class SendFileResponse(FileResponse):
+    """
+    FileResponse, который отдает файл целиком через ASGI-расширение http.response.pathsend:
+    сервер (Granian, Hypercorn) пишет файл в сокет сам, через sendfile, без чтения в Python.
+    Если сервер расширение не поддерживает (uvicorn), а также для HEAD и Range -
+    обычная потоковая отдача FileResponse кусками с диска.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if ("http.response.pathsend" not in scope.get("extensions", {})
+                or scope["method"].upper() == "HEAD"
+                or any(name.lower() == b"range" for name, _ in scope["headers"])):
+            await super().__call__(scope, receive, send)
+            return
+
+        if self.stat_result is None:
+            self.set_stat_headers(await anyio.to_thread.run_sync(os.stat, self.path))
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,169 @@
+"""
+
+Строки отчета, упакованные в саму запись отчета: financial_reports.line_items = {код строки: значение}
+
+line_items - основной источник строк: все чтения (анализ, сравнение, экспорт, отбор) идут
+только по нему. Дочерние таблицы report_assets, report_liabilities, report_profit_loss
+пишутся при создании отчета из тех же данных и остаются для построчных SQL-запросов.
+Изменения строк через ORM переносятся в line_items в before_flush, массовые UPDATE
+в обход ORM должны вызывать repack_line_items; расхождения находит find_line_item_drift.
+
+"""
+from operator import attrgetter
+
+from sqlalchemy import JSON, bindparam, event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import BULK_INSERT_BATCH_SIZE
+from ..models import FinancialReport, ReportAssets, ReportLiabilities, ReportProfitLoss
+from .excel_parser import CODE_MAP
+from .math_engine import ANALYZER_INPUTS, LINE_ITEM_COLUMNS
+
+
+# Раздел отчета -> модель дочерней таблицы
+SECTIONS = {"assets": ReportAssets, "liabilities": ReportLiabilities, "profit_loss": ReportProfitLoss}
+
+# Поле -> код строки формы (в порядке LINE_ITEM_COLUMNS)
+_FIELD_CODES = {field: code for code, field in CODE_MAP.items()}
+_FIELD_CODES.update({"current_income_tax": "2411", "deferred_income_tax": "2412"})
+LINE_ITEM_CODES = {field: _FIELD_CODES[field] for field in LINE_ITEM_COLUMNS}
+
+_SECTION_FIELDS = {
+    section: [c.key for c in LINE_ITEM_COLUMNS.values() if c.class_ is model] for section, model in SECTIONS.items()
+}
+_SECTION_GETTERS = {section: attrgetter(*fields) for section, fields in _SECTION_FIELDS.items()}
+
+ANALYZER_CODES = [LINE_ITEM_CODES[column.key] for column in ANALYZER_INPUTS.values()]
+ALL_CODES = list(LINE_ITEM_CODES.values())
+
+
+def pack_section(section: str, obj) -> dict[str, float | None]:
+    """Значения одного раздела (ORM-строка или схема) по кодам; NULL остается None"""
+    return {
+        LINE_ITEM_CODES[field]: None if value is None else float(value)
+        for field, value in zip(_SECTION_FIELDS[section], _SECTION_GETTERS[section](obj))
+    }
+
+
+def pack_line_items(report) -> dict[str, float]:
+    """
+    Все строки отчета (ORM или FinancialReportCreate с разделами assets,
+    liabilities, profit_loss) -> {код: значение}. Пустые строки не хранятся.
+    """
+    packed = {}
+    for section in SECTIONS:
+        packed.update(pack_section(section, getattr(report, section)))
+    return {code: value for code, value in packed.items() if value is not None}
+
+
+def line_item_values(packed: dict | None, codes: list[str] = ALL_CODES) -> tuple:
+    """Значения по списку кодов (по умолчанию - в порядке LINE_ITEM_COLUMNS), пустые - None"""
+    packed = packed or {}
+    return tuple(packed.get(code) for code in codes)
+
+
+def analyzer_inputs(packed: dict | None) -> dict[str, float | None]:
+    """Входы анализатора по именам ANALYZER_INPUTS"""
+    return dict(zip(ANALYZER_INPUTS, line_item_values(packed, ANALYZER_CODES)))
+
+
+# ============================
+# СИНХРОНИЗАЦИЯ С ДОЧЕРНИМИ ТАБЛИЦАМИ
+# ============================
+
+def _repack(session: Session, sections: dict[int, dict[str, float | None]]):
+    """Накладывает новые значения строк на line_items отчетов. Синхронная (before_flush, run_sync)."""
+    ids = list(sections)
+    stmt = select(FinancialReport.id, FinancialReport.line_items).where(FinancialReport.id.in_(ids))
+    params = []
+    for report_id, packed in session.execute(stmt):
+        merged = {**(packed or {}), **sections[report_id]}
+        params.append({
+            "report_id": report_id,
+            "packed": {code: value for code, value in merged.items() if value is not None},
+        })
+
+    if params:
+        table = FinancialReport.__table__
+        session.execute(
+            update(table)
+            .where(table.c.id == bindparam("report_id"))
+            .values(line_items=bindparam("packed", type_=JSON), version=table.c.version + 1),
+            params
+        )
+
+
+@event.listens_for(Session, "before_flush")
+def _repack_changed_reports(session, flush_context, instances):
+    """
+    Изменение строк отчета через ORM сразу переносится в line_items.
+    Массовые UPDATE в обход ORM должны вызывать repack_line_items сами.
+    """
+    sections: dict[int, dict[str, float | None]] = {}
+    for obj in session.dirty:
+        for section, model in SECTIONS.items():
+            if isinstance(obj, model) and session.is_modified(obj) and obj.report_id is not None:
+                sections.setdefault(obj.report_id, {}).update(pack_section(section, obj))
+    if sections:
+        _repack(session, sections)
+
+
+def _line_items_from_tables():
+    """SELECT id и всех строк отчета из дочерних таблиц (для переупаковки и проверки)"""
+    return select(FinancialReport.id, *LINE_ITEM_COLUMNS.values())\
+        .outerjoin(ReportAssets, ReportAssets.report_id == FinancialReport.id)\
+        .outerjoin(ReportLiabilities, ReportLiabilities.report_id == FinancialReport.id)\
+        .outerjoin(ReportProfitLoss, ReportProfitLoss.report_id == FinancialReport.id)
+
+
+def _pack_rows(rows) -> list[dict]:
+    return [
+        {
+            "report_id": row[0],
+            "packed": {code: value for code, value in zip(ALL_CODES, row[1:]) if value is not None},
+        }
+        for row in rows
+    ]
+
+
+async def _write_packed(db: AsyncSession, params: list[dict]):
+    table = FinancialReport.__table__
+    await db.execute(
+        update(table)
+        .where(table.c.id == bindparam("report_id"))
+        .values(line_items=bindparam("packed", type_=JSON), version=table.c.version + 1),
+        params
+    )
+
+
+async def repack_line_items(db: AsyncSession, report_ids: list[int]):
+    """Пересобирает line_items из дочерних таблиц. Коммит остается за вызывающим кодом."""
+    for start in range(0, len(report_ids), BULK_INSERT_BATCH_SIZE):
+        chunk = report_ids[start:start + BULK_INSERT_BATCH_SIZE]
+        rows = (await db.execute(_line_items_from_tables().where(FinancialReport.id.in_(chunk)))).all()
+        if rows:
+            await _write_packed(db, _pack_rows(rows))
+
+
+async def find_line_item_drift(db: AsyncSession, batch_size: int = BULK_INSERT_BATCH_SIZE) -> list[int]:
+    """
+    Id отчетов, у которых line_items не совпадает с дочерними таблицами
+    (например, после UPDATE в обход ORM без repack_line_items). Обход по id пачками.
+    """
+    drifted = []
+    last_id = 0
+    while True:
+        stmt = _line_items_from_tables()\
+            .add_columns(FinancialReport.line_items)\
+            .where(FinancialReport.id > last_id)\
+            .order_by(FinancialReport.id)\
+            .limit(batch_size)
+        rows = (await db.execute(stmt)).all()
+        if not rows:
+            return drifted
+
+        for row, expected in zip(rows, _pack_rows(row[:-1] for row in rows)):
+            if (row[-1] or {}) != expected["packed"]:
+                drifted.append(row[0])
+        last_id = rows[-1][0]
@@ -1,194 +1,939 @@
-from ..models import FinancialReport
-from pydantic import BaseModel
-from ..schemas import CompareRow,CompareResponse
+import ast
+import re
+from functools import lru_cache
+from operator import attrgetter
+from typing import Callable, NamedTuple
+
+import numpy as np
+from sqlalchemy import Float
+from ..models import FinancialReport, ReportAssets, ReportLiabilities, ReportProfitLoss
+from pydantic import BaseModel, create_model
+from ..schemas import CompareRow,CompareResponse,PeerPercentiles
+from .scoring_models import SCORING_MODELS, ScoringModel, ALTMAN_ZONES, TAFFLER_ZONES
+
+# Версия формул анализатора. Увеличивать при любом изменении расчета:
+# сохраненные результаты (report_analysis) с другой версией пересчитываются.
+ANALYZER_VERSION = 3
+
+# --- ВХОДНЫЕ ДАННЫЕ ---
+
+# Колонки, которые нужны анализатору: имя входа -> колонка БД.
+ANALYZER_INPUTS = {
+    "current_assets": ReportAssets.total_current_assets,
+    "non_current_assets": ReportAssets.total_non_current_assets,
+    "inventory": ReportAssets.inventory,
+    "cash": ReportAssets.cash_and_equivalents,
+    "receivables": ReportAssets.accounts_receivable,
+    "short_liabilities": ReportLiabilities.total_short_term_liabilities,
+    "long_liabilities": ReportLiabilities.total_long_term_liabilities,
+    "equity": ReportLiabilities.total_capital,
+    "retained_earnings": ReportLiabilities.retained_earnings,
+    "revenue": ReportProfitLoss.revenue,
+    "net_profit": ReportProfitLoss.net_profit,
+    "profit_before_tax": ReportProfitLoss.profit_before_tax,
+    "sales_profit": ReportProfitLoss.sales_profit,
+    "cost_of_sales": ReportProfitLoss.cost_of_sales,
+    "short_investments": ReportAssets.financial_investments_sec_section,
+    "payables": ReportLiabilities.accounts_payable,
+}
+
+
+# Все числовые строки отчета: имя -> колонка БД (в порядке объявления в моделях)
+LINE_ITEM_COLUMNS = {
+    column.key: getattr(model, column.key)
+    for model in (ReportAssets, ReportLiabilities, ReportProfitLoss)
+    for column in model.__table__.columns
+    if isinstance(column.type, Float)
+}
+
+# --- ГРАФ ПОКАЗАТЕЛЕЙ ---
+
+class Metric(NamedTuple):
+    name: str
+    inputs: tuple[str, ...]     # входы из ANALYZER_INPUTS или другие показатели
+    func: Callable
+    batch: Callable | None = None   # версия над массивами NumPy, если func с ними не работает
+
+
+# Имя с точкой ("liquidity.current_ratio") - поле ответа,
+# без точки ("total_assets") - промежуточный расчет.
+# Показатель может зависеть только от уже зарегистрированных, поэтому циклов нет.
+METRICS: dict[str, Metric] = {}
+
+
+def metric(name: str, *inputs: str, batch: Callable | None = None):
+    """
+    Регистрирует функцию расчета показателя вместе с ее входами.
+    Функция должна работать и с числами, и с массивами NumPy (см. _safe_div, _where);
+    если это невозможно, версия для массивов передается в batch.
+    """
+    def register(func):
+        for dep in inputs:
+            if dep not in ANALYZER_INPUTS and dep not in METRICS:
+                raise ValueError(f"Metric {name}: unknown input {dep}")
+        METRICS[name] = Metric(name, inputs, func, batch)
+        return func
+    return register
+
+
+def _round(value, digits: int):
+    """
+    Округление как у np.round (умножение, округление к четному, деление),
+    чтобы скалярный и пакетный расчет давали одинаковые числа:
+    round(1.5695, 3) == 1.569, а np.round дает 1.57
+    """
+    if isinstance(value, np.ndarray):
+        return np.round(value, digits)
+    scale = 10 ** digits
+    return round(value * scale) / scale
+
+
+def _safe_div(num, denom, digits: int = 4):
+    """Безопасное деление с округлением; массивы NumPy - через _safe_div_array"""
+    if isinstance(num, np.ndarray) or isinstance(denom, np.ndarray):
+        return _safe_div_array(num, denom, digits)
+    if denom == 0:
+        return 0.0
+    return _round(num / denom, digits)
+
+
+def _safe_div_array(num: np.ndarray, denom: np.ndarray, digits: int = 4) -> np.ndarray:
+    """Безопасное деление с округлением: где знаменатель 0, результат 0.0"""
+    out = np.zeros(np.broadcast(num, denom).shape)
+    np.divide(num, denom, out=out, where=denom != 0)
+    return np.round(out, digits)
+
+
+def _where(condition, value, other):
+    """value if condition else other - и для чисел, и поэлементно для массивов"""
+    if isinstance(condition, np.ndarray):
+        return np.where(condition, value, other)
+    return value if condition else other
+
+
+@metric("total_assets", "current_assets", "non_current_assets")
+def _total_assets(current_assets, non_current_assets):
+    # Если итог не сошелся или равен 0 (пустой отчет), ставим 1, чтобы не делить на ноль
+    total = current_assets + non_current_assets
+    return _where(total != 0, total, 1.0)
+
+
+@metric("total_liabilities", "short_liabilities", "long_liabilities")
+def _total_liabilities(short_liabilities, long_liabilities):
+    return short_liabilities + long_liabilities
+
+
+# ============================
+# ЛИКВИДНОСТЬ
+# ============================
+
+@metric("liquidity.current_ratio", "current_assets", "short_liabilities")
+def _current_ratio(current_assets, short_liabilities):
+    return _safe_div(current_assets, short_liabilities)
+
+
+@metric("liquidity.quick_ratio", "current_assets", "inventory", "short_liabilities")
+def _quick_ratio(current_assets, inventory, short_liabilities):
+    return _safe_div(current_assets - inventory, short_liabilities)
+
+
+@metric("liquidity.absolute_ratio", "cash", "short_liabilities")
+def _absolute_ratio(cash, short_liabilities):
+    return _safe_div(cash, short_liabilities)
+
+
+# ============================
+# РЕНТАБЕЛЬНОСТЬ
+# ============================
+
+@metric("profitability.ros", "net_profit", "revenue")
+def _ros(net_profit, revenue):
+    return _safe_div(net_profit, revenue) * 100
+
+
+@metric("profitability.roa", "net_profit", "total_assets")
+def _roa(net_profit, total_assets):
+    return _safe_div(net_profit, total_assets) * 100
+
+
+@metric("profitability.roe", "net_profit", "equity")
+def _roe(net_profit, equity):
+    return _safe_div(net_profit, equity) * 100
+
+
+# ============================
+# ДЕЛОВАЯ АКТИВНОСТЬ
+# ============================
+
+@metric("activity.asset_turnover", "revenue", "total_assets")
+def _asset_turnover(revenue, total_assets):
+    return _safe_div(revenue, total_assets)
+
+
+@metric("activity.inventory_days", "inventory", "cost_of_sales")
+def _inventory_days(inventory, cost_of_sales):
+    # Оборачиваемость запасов в днях.
+    # cost_of_sales часто отрицательный в отчете, берем модуль
+    return _safe_div(365 * inventory, abs(cost_of_sales), 1)
+
+
+# ============================
+# МОДЕЛИ БАНКРОТСТВА
+# ============================
+
+# Формулы моделей - в scoring_models.SCORING_MODELS. Каждая модель один раз
+# при импорте компилируется в две функции из одного исходного текста:
+# скалярную и векторную (узел графа {модель}_z берет ту, что подходит к входам).
+
+_FORMULA_FUNCTIONS = {"abs": "_abs", "max": "_max", "min": "_min"}
+_FORMULA_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.USub, ast.UAdd)
+_BAND_OPERATORS = {"<", "<=", ">", ">="}
+
+SCALAR_FORMULA_NAMESPACE = {"_div": _safe_div, "_abs": abs, "_max": max, "_min": min}
+BATCH_FORMULA_NAMESPACE = {
+    "_div": _safe_div_array, "_abs": np.abs, "_max": np.maximum, "_min": np.minimum, "_select": np.select,
+}
+
+
+class CompiledModel(NamedTuple):
+    model: ScoringModel
+    inputs: tuple[str, ...]     # Входы и промежуточные показатели, от которых зависит модель
+    scalar: Callable            # (*inputs) -> (оценка, индекс вывода в zones)
+    batch: Callable             # то же над массивами NumPy
+
+
+class _FormulaTransformer(ast.NodeTransformer):
+    """Проверяет формулу и заменяет деление и функции на безопасные версии"""
+
+    def __init__(self, model: str, allowed: set[str]):
+        self.model = model
+        self.allowed = allowed
+        self.names: list[str] = []
+
+    def _error(self, message: str):
+        raise ValueError(f"Scoring model {self.model}: {message}")
+
+    def visit_Name(self, node):
+        if node.id not in self.allowed:
+            self._error(f"unknown name {node.id}")
+        if node.id not in self.names:
+            self.names.append(node.id)
+        return node
+
+    def visit_Constant(self, node):
+        if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+            self._error(f"unsupported constant {node.value!r}")
+        return node
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _FORMULA_OPERATORS):
+            self._error(f"unsupported operator {type(node.op).__name__}")
+        node = self.generic_visit(node)
+        if isinstance(node.op, ast.Div):
+            return ast.Call(ast.Name("_div", ast.Load()), [node.left, node.right], [])
+        return node
+
+    def visit_UnaryOp(self, node):
+        if not isinstance(node.op, _FORMULA_OPERATORS):
+            self._error(f"unsupported operator {type(node.op).__name__}")
+        return self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FORMULA_FUNCTIONS or node.keywords:
+            self._error(f"unsupported call {ast.unparse(node)}")
+        node.args = [self.visit(arg) for arg in node.args]
+        node.func = ast.Name(_FORMULA_FUNCTIONS[node.func.id], ast.Load())
+        return node
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def generic_visit(self, node):
+        if not isinstance(node, (ast.BinOp, ast.UnaryOp, *_FORMULA_OPERATORS, ast.Load)):
+            self._error(f"unsupported syntax {type(node).__name__}")
+        return super().generic_visit(node)
+
+
+def _formula(transformer: _FormulaTransformer, text: str | float) -> str:
+    if not isinstance(text, str):
+        return repr(float(text))
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError:
+        raise ValueError(f"Scoring model {transformer.model}: invalid formula {text!r}")
+    return ast.unparse(transformer.visit(tree).body)
+
+
+def compile_scoring_model(model: ScoringModel, fields: set[str]) -> CompiledModel:
+    """
+    Переводит модель в исходный текст функции, например для Таффлера:
+        x1 = _div(sales_profit, short_liabilities)
+        ...
+        _z = 0.53 * x1 + 0.13 * x2 + 0.18 * x3 + 0.16 * x4
+    Деление и max/min берутся из пространства имен: скалярные или из NumPy.
+    """
+    bad = [name for name in model.factors if not name.isidentifier() or name in fields or name.startswith("_")]
+    if bad:
+        raise ValueError(f"Scoring model {model.name}: bad factor names {', '.join(bad)}")
+    if model.factors.keys() != model.coefficients.keys():
+        raise ValueError(f"Scoring model {model.name}: factors and coefficients differ")
+    for op, _, zone in model.bands:
+        if op not in _BAND_OPERATORS or zone not in model.zones:
+            raise ValueError(f"Scoring model {model.name}: bad band {op} -> {zone}")
+    if model.otherwise not in model.zones:
+        raise ValueError(f"Scoring model {model.name}: unknown zone {model.otherwise}")
+
+    factor_names = set()
+    transformer = _FormulaTransformer(model.name, set(fields))
+    lines = []
+    for factor, text in model.factors.items():
+        lines.append(f"{factor} = {_formula(transformer, text)}")
+        factor_names.add(factor)
+    terms = [f"{coef!r} * {factor}" for factor, coef in model.coefficients.items()]
+    if model.intercept:
+        terms.insert(0, repr(model.intercept))
+    lines.append(f"_z = {' + '.join(terms)}")
+
+    # В порогах доступны и факторы модели
+    transformer.allowed |= factor_names
+    conditions = [f"_z {op} {_formula(transformer, threshold)}" for op, threshold, _ in model.bands]
+    zones = [model.zones.index(zone) for _, _, zone in model.bands]
+    inputs = tuple(name for name in transformer.names if name in fields)
+
+    signature = ", ".join(inputs)
+    body = "".join(f"    {line}\n" for line in lines)
+    scalar_src = f"def scalar({signature}):\n{body}"
+    for condition, zone in zip(conditions, zones):
+        scalar_src += f"    if {condition}:\n        return _z, {zone}\n"
+    scalar_src += f"    return _z, {model.zones.index(model.otherwise)}\n"
+    batch_src = (
+        f"def batch({signature}):\n{body}"
+        f"    return _z, _select([{', '.join(conditions)}], {zones!r}, {model.zones.index(model.otherwise)})\n"
+    )
+
+    namespaces = {}
+    for name, src, namespace in (("scalar", scalar_src, SCALAR_FORMULA_NAMESPACE),
+                                 ("batch", batch_src, BATCH_FORMULA_NAMESPACE)):
+        namespace = dict(namespace)
+        exec(compile(src, f"<scoring model {model.name}>", "exec"), namespace)
+        namespaces[name] = namespace[name]
+    return CompiledModel(model, inputs, namespaces["scalar"], namespaces["batch"])
+
+
+def _register_scoring_model(compiled: CompiledModel):
+    model = compiled.model
+    zones = model.zones
+
+    zone_names = np.array(zones)
+
+    # Значение узла {модель}_z - пара (оценка, индекс вывода в zones)
+    @metric(f"{model.name}_z", *compiled.inputs, batch=compiled.batch)
+    def _z(*values):
+        return compiled.scalar(*values)
+
+    @metric(f"bankruptcy_{model.name}.score", f"{model.name}_z")
+    def _score(z):
+        return _round(z[0], 3)
+
+    @metric(f"bankruptcy_{model.name}.conclusion", f"{model.name}_z", batch=lambda z: zone_names[z[1]])
+    def _conclusion(z):
+        return zones[z[1]]
+
+
+_SCORING_FIELDS = set(ANALYZER_INPUTS) | {name for name in METRICS if "." not in name}
+COMPILED_MODELS = {model.name: compile_scoring_model(model, _SCORING_FIELDS) for model in SCORING_MODELS}
+for _compiled in COMPILED_MODELS.values():
+    _register_scoring_model(_compiled)
+
+
+# Все поля ответа в порядке регистрации
+ALL_FIELDS = [name for name in METRICS if "." in name]
+
 
 # --- СХЕМЫ ОТВЕТА (Pydantic) ---
-class AnalysisResultSchema(BaseModel):
-    liquidity: dict[str, float]
-    profitability: dict[str, float]
-    activity: dict[str, float]
-    bankruptcy_altman: dict[str, str | float]
-    bankruptcy_taffler: dict[str, str | float]
+
+# Группы моделей банкротства добавляются по SCORING_MODELS
+_MODEL_GROUPS = [f"bankruptcy_{name}" for name in COMPILED_MODELS]
+
+AnalysisResultSchema = create_model(
+    "AnalysisResultSchema",
+    liquidity=(dict[str, float], ...),
+    profitability=(dict[str, float], ...),
+    activity=(dict[str, float], ...),
+    **{group: (dict[str, str | float], ...) for group in _MODEL_GROUPS}
+)
+
+# Ответ при выборе полей (?fields=): только запрошенные группы и показатели
+PartialAnalysisResultSchema = create_model(
+    "PartialAnalysisResultSchema",
+    liquidity=(dict[str, float] | None, None),
+    profitability=(dict[str, float] | None, None),
+    activity=(dict[str, float] | None, None),
+    **{group: (dict[str, str | float] | None, None) for group in _MODEL_GROUPS},
+    percentiles=(PeerPercentiles | None, None)
+)
+
+
+def resolve_fields(fields: list[str]) -> list[str]:
+    """
+    Проверяет запрошенные поля. Имя группы ("liquidity") раскрывается
+    во все ее показатели. Неизвестные поля - ValueError.
+    """
+    resolved = []
+    unknown = []
+    for field in fields:
+        if field in ALL_FIELDS:
+            resolved.append(field)
+            continue
+        group = [name for name in ALL_FIELDS if name.startswith(f"{field}.")]
+        if group:
+            resolved.extend(group)
+        else:
+            unknown.append(field)
+
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(resolved))
+
+
+@lru_cache(maxsize=256)
+def _plan(fields: tuple[str, ...]) -> tuple[tuple[str, ...], tuple[Metric, ...]]:
+    """Нужные входы и показатели в порядке расчета (зависимости раньше зависящих)"""
+    inputs = set()
+    order = []
+    seen = set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        if name in ANALYZER_INPUTS:
+            inputs.add(name)
+            return
+        node = METRICS[name]
+        for dep in node.inputs:
+            visit(dep)
+        order.append(node)
+
+    for field in fields:
+        visit(field)
+    return tuple(name for name in ANALYZER_INPUTS if name in inputs), tuple(order)
+
+
+def required_inputs(fields: list[str]) -> list[str]:
+    """Входы ANALYZER_INPUTS, от которых зависят поля (обход графа)"""
+    return list(_plan(tuple(fields))[0])
+
+
+def evaluate_nodes(names, inputs, batch: bool = False) -> dict[str, object]:
+    """
+    Значения узлов графа names (полей, промежуточных расчетов или входов)
+    и всего, от чего они зависят; каждый узел считается один раз.
+    Без batch inputs - числа, NULL (None) считается 0.0.
+    С batch - массивы NumPy одной длины (NULL уже заменен на 0.0),
+    узлы считаются по всем позициям сразу.
+    """
+    needed, order = _plan(tuple(names))
+    if batch:
+        values = {name: inputs[name] for name in needed}
+    else:
+        values = {name: 0.0 if inputs[name] is None else float(inputs[name]) for name in needed}
+    for node in order:
+        func = node.batch if batch and node.batch is not None else node.func
+        values[node.name] = func(*[values[dep] for dep in node.inputs])
+    return values
+
+
+def _group_values(fields: tuple[str, ...], values: dict) -> dict[str, dict]:
+    result = {}
+    for group, name, field in _layout(fields):
+        result.setdefault(group, {})[name] = values[field]
+    return result
+
+
+def evaluate_metrics(fields: list[str], inputs) -> dict[str, dict]:
+    """
+    Считает только поля fields и то, от чего они зависят, каждый узел - один раз.
+    inputs - отображение имя входа -> значение; NULL (None) считается 0.0.
+    Результат сгруппирован как в AnalysisResultSchema.
+    """
+    fields = tuple(fields)
+    return _group_values(fields, evaluate_nodes(fields, inputs))
+
+
+def evaluate_metrics_batch(fields: list[str], columns: dict[str, np.ndarray]) -> dict[str, dict]:
+    """То же по тому же графу для многих отчетов: вход и показатель - массив, позиция на отчет"""
+    fields = tuple(fields)
+    return _group_values(fields, evaluate_nodes(fields, columns, batch=True))
+
+
+@lru_cache(maxsize=256)
+def _layout(fields: tuple[str, ...]) -> tuple[tuple[str, str, str], ...]:
+    return tuple((*field.split(".", 1), field) for field in fields)
+
+
+@lru_cache(maxsize=None)
+def _group_fields(group: str) -> tuple[str, ...]:
+    return tuple(resolve_fields([group]))
+
+
+def select_fields(analysis: dict, fields: list[str]) -> dict[str, dict]:
+    """Выборка полей из готового результата анализа"""
+    result = {}
+    for field in fields:
+        group, name = field.split(".", 1)
+        result.setdefault(group, {})[name] = analysis[group][name]
+    return result
+
 
 # --- АНАЛИЗАТОР ---
 class FinancialAnalyzer:
+    """
+    Анализ одного отчета. Формулы - в графе METRICS,
+    calc_* считают только показатели своей группы.
+    """
+
     def __init__(self, report: FinancialReport):
         self.report = report
         self.a = report.assets
         self.l = report.liabilities
         self.p = report.profit_loss
-        
-        self._prepare_data()
 
-    def _val(self, value) -> float:
-        """
-        Защита от None. Если в базе NULL, считаем как 0.0
-        """
-        if value is None:
-            return 0.0
-        return float(value)
-
-    def _prepare_data(self):
-        # Вспомогательная функция, чтобы собрать все нужные цифры в кучу
-        # и гарантировать, что они float, а не None.
-        
-        # 1. Активы
-        self.current_assets = self._val(self.a.total_current_assets)
-        self.non_current_assets = self._val(self.a.total_non_current_assets)
-        self.total_assets = self.current_assets + self.non_current_assets
-        # Если итог не сошелся или равен 0 (пустой отчет), ставим 1, чтобы не делить на ноль
-        if self.total_assets == 0: self.total_assets = 1.0
-
-        self.inventory = self._val(self.a.inventory)
-        self.cash = self._val(self.a.cash_and_equivalents)
-        self.receivables = self._val(self.a.accounts_receivable)
-        
-        # 2. Пассивы
-        self.short_liabilities = self._val(self.l.total_short_term_liabilities)
-        self.long_liabilities = self._val(self.l.total_long_term_liabilities)
-        self.total_liabilities = self.short_liabilities + self.long_liabilities
-        
-        self.equity = self._val(self.l.total_capital)
-        self.retained_earnings = self._val(self.l.retained_earnings)
-        
-        # 3. Прибыли
-        self.revenue = self._val(self.p.revenue)
-        self.net_profit = self._val(self.p.net_profit)
-        self.profit_before_tax = self._val(self.p.profit_before_tax)
-        self.sales_profit = self._val(self.p.sales_profit)
-        self.cost_of_sales = self._val(self.p.cost_of_sales)
-
-    def _safe_div(self, num: float, denom: float) -> float:
-        """Безопасное деление с округлением"""
-        if denom == 0:
-            return 0.0
-        return round(num / denom, 4)
+        sections = {ReportAssets: self.a, ReportLiabilities: self.l, ReportProfitLoss: self.p}
+        self.inputs = {
+            name: getattr(sections[column.class_], column.key) for name, column in ANALYZER_INPUTS.items()
+        }
+
+    def _calc_group(self, group: str) -> dict:
+        return evaluate_metrics(_group_fields(group), self.inputs)[group]
 
     # ============================
     # МЕТОДЫ РАСЧЕТА
     # ============================
 
     def calc_liquidity(self):
-        return {
-            "current_ratio": self._safe_div(self.current_assets, self.short_liabilities),
-            "quick_ratio": self._safe_div(self.current_assets - self.inventory, self.short_liabilities),
-            "absolute_ratio": self._safe_div(self.cash, self.short_liabilities),
-        }
+        return self._calc_group("liquidity")
 
     def calc_profitability(self):
-        return {
-            "ros": self._safe_div(self.net_profit, self.revenue) * 100,
-            "roa": self._safe_div(self.net_profit, self.total_assets) * 100,
-            "roe": self._safe_div(self.net_profit, self.equity) * 100,
-        }
+        return self._calc_group("profitability")
 
     def calc_activity(self):
-        # Оборачиваемость активов
-        asset_turnover = self._safe_div(self.revenue, self.total_assets)
-        
-        # Оборачиваемость запасов в днях
-        inventory_days = 0.0
-        if self.cost_of_sales != 0:
-            # cost_of_sales часто отрицательный в отчете, берем модуль
-            inventory_days = (365 * self.inventory) / abs(self.cost_of_sales)
-            
-        return {
-            "asset_turnover": asset_turnover,
-            "inventory_days": round(inventory_days, 1)
-        }
+        return self._calc_group("activity")
 
     def calc_altman(self):
-        # Модель Альтмана для частных компаний (5-факторная)
-        working_capital = self.current_assets - self.short_liabilities
-        
-        x1 = self._safe_div(working_capital, self.total_assets)
-        x2 = self._safe_div(self.retained_earnings, self.total_assets)
-        x3 = self._safe_div(self.profit_before_tax, self.total_assets)
-        x4 = self._safe_div(self.equity, self.total_liabilities)
-        x5 = self._safe_div(self.revenue, self.total_assets)
-
-        z = 0.717*x1 + 0.847*x2 + 3.107*x3 + 0.420*x4 + 0.998*x5
-        
-        if z < 1.23: conclusion = "Высокая вероятность банкротства"
-        elif z > 2.9: conclusion = "Финансовое состояние устойчивое"
-        else: conclusion = "Зона неопределенности"
-
-        return {"score": round(z, 3), "conclusion": conclusion}
+        return self._calc_group("bankruptcy_altman")
 
     def calc_taffler(self):
-        # Модель Таффлера (4-факторная)
-        x1 = self._safe_div(self.sales_profit, self.short_liabilities)
-        x2 = self._safe_div(self.current_assets, self.total_liabilities)
-        x3 = self._safe_div(self.short_liabilities, self.total_assets)
-        x4 = self._safe_div(self.revenue, self.total_assets)
-        
-        z = 0.53*x1 + 0.13*x2 + 0.18*x3 + 0.16*x4
-        
-        if z > 0.3: conclusion = "Риск банкротства низкий"
-        elif z < 0.2: conclusion = "Риск банкротства высокий"
-        else: conclusion = "Ситуация неопределенная"
-
-        return {"score": round(z, 3), "conclusion": conclusion}
+        return self._calc_group("bankruptcy_taffler")
+
+    def calc_model(self, name: str):
+        """Любая модель банкротства из SCORING_MODELS"""
+        return self._calc_group(f"bankruptcy_{name}")
 
     # ============================
     # ГЛАВНЫЙ МЕТОД
     # ============================
     def get_full_analysis(self) -> AnalysisResultSchema:
-        return AnalysisResultSchema(
-            liquidity=self.calc_liquidity(),
-            profitability=self.calc_profitability(),
-            activity=self.calc_activity(),
-            bankruptcy_altman=self.calc_altman(),
-            bankruptcy_taffler=self.calc_taffler()
-        )
+        return AnalysisResultSchema(**evaluate_metrics(ALL_FIELDS, self.inputs))
 
-class ReportComparator:
+# --- ПАКЕТНЫЙ АНАЛИЗАТОР ---
+
+class BatchFinancialAnalyzer:
     """
-    Сервис для горизонтального анализа (сравнения двух отчетов)
+    Тот же расчет, что и в FinancialAnalyzer, но сразу для многих отчетов:
+    каждый вход - массив NumPy, одна позиция на отчет. Формулы те же - граф METRICS,
+    поэтому результаты совпадают со скалярными до бита.
     """
-    
+
+    def __init__(self, columns: dict[str, np.ndarray]):
+        size = len(next(iter(columns.values()))) if columns else 0
+        self.inputs = {}
+        for name in ANALYZER_INPUTS:
+            # NULL из базы приходит как NaN, считаем его 0.0 (как evaluate_metrics - None)
+            values = np.asarray(columns.get(name, np.zeros(size)), dtype=float)
+            self.inputs[name] = np.where(np.isnan(values), 0.0, values)
+        self.size = size
+
+    @classmethod
+    def from_rows(cls, rows) -> "BatchFinancialAnalyzer":
+        """rows - кортежи значений в порядке ANALYZER_INPUTS"""
+        matrix = np.array(rows, dtype=float).reshape(-1, len(ANALYZER_INPUTS))
+        return cls({name: matrix[:, i] for i, name in enumerate(ANALYZER_INPUTS)})
+
+    @classmethod
+    def from_reports(cls, reports: list[FinancialReport]) -> "BatchFinancialAnalyzer":
+        sections = {"assets": ReportAssets, "liabilities": ReportLiabilities, "profit_loss": ReportProfitLoss}
+        names, getters = [], []
+        for section, model in sections.items():
+            fields = {name: c.key for name, c in ANALYZER_INPUTS.items() if c.class_ is model}
+            names.extend(fields)
+            getters.append((section, attrgetter(*fields.values())))
+
+        matrix = np.array([
+            [value for section, getter in getters for value in getter(getattr(report, section))]
+            for report in reports
+        ], dtype=float).reshape(-1, len(names))
+        return cls({name: matrix[:, i] for i, name in enumerate(names)})
+
+    def _calc_group(self, group: str) -> dict[str, np.ndarray]:
+        return evaluate_metrics_batch(_group_fields(group), self.inputs)[group]
+
+    def calc_liquidity(self):
+        return self._calc_group("liquidity")
+
+    def calc_profitability(self):
+        return self._calc_group("profitability")
+
+    def calc_activity(self):
+        return self._calc_group("activity")
+
+    def calc_model(self, name: str):
+        """Модель банкротства из SCORING_MODELS: оценка и вывод по каждому отчету"""
+        return self._calc_group(f"bankruptcy_{name}")
+
+    def calc_altman(self):
+        return self.calc_model("altman")
+
+    def calc_taffler(self):
+        return self.calc_model("taffler")
+
+    def get_full_analysis(self) -> dict[str, dict[str, list]]:
+        """Результат по колонкам: группа -> показатель -> список значений по отчетам"""
+        groups = evaluate_metrics_batch(ALL_FIELDS, self.inputs)
+        return {
+            group: {name: values.tolist() for name, values in metrics.items()}
+            for group, metrics in groups.items()
+        }
+
+    def get_analysis_list(self) -> list[AnalysisResultSchema]:
+        """Тот же результат в виде AnalysisResultSchema на каждый отчет"""
+        columns = self.get_full_analysis()
+        return [
+            AnalysisResultSchema(**{
+                group: {name: values[i] for name, values in metrics.items()}
+                for group, metrics in columns.items()
+            })
+            for i in range(self.size)
+        ]
+
+
+# --- СЦЕНАРНЫЙ АНАЛИЗ ---
+
+# Куда еще переносится изменение входа: составляющая меняет итог раздела,
+# выручка, себестоимость и прибыль - нижестоящие строки прибыли
+SCENARIO_ROLLUPS = {
+    "inventory": ("current_assets",),
+    "cash": ("current_assets",),
+    "receivables": ("current_assets",),
+    "short_investments": ("current_assets",),
+    "payables": ("short_liabilities",),
+    "retained_earnings": ("equity",),
+    "revenue": ("sales_profit", "profit_before_tax", "net_profit"),
+    "cost_of_sales": ("sales_profit", "profit_before_tax", "net_profit"),
+    "sales_profit": ("profit_before_tax", "net_profit"),
+    "profit_before_tax": ("net_profit",),
+}
+# Расходы: в отчете могут стоять и со знаком минус, и без него, а рост расхода
+# по модулю всегда уменьшает прибыль
+SCENARIO_EXPENSES = {"cost_of_sales"}
+
+SCORE_PERCENTILES = (5, 25, 50, 75, 95)
+HISTOGRAM_BINS = 20
+
+
+class ScenarioAnalyzer:
+    """
+    Устойчивость выводов Альтмана и Таффлера к изменению входов.
+    Каждый сценарий - строка пакетного анализатора: все сценарии считаются
+    одним вызовом BatchFinancialAnalyzer. Изменения задаются как
+    относительные (-0.15 = минус 15%) и переносятся по SCENARIO_ROLLUPS.
+    """
+
+    def __init__(self, inputs):
+        self.base = {name: 0.0 if inputs[name] is None else float(inputs[name]) for name in ANALYZER_INPUTS}
+
+    def _columns(self, changes: dict[str, np.ndarray], size: int) -> dict[str, np.ndarray]:
+        columns = {name: np.full(size, value) for name, value in self.base.items()}
+        for name, change in changes.items():
+            delta = self.base[name] * change
+            columns[name] = columns[name] + delta
+            if name in SCENARIO_EXPENSES:
+                delta = -abs(self.base[name]) * change
+            for total in SCENARIO_ROLLUPS.get(name, ()):
+                columns[total] = columns[total] + delta
+        return columns
+
     @staticmethod
-    def compare(base_rep: FinancialReport, curr_rep: FinancialReport) -> CompareResponse:
-        
-        def calc_row(name: str, val_base, val_curr) -> CompareRow:
-
-            v1 = float(val_base) if val_base is not None else 0.0
-            v2 = float(val_curr) if val_curr is not None else 0.0
-            
-            diff = v2 - v1
-            growth = 0.0
-            
-            if v1 != 0:
-                growth = (diff / abs(v1)) * 100
-                
-            return CompareRow(
-                indicator=name,
-                value_base=v1,
-                value_curr=v2,
-                abs_change=round(diff, 2),
-                growth_rate=round(growth, 2)
-            )
+    def _sample(rng: np.random.Generator, spec, size: int) -> np.ndarray:
+        if spec.distribution == "normal":
+            return rng.normal(spec.mean, spec.std, size)
+        if spec.distribution == "uniform":
+            return rng.uniform(spec.low, spec.high, size)
+        return rng.triangular(spec.low, spec.mode, spec.high, size)
+
+    @staticmethod
+    def _distribution(base: float, scores: np.ndarray, conclusions: np.ndarray, zones: tuple[str, ...]) -> dict:
+        counts, edges = np.histogram(scores, bins=HISTOGRAM_BINS)
+        return {
+            "base": base,
+            "mean": round(float(scores.mean()), 3),
+            "std": round(float(scores.std()), 3),
+            "percentiles": {
+                f"p{q}": round(float(value), 3)
+                for q, value in zip(SCORE_PERCENTILES, np.percentile(scores, SCORE_PERCENTILES))
+            },
+            "zones": {zone: round(float(np.mean(conclusions == zone)), 4) for zone in zones},
+            "histogram_edges": np.round(edges, 3).tolist(),
+            "histogram_counts": counts.tolist(),
+        }
+
+    def simulate(self, perturbations: list, scenarios: int, seed: int | None = None) -> dict:
+        """
+        Monte Carlo: perturbations - список с полями input, distribution и параметрами
+        распределения (ScenarioPerturbation). Первая строка пакета - базовый отчет.
+        """
+        unknown = [p.input for p in perturbations if p.input not in ANALYZER_INPUTS]
+        if unknown:
+            raise ValueError(f"Unknown inputs: {', '.join(unknown)}")
 
+        rng = np.random.default_rng(seed)
+        changes = {}
+        for spec in perturbations:
+            sample = self._sample(rng, spec, scenarios)
+            changes[spec.input] = changes.get(spec.input, 0.0) + np.concatenate(([0.0], sample))
+
+        analyzer = BatchFinancialAnalyzer(self._columns(changes, scenarios + 1))
+        altman, taffler = analyzer.calc_altman(), analyzer.calc_taffler()
+        return {
+            "altman": self._distribution(
+                float(altman["score"][0]), altman["score"][1:], altman["conclusion"][1:], ALTMAN_ZONES
+            ),
+            "taffler": self._distribution(
+                float(taffler["score"][0]), taffler["score"][1:], taffler["conclusion"][1:], TAFFLER_ZONES
+            ),
+        }
+
+    def sensitivities(self, shock: float) -> dict[str, list[dict]]:
+        """
+        Торнадо: каждый вход по отдельности меняется на -shock и +shock.
+        Все 2 * N вариантов плюс база - один пакет; входы отсортированы по размаху.
+        """
+        names = list(ANALYZER_INPUTS)
+        size = 2 * len(names) + 1
+        changes = {}
+        for i, name in enumerate(names):
+            change = np.zeros(size)
+            change[1 + 2 * i] = -shock
+            change[2 + 2 * i] = shock
+            changes[name] = change
+
+        analyzer = BatchFinancialAnalyzer(self._columns(changes, size))
+        result = {}
+        for model, scores in (("altman", analyzer.calc_altman()["score"]),
+                              ("taffler", analyzer.calc_taffler()["score"])):
+            rows = [
+                {"input": name, "low": float(scores[1 + 2 * i]), "high": float(scores[2 + 2 * i])}
+                for i, name in enumerate(names)
+            ]
+            rows.sort(key=lambda row: abs(row["high"] - row["low"]), reverse=True)
+            result[model] = rows
+        return result
+
+
+# Показатели краткого сравнения (POST /reports/compare): название -> строка compare_matrix
+COMPARE_INDICATORS = {
+    "Выручка": "revenue",
+    "Чистая прибыль": "net_profit",
+    "Валюта баланса": "balance_total",
+    "Собственный капитал": "total_capital",   # важный показатель устойчивости
+}
+
+
+class ReportComparator:
+    """
+    Сервис для горизонтального анализа (сравнения отчетов)
+    """
+
+    @staticmethod
+    def compare(organization: str, periods: tuple[str, str], reports: list[tuple]) -> CompareResponse:
+        """
+        Сравнение двух отчетов по COMPARE_INDICATORS. Это выборка строк из compare_matrix,
+        поэтому числа совпадают с /compare/matrix. reports - значения базового и текущего
+        отчета в порядке LINE_ITEM_COLUMNS, periods - их периоды.
+        """
+        matrix = ReportComparator.compare_matrix(reports)
+        index = {name: i for i, name in enumerate(matrix["indicators"])}
         rows = []
-        
-        # 1. Выручка
-        rows.append(calc_row("Выручка", base_rep.profit_loss.revenue, curr_rep.profit_loss.revenue))
-        
-        # 2. Чистая прибыль
-        rows.append(calc_row("Чистая прибыль", base_rep.profit_loss.net_profit, curr_rep.profit_loss.net_profit))
-        
-        # 3. Валюта баланса (Активы)
-        assets_base = (base_rep.assets.total_current_assets or 0) + (base_rep.assets.total_non_current_assets or 0)
-        assets_curr = (curr_rep.assets.total_current_assets or 0) + (curr_rep.assets.total_non_current_assets or 0)
-        
-        rows.append(calc_row("Валюта баланса", assets_base, assets_curr))
-        
-        # 4. Собственный капитал (важный показатель устойчивости)
-        rows.append(calc_row("Собственный капитал", base_rep.liabilities.total_capital, curr_rep.liabilities.total_capital))
+        for title, name in COMPARE_INDICATORS.items():
+            i = index[name]
+            rows.append(CompareRow(
+                indicator=title,
+                value_base=matrix["values"][i][0],
+                value_curr=matrix["values"][i][1],
+                abs_change=matrix["abs_change"][i][1],
+                growth_rate=matrix["growth_rate"][i][1],
+            ))
 
         return CompareResponse(
-            organization=base_rep.organization_name,
-            period_base=base_rep.period,
-            period_curr=curr_rep.period,
+            organization=organization,
+            period_base=periods[0],
+            period_curr=periods[1],
             rows=rows
-        )
\ No newline at end of file
+        )
+
+    @staticmethod
+    def compare_matrix(reports: list[tuple]) -> dict[str, list[list[float]]]:
+        """
+        Горизонтальный и вертикальный анализ сразу по N отчетам.
+        reports - значения каждого отчета в порядке LINE_ITEM_COLUMNS; внутри это
+        матрица показатели x отчеты. NULL считается 0.0, изменения - к первому (базовому) отчету.
+        После строк отчета идет расчетная строка balance_total - валюта баланса
+        (итоги разделов I и II).
+        Доля строки баланса - от валюты баланса, строки ОФР - от выручки (%).
+        """
+        values = np.array(reports, dtype=float).reshape(len(reports), len(LINE_ITEM_COLUMNS)).T
+        values = np.where(np.isnan(values), 0.0, values)
+        names = list(LINE_ITEM_COLUMNS)
+
+        balance_total = values[names.index("total_current_assets")] + values[names.index("total_non_current_assets")]
+        values = np.vstack([values, balance_total])
+        names.append("balance_total")
+
+        base = values[:, :1]
+        abs_change = values - base
+        growth_rate = np.zeros(values.shape)
+        np.divide(abs_change, np.abs(base), out=growth_rate, where=base != 0)
+
+        revenue = values[names.index("revenue")]
+        is_profit_loss = np.array([column.class_ is ReportProfitLoss for column in LINE_ITEM_COLUMNS.values()] + [False])
+        denominator = np.where(is_profit_loss[:, np.newaxis], revenue, balance_total)
+        share = np.zeros(values.shape)
+        np.divide(values, denominator, out=share, where=denominator != 0)
+
+        return {
+            "indicators": names,
+            "values": values.tolist(),
+            "abs_change": np.round(abs_change, 2).tolist(),
+            "growth_rate": np.round(growth_rate * 100, 2).tolist(),
+            "share": np.round(share * 100, 2).tolist(),
+        }
+
+
+# --- ДИНАМИКА ПО ПЕРИОДАМ ---
+
+_YEAR_RE = re.compile(r"(19|20)\d{2}")
+
+
+def _period_sort_key(period: str):
+    """Периоды с годом - по году, без года - в конце по названию"""
+    match = _YEAR_RE.search(period)
+    return (0, int(match.group(0)), period) if match else (1, 0, period)
+
+
+class TrendAnalyzer:
+    """
+    Горизонтальный анализ организации за много периодов.
+    Значения лежат в матрице: строка - период (по возрастанию), колонка - показатель,
+    все изменения считаются сразу по всей матрице. NULL хранится как NaN,
+    в ответе это None; изменения с пропущенным значением тоже None.
+    """
+
+    def __init__(self, periods: list[str], report_ids: list[int], indicators: list[str], values: np.ndarray):
+        self.periods = periods
+        self.report_ids = report_ids
+        self.indicators = indicators
+        self.values = values
+
+    @classmethod
+    def from_rows(cls, rows, indicators: list[str]) -> "TrendAnalyzer":
+        """
+        rows - кортежи (id отчета, период, значения в порядке indicators), по возрастанию id.
+        Если за период несколько отчетов, берется последний загруженный.
+        """
+        by_period = {}
+        for row in rows:
+            by_period[row[1]] = row
+
+        periods = sorted(by_period, key=_period_sort_key)
+        matrix = np.array(
+            [by_period[period][2:] for period in periods], dtype=float
+        ).reshape(len(periods), len(indicators))
+        return cls(periods, [by_period[period][0] for period in periods], indicators, matrix)
+
+    def _positions(self) -> np.ndarray:
+        """Положение периодов на оси времени: годы, если они есть у всех периодов, иначе номера"""
+        years = [_YEAR_RE.search(period) for period in self.periods]
+        if all(years):
+            return np.array([int(match.group(0)) for match in years], dtype=float)
+        return np.arange(len(self.periods), dtype=float)
+
+    def calc_changes(self) -> tuple[np.ndarray, np.ndarray]:
+        """Абсолютное изменение и темп прироста (%) к предыдущему периоду"""
+        prev, curr = self.values[:-1], self.values[1:]
+
+        abs_change = np.full(self.values.shape, np.nan)
+        abs_change[1:] = curr - prev
+
+        growth_rate = np.full(self.values.shape, np.nan)
+        np.divide(abs_change[1:], np.abs(prev), out=growth_rate[1:],
+                  where=(prev != 0) & ~np.isnan(prev) & ~np.isnan(curr))
+        return np.round(abs_change, 2), np.round(growth_rate * 100, 2)
+
+    def calc_cagr(self) -> np.ndarray:
+        """
+        Среднегодовой темп роста (%) между первым и последним известным значением.
+        Определен только для положительных значений и ненулевого промежутка.
+        """
+        valid = ~np.isnan(self.values)
+        columns = np.arange(len(self.indicators))
+        first = valid.argmax(axis=0)
+        last = len(self.periods) - 1 - valid[::-1].argmax(axis=0)
+
+        first_value = self.values[first, columns]
+        last_value = self.values[last, columns]
+        positions = self._positions()
+        span = positions[last] - positions[first]
+
+        defined = valid.any(axis=0) & (span > 0) & (first_value > 0) & (last_value > 0)
+        ratio = np.ones(len(self.indicators))
+        np.divide(last_value, first_value, out=ratio, where=defined)
+        exponent = np.zeros(len(self.indicators))
+        np.divide(1.0, span, out=exponent, where=defined)
+
+        cagr = np.where(defined, (np.power(ratio, exponent) - 1) * 100, np.nan)
+        return np.round(cagr, 2)
+
+    @staticmethod
+    def _to_lists(matrix: np.ndarray) -> list[list]:
+        """Матрица периоды x показатели -> список рядов по показателям, NaN -> None"""
+        data = matrix.T.astype(object)
+        data[np.isnan(matrix.T)] = None
+        return data.tolist()
+
+    def get_trend(self) -> dict:
+        abs_change, growth_rate = self.calc_changes()
+        cagr = self.calc_cagr()
+
+        columns = zip(
+            self.indicators,
+            self._to_lists(self.values),
+            self._to_lists(abs_change),
+            self._to_lists(growth_rate),
+            self._to_lists(cagr[np.newaxis, :]),
+        )
+        return {
+            "periods": self.periods,
+            "report_ids": self.report_ids,
+            "series": [
+                {
+                    "indicator": name,
+                    "values": values,
+                    "abs_change": changes,
+                    "growth_rate": growth,
+                    "cagr": total[0],
+                }
+                for name, values, changes, growth, total in columns
+            ],
+        }
+
@@ -0,0 +1,120 @@
+"""
+
+Кэш отрисованных PDF на диске
+
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from ..config import PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES
+
+
+class PdfCache:
+    """
+    Файлы лежат в <root>/<первые 2 символа ключа>/<ключ>.pdf, ключ - SHA-256 от строки,
+    которая определяет содержимое (ETag выгрузки: id и версия отчета, версии анализатора
+    и генератора PDF). Новая версия дает новый ключ, старые файлы уходят при вытеснении.
+    Запись атомарная: сначала во временный файл, потом os.replace.
+    Суммарный размер ограничен max_bytes: при превышении удаляются файлы, которые дольше
+    всех не запрашивали (mtime обновляется при каждом попадании), до 90% лимита.
+    Каталог можно делить между процессами: размер каждый процесс пересчитывает по диску.
+    """
+
+    LOW_WATER = 0.9
+
+    def __init__(self, root: str | Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._size: int | None = None
+        self._lock = threading.Lock()
+
+    def path_for(self, identity: str) -> Path:
+        key = hashlib.sha256(identity.encode()).hexdigest()
+        return self.root / key[:2] / f"{key}.pdf"
+
+    def _files(self) -> list[os.DirEntry]:
+        if not self.root.is_dir():
+            return []
+        return [
+            entry
+            for bucket in os.scandir(self.root) if bucket.is_dir() and bucket.name != "tmp"
+            for entry in os.scandir(bucket.path) if entry.name.endswith(".pdf")
+        ]
+
+    def _get_sync(self, identity: str) -> Path | None:
+        path = self.path_for(identity)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    async def get(self, identity: str) -> Path | None:
+        """Путь к готовому файлу или None"""
+        if self.max_bytes <= 0:
+            return None
+        return await asyncio.to_thread(self._get_sync, identity)
+
+    def _put_sync(self, identity: str, data) -> Path:
+        target = self.path_for(identity)
+        tmp_dir = self.root / "tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry.stat().st_size for entry in self._files())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict(keep=target)
+        return target
+
+    def _evict(self, keep: Path):
+        """Удаляет самые давно запрошенные файлы, пока размер не станет LOW_WATER от лимита"""
+        entries = []
+        for entry in self._files():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        size = sum(entry[1] for entry in entries)
+        for _, file_size, path in entries:
+            if size <= self.max_bytes * self.LOW_WATER:
+                break
+            if path == str(keep):
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+        self._size = size
+
+    async def put(self, identity: str, data) -> Path | None:
+        """
+        Сохраняет PDF (bytes или memoryview) и возвращает путь к нему.
+        None - кэш выключен или файл больше всего лимита.
+        """
+        if self.max_bytes <= 0 or len(data) > self.max_bytes:
+            return None
+        return await asyncio.to_thread(self._put_sync, identity, data)
+
+
+pdf_cache = PdfCache(PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES)
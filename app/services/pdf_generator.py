@@ -6,6 +6,8 @@ from reportlab.pdfgen import canvas
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
+from .scoring_models import SCORING_MODELS
+
 
 CURRENT_DIR = Path(__file__).resolve().parent
 APP_DIR = CURRENT_DIR.parent 
@@ -25,11 +27,16 @@ except Exception as e:
     DEFAULT_FONT = 'Helvetica'
     BOLD_FONT = 'Helvetica-Bold'
 
+# Версия вида отчета: входит в ETag выгрузки PDF, увеличивать при любом изменении генератора
+PDF_GENERATOR_VERSION = 1
+
 class PDFGenerator:
     @staticmethod
     def generate_report(organization: str, period: str, data) -> BytesIO:
         buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=A4)
+        # invariant - без даты создания и случайного id документа: одинаковые данные дают
+        # одинаковые байты, поэтому ETag выгрузки строгий
+        p = canvas.Canvas(buffer, pagesize=A4, invariant=1)
         width, height = A4
 
         p.setFont(BOLD_FONT, 16)
@@ -73,10 +80,10 @@ class PDFGenerator:
             draw_section("Profitability Analysis (%)", data.profitability)
         if data.activity:
             draw_section("Business Activity", data.activity)
-        if data.bankruptcy_altman:
-            draw_section("Bankruptcy (Altman Model)", data.bankruptcy_altman)
-        if data.bankruptcy_taffler:
-            draw_section("Bankruptcy (Taffler Model)", data.bankruptcy_taffler)
+        for model in SCORING_MODELS:
+            section = getattr(data, f"bankruptcy_{model.name}", None)
+            if section:
+                draw_section(f"Bankruptcy ({model.title})", section)
 
         p.setFont(DEFAULT_FONT, 8)
         p.drawString(50, 30, "Generated by Enterprise Analysis Service")
@@ -0,0 +1,451 @@
+"""
+
+Сравнение с другими компаниями: скетчи квантилей показателей по периодам.
+
+Запись отчетов не трогает строку периода в peer_sketches: каждое добавление или удаление
+анализа - это INSERT строки peer_sketch_deltas (скетчи добавленных и удаленных значений).
+Чтение складывает строку периода с еще не слитыми дельтами, а merge_peer_sketch_deltas
+(в приложении - раз в PEER_SKETCH_MERGE_SECONDS, или из командной строки) переносит дельты
+в peer_sketches. Так параллельные загрузки не ждут друг друга на блокировке одной строки
+и не сталкиваются на первичном ключе при первом отчете периода. Если процесс записал
+для периода PEER_SKETCH_MAX_PENDING_DELTAS дельт, слияние запускается сразу, не дожидаясь
+интервала: число дельт, которые складывает чтение, не растет с потоком загрузок.
+
+"""
+import argparse
+import asyncio
+import logging
+import math
+from collections import Counter, defaultdict
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import (BULK_INSERT_BATCH_SIZE, PEER_SKETCH_ACCURACY, PEER_SKETCH_MAX_BUCKETS,
+                      PEER_SKETCH_MAX_PENDING_DELTAS)
+from ..models import FinancialReport, PeerSketch, PeerSketchDelta, ReportAnalysis
+from .math_engine import ALL_FIELDS
+
+
+logger = logging.getLogger(__name__)
+
+# Дельты, записанные этим процессом после последнего слияния, по периодам
+_pending_deltas: Counter[str] = Counter()
+# Событие фоновой задачи слияния (если она запущена): выставляется, когда дельт периода слишком много
+_merge_requested: asyncio.Event | None = None
+
+
+# Показатели, по которым считаются процентили (выводы-строки не участвуют)
+PEER_METRICS = [field for field in ALL_FIELDS if not field.endswith(".conclusion")]
+
+# Значения по модулю меньше этого считаются нулем
+MIN_MAGNITUDE = 1e-9
+
+
+class QuantileSketch:
+    """
+    Скетч квантилей с относительной точностью (по схеме DDSketch).
+    Значение x попадает в бакет ceil(log_gamma |x|), gamma = (1 + a) / (1 - a),
+    отрицательные значения и нули хранятся отдельно.
+    В отличие от t-digest и KLL счетчики бакетов точные, поэтому удаление отчета -
+    просто уменьшение счетчика, а скетчи разных процессов складываются.
+    При переполнении max_buckets младшие бакеты схлопываются в один (min_key).
+    """
+
+    def __init__(self, accuracy: float = PEER_SKETCH_ACCURACY, max_buckets: int = PEER_SKETCH_MAX_BUCKETS):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.positive: dict[int, int] = {}
+        self.negative: dict[int, int] = {}
+        self.zero_count = 0
+        self.min_key = {"positive": None, "negative": None}
+
+    @property
+    def count(self) -> int:
+        return sum(self.positive.values()) + sum(self.negative.values()) + self.zero_count
+
+    def _store(self, value: float) -> tuple[str, dict[int, int], int] | None:
+        """Хранилище и ключ бакета для значения; None - для нуля"""
+        if abs(value) < MIN_MAGNITUDE:
+            return None
+        side = "positive" if value > 0 else "negative"
+        key = math.ceil(math.log(abs(value)) / self._log_gamma)
+        min_key = self.min_key[side]
+        if min_key is not None and key < min_key:
+            key = min_key
+        return side, getattr(self, side), key
+
+    def add(self, value: float, count: int = 1):
+        target = self._store(value)
+        if target is None:
+            self.zero_count += count
+            return
+        _, store, key = target
+        store[key] = store.get(key, 0) + count
+
+    def remove(self, value: float, count: int = 1):
+        """Обратное add; значения, которых в скетче нет, игнорируются"""
+        target = self._store(value)
+        if target is None:
+            self.zero_count = max(0, self.zero_count - count)
+            return
+        _, store, key = target
+        left = store.get(key, 0) - count
+        if left > 0:
+            store[key] = left
+        else:
+            store.pop(key, None)
+
+    def merge(self, other: "QuantileSketch", sign: int = 1):
+        """
+        Прибавляет (sign=1) или вычитает (sign=-1) счетчики другого скетча той же точности.
+        Бакеты младше min_key попадают в него, как и при add.
+        """
+        if other.accuracy != self.accuracy:
+            raise ValueError("Sketches of different accuracy cannot be merged, rebuild them")
+        for side in ("positive", "negative"):
+            store = getattr(self, side)
+            min_key = self.min_key[side]
+            for key, count in getattr(other, side).items():
+                if min_key is not None and key < min_key:
+                    key = min_key
+                left = store.get(key, 0) + sign * count
+                if left > 0:
+                    store[key] = left
+                else:
+                    store.pop(key, None)
+        self.zero_count = max(0, self.zero_count + sign * other.zero_count)
+
+    def compact(self):
+        """Схлопывает младшие по модулю бакеты, пока их не станет max_buckets на знак"""
+        for side in ("positive", "negative"):
+            store = getattr(self, side)
+            if len(store) <= self.max_buckets:
+                continue
+            keys = sorted(store)
+            new_min = keys[len(keys) - self.max_buckets]
+            merged = sum(store.pop(key) for key in keys if key < new_min)
+            store[new_min] += merged
+            self.min_key[side] = new_min
+
+    def _bucket_value(self, key: int) -> float:
+        """Середина бакета: отличается от любого его значения не больше чем на accuracy"""
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def rank(self, value: float) -> float | None:
+        """
+        Доля значений меньше value (значения того же бакета - наполовину),
+        то есть процентиль value среди всех значений скетча, от 0 до 1.
+        """
+        total = self.count
+        if total == 0:
+            return None
+
+        target = self._store(value)
+        if target is None:
+            below = sum(self.negative.values()) + 0.5 * self.zero_count
+        else:
+            side, store, key = target
+            if side == "positive":
+                below = sum(self.negative.values()) + self.zero_count
+                below += sum(c for k, c in store.items() if k < key)
+            else:
+                # Чем больше ключ отрицательного бакета, тем меньше значения
+                below = sum(c for k, c in store.items() if k > key)
+            below += 0.5 * store.get(key, 0)
+        return below / total
+
+    def quantile(self, q: float) -> float | None:
+        """Значение q-квантиля (0 <= q <= 1) с относительной точностью accuracy"""
+        total = self.count
+        if total == 0:
+            return None
+
+        target = q * (total - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > target:
+                return -self._bucket_value(key)
+        seen += self.zero_count
+        if seen > target:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > target:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self.positive))
+
+    def to_dict(self) -> dict:
+        return {
+            "accuracy": self.accuracy,
+            "positive": [[key, count] for key, count in self.positive.items()],
+            "negative": [[key, count] for key, count in self.negative.items()],
+            "zero": self.zero_count,
+            "min_key": self.min_key,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls(accuracy=data["accuracy"])
+        sketch.positive = {key: count for key, count in data["positive"]}
+        sketch.negative = {key: count for key, count in data["negative"]}
+        sketch.zero_count = data["zero"]
+        sketch.min_key = dict(data["min_key"])
+        return sketch
+
+
+def _metric_value(analysis: dict, field: str):
+    group, name = field.split(".", 1)
+    return analysis.get(group, {}).get(name)
+
+
+def _load_sketches(data: dict) -> dict[str, QuantileSketch]:
+    return {
+        metric: QuantileSketch.from_dict(data[metric]) if metric in data else QuantileSketch()
+        for metric in PEER_METRICS
+    }
+
+
+def _apply_delta(sketches: dict[str, QuantileSketch], delta: dict):
+    """Применяет дельту (PeerSketchDelta.sketches) к скетчам периода"""
+    for key, sign in (("added", 1), ("removed", -1)):
+        for metric, data in delta.get(key, {}).items():
+            if metric in sketches:
+                sketches[metric].merge(QuantileSketch.from_dict(data), sign)
+
+
+def _sketch_values(analyses: list[dict]) -> dict:
+    """Скетчи показателей PEER_METRICS по списку результатов анализа"""
+    sketches = {}
+    for metric in PEER_METRICS:
+        sketch = QuantileSketch()
+        for analysis in analyses:
+            value = _metric_value(analysis, metric)
+            if value is not None:
+                sketch.add(value)
+        sketches[metric] = sketch.to_dict()
+    return sketches
+
+
+def update_peer_sketches(session: Session, added=(), removed=()):
+    """
+    Учитывает добавленные и удаленные результаты анализа: пары (период, результат).
+    Только INSERT в peer_sketch_deltas, по строке на период; ничего не блокирует.
+    Синхронная, потому что вызывается и из before_flush; из async-кода -
+    через AsyncSession.run_sync.
+    """
+    changes = defaultdict(lambda: ([], []))
+    for period, analysis in added:
+        changes[period][0].append(analysis)
+    for period, analysis in removed:
+        changes[period][1].append(analysis)
+    if not changes:
+        return
+
+    rows = []
+    for period, (to_add, to_remove) in changes.items():
+        sketches = {}
+        if to_add:
+            sketches["added"] = _sketch_values(to_add)
+        if to_remove:
+            sketches["removed"] = _sketch_values(to_remove)
+        rows.append({"period": period, "report_count": len(to_add) - len(to_remove), "sketches": sketches})
+    session.execute(insert(PeerSketchDelta), rows)
+
+    _pending_deltas.update(changes.keys())
+    if _merge_requested is not None and max(_pending_deltas.values()) >= PEER_SKETCH_MAX_PENDING_DELTAS:
+        _merge_requested.set()
+
+
+async def peer_percentiles(db: AsyncSession, period: str, analysis: dict) -> dict:
+    """
+    Процентили показателей отчета среди всех отчетов того же периода.
+    Строка периода из peer_sketches плюс еще не слитые дельты; время не зависит
+    от числа отчетов, только от числа дельт между слияниями. Оно ограничено: каждый процесс
+    приложения пишет не больше PEER_SKETCH_MAX_PENDING_DELTAS дельт периода до слияния
+    (плюс записанные, пока слияние идет). Если слияние в приложении выключено
+    (PEER_SKETCH_MERGE_SECONDS=0), дельты копятся до запуска из командной строки.
+    """
+    row = (await db.execute(select(PeerSketch).where(PeerSketch.period == period))).scalar_one_or_none()
+    deltas = (await db.execute(
+        select(PeerSketchDelta.report_count, PeerSketchDelta.sketches)
+        .where(PeerSketchDelta.period == period)
+        .order_by(PeerSketchDelta.id)
+    )).all()
+    if row is None and not deltas:
+        return {"period": period, "peers": 0, "ranks": {}}
+
+    sketches = _load_sketches(row.sketches if row is not None else {})
+    peers = row.report_count if row is not None else 0
+    for report_count, delta in deltas:
+        _apply_delta(sketches, delta)
+        peers += report_count
+
+    ranks = {}
+    for metric, sketch in sketches.items():
+        value = _metric_value(analysis, metric)
+        if value is None:
+            continue
+        rank = sketch.rank(value)
+        if rank is not None:
+            ranks[metric] = round(rank * 100, 1)
+    return {"period": period, "peers": max(0, peers), "ranks": ranks}
+
+
+# ============================
+# ОБСЛУЖИВАНИЕ
+# ============================
+
+async def _insert_missing_sketches(db: AsyncSession, periods: list[str]):
+    """Пустые строки peer_sketches для новых периодов; уже существующие не трогаются"""
+    rows = [{"period": period, "report_count": 0, "sketches": {}} for period in periods]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        await db.execute(dialect_insert(PeerSketch).on_conflict_do_nothing(index_elements=["period"]), rows)
+        return
+    for row in rows:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(PeerSketch), [row])
+        except IntegrityError:
+            pass
+
+
+async def merge_peer_sketch_deltas(db: AsyncSession) -> int:
+    """
+    Переносит накопленные дельты в peer_sketches и схлопывает переполненные скетчи.
+    Строки периодов блокируются до чтения дельт, поэтому параллельные слияния
+    (несколько процессов приложения) не применят одну дельту дважды; загрузки
+    при этом не ждут - они только добавляют новые дельты. Возвращает число периодов.
+    """
+    periods = sorted((await db.execute(select(PeerSketchDelta.period).distinct())).scalars())
+    if not periods:
+        return 0
+
+    await _insert_missing_sketches(db, periods)
+    rows = (await db.execute(
+        select(PeerSketch).where(PeerSketch.period.in_(periods)).order_by(PeerSketch.period).with_for_update()
+    )).scalars().all()
+    deltas = (await db.execute(
+        select(PeerSketchDelta).where(PeerSketchDelta.period.in_(periods)).order_by(PeerSketchDelta.id)
+    )).scalars().all()
+
+    by_period = defaultdict(list)
+    for delta in deltas:
+        by_period[delta.period].append(delta)
+
+    for row in rows:
+        sketches = _load_sketches(row.sketches)
+        report_count = row.report_count or 0
+        for delta in by_period[row.period]:
+            _apply_delta(sketches, delta.sketches)
+            report_count += delta.report_count
+        for sketch in sketches.values():
+            sketch.compact()
+        # JSON-колонка не отслеживает изменения внутри, поэтому присваиваем заново
+        row.sketches = {metric: sketch.to_dict() for metric, sketch in sketches.items()}
+        row.report_count = max(0, report_count)
+
+    # Удаляются именно прочитанные дельты: новые, добавленные после чтения, ждут следующего слияния
+    delta_ids = [delta.id for delta in deltas]
+    for start in range(0, len(delta_ids), BULK_INSERT_BATCH_SIZE):
+        chunk = delta_ids[start:start + BULK_INSERT_BATCH_SIZE]
+        await db.execute(delete(PeerSketchDelta).where(PeerSketchDelta.id.in_(chunk)))
+    await db.commit()
+    return len(rows)
+
+
+async def merge_peer_sketches_periodically(interval: float, sessions=None):
+    """
+    Фоновая задача приложения: merge_peer_sketch_deltas раз в interval секунд
+    или раньше, если этот процесс записал PEER_SKETCH_MAX_PENDING_DELTAS дельт одного периода.
+    sessions - фабрика сессий (по умолчанию AsyncSessionLocal).
+    """
+    global _merge_requested
+    if sessions is None:
+        from ..database import AsyncSessionLocal as sessions
+
+    _merge_requested = requested = asyncio.Event()
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(requested.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            # Счетчик сбрасывается до слияния: дельты, записанные во время него, посчитаются заново
+            requested.clear()
+            _pending_deltas.clear()
+            try:
+                async with sessions() as db:
+                    await merge_peer_sketch_deltas(db)
+            except Exception:
+                # Дельты остаются в таблице и будут слиты в следующий раз
+                logger.exception("peer sketch merge failed")
+    finally:
+        _merge_requested = None
+
+
+async def rebuild_peer_sketches(db: AsyncSession, batch_size: int = BULK_INSERT_BATCH_SIZE) -> int:
+    """
+    Полная пересборка скетчей по report_analysis (накопленные дельты при этом удаляются).
+    Нужна после массовых изменений в обход ORM, после смены версии анализатора
+    (вместе с backfill) и после смены PEER_SKETCH_ACCURACY.
+    """
+    sketches: dict[str, dict[str, QuantileSketch]] = {}
+    counts: dict[str, int] = defaultdict(int)
+    last_id = 0
+    while True:
+        stmt = select(ReportAnalysis.report_id, FinancialReport.period, ReportAnalysis.result)\
+            .join(FinancialReport, FinancialReport.id == ReportAnalysis.report_id)\
+            .where(ReportAnalysis.report_id > last_id)\
+            .order_by(ReportAnalysis.report_id)\
+            .limit(batch_size)
+        rows = (await db.execute(stmt)).all()
+        if not rows:
+            break
+
+        for _, period, analysis in rows:
+            period_sketches = sketches.setdefault(period, {metric: QuantileSketch() for metric in PEER_METRICS})
+            for metric, sketch in period_sketches.items():
+                value = _metric_value(analysis, metric)
+                if value is not None:
+                    sketch.add(value)
+            counts[period] += 1
+        last_id = rows[-1][0]
+
+    await db.execute(delete(PeerSketchDelta))
+    await db.execute(delete(PeerSketch))
+    for period, period_sketches in sketches.items():
+        for sketch in period_sketches.values():
+            sketch.compact()
+        db.add(PeerSketch(
+            period=period,
+            report_count=counts[period],
+            sketches={metric: sketch.to_dict() for metric, sketch in period_sketches.items()}
+        ))
+    await db.commit()
+    return sum(counts.values())
+
+
+async def _main(rebuild: bool):
+    from ..database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        if rebuild:
+            print(f"Peer sketches rebuilt from {await rebuild_peer_sketches(db)} reports")
+        else:
+            print(f"Peer sketch deltas merged for {await merge_peer_sketch_deltas(db)} periods")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain peer percentile sketches")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild from report_analysis instead of merging deltas")
+    args = parser.parse_args()
+    asyncio.run(_main(args.rebuild))
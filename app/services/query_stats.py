@@ -0,0 +1,142 @@
+"""
+
+Статистика запросов к БД за один HTTP-запрос: число запросов, время, самый медленный;
+заголовок Server-Timing, журнал медленных запросов и поиск N+1
+
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..config import DB_N_PLUS_ONE_LIMIT, DB_SERVER_TIMING, DB_SLOW_QUERY_MS
+
+
+logger = logging.getLogger(__name__)
+
+# Списки параметров "(?, ?, ?)" / "(%(p_1)s, ...)" и числа сворачиваются:
+# IN по 3 и по 300 id - один и тот же запрос
+_PARAM_LIST_RE = re.compile(r"\(\s*(?:\?|%\([^)]*\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\([^)]*\)s|\$\d+|:\w+))*\s*\)")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Запрос без конкретных параметров - для поиска одного и того же запроса в цикле"""
+    shape = _PARAM_LIST_RE.sub("(?)", statement)
+    shape = _NUMBER_RE.sub("N", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+
+class QueryStats:
+    """Накопитель за один HTTP-запрос; заполняется обработчиками событий движка"""
+
+    def __init__(self, n_plus_one_limit: int = DB_N_PLUS_ONE_LIMIT):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement: str | None = None
+        self.n_plus_one_limit = n_plus_one_limit
+        self.shapes: Counter[str] | None = Counter() if n_plus_one_limit > 0 else None
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+        if self.shapes is not None:
+            self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self) -> list[tuple[str, int]]:
+        """Запросы одного вида, выполненные больше n_plus_one_limit раз (похоже на N+1)"""
+        if self.shapes is None:
+            return []
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > self.n_plus_one_limit]
+
+    def server_timing(self) -> str:
+        app_ms = (time.perf_counter() - self.started) * 1000
+        return ", ".join([
+            f'db;dur={self.total_ms:.2f};desc="{self.count} queries"',
+            f"db-slowest;dur={self.slowest_ms:.2f}",
+            f"app;dur={app_ms:.2f}",
+        ])
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+
+    if elapsed_ms >= DB_SLOW_QUERY_MS:
+        logger.warning("Slow query %.1f ms: %s", elapsed_ms, _SPACE_RE.sub(" ", statement)[:2000])
+
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+
+
+def _handle_error(exception_context):
+    # Упавший запрос: after_cursor_execute не будет, убираем его время начала
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Подключает учет запросов к движку (один раз при создании)"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI-middleware: заводит QueryStats на каждый HTTP-запрос и добавляет к ответу
+    Server-Timing (db - время и число запросов, db-slowest, app - все время до ответа).
+    Запросы после начала ответа (в потоковой отдаче) в заголовок не попадают.
+    В журнал пишутся запросы, у которых общее время в БД не меньше DB_SLOW_QUERY_MS
+    (с самым медленным запросом), и, если DB_N_PLUS_ONE_LIMIT > 0, запросы,
+    повторенные больше этого числа раз.
+    """
+
+    def __init__(self, app, n_plus_one_limit: int = DB_N_PLUS_ONE_LIMIT):
+        self.app = app
+        self.n_plus_one_limit = n_plus_one_limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(self.n_plus_one_limit)
+        token = _current.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and DB_SERVER_TIMING:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if stats.total_ms >= DB_SLOW_QUERY_MS:
+                logger.warning("Slow DB time %s %s: %.1f ms in %d queries, slowest %.1f ms: %s",
+                               scope.get("method"), scope.get("path"), stats.total_ms, stats.count,
+                               stats.slowest_ms, _SPACE_RE.sub(" ", stats.slowest_statement or "")[:2000])
+            for shape, count in stats.repeated():
+                logger.warning("Possible N+1: %s %s ran %d times: %s",
+                               scope.get("method"), scope.get("path"), count, shape[:2000])
@@ -0,0 +1,82 @@
+"""
+
+Список отчетов пользователя постранично по ключу (created_at, id)
+
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Literal
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import FinancialReport
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, report_id: int, order: str) -> str:
+    """Курсор - последняя строка страницы и направление сортировки в base64url; клиенту он непрозрачен"""
+    raw = json.dumps([created_at.isoformat(), report_id, order], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, report_id, cursor_order = json.loads(raw)
+        created_at = datetime.fromisoformat(created_at)
+    except (ValueError, TypeError):
+        raise InvalidCursorError("Invalid cursor")
+    if not isinstance(report_id, int) or cursor_order != order:
+        raise InvalidCursorError("Cursor does not match this listing")
+    return created_at, report_id
+
+
+async def list_reports(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    cursor: str | None = None,
+    organization: str | None = None,
+    period: str | None = None,
+    order: Literal["desc", "asc"] = "desc"
+) -> tuple[list, str | None]:
+    """
+    Страница отчетов пользователя, сортировка по (created_at, id).
+    Следующая страница начинается строго после ключа из курсора, а не через OFFSET,
+    поэтому любая страница читает по индексу (user_id, created_at DESC, id DESC) только limit + 1 строк.
+    organization - подстрока названия без учета регистра (и для кириллицы), period - точное совпадение.
+    Возвращает (строки id / organization_name / period / created_at, курсор следующей страницы или None).
+    """
+    key = tuple_(FinancialReport.created_at, FinancialReport.id)
+    stmt = select(
+            FinancialReport.id,
+            FinancialReport.organization_name,
+            FinancialReport.period,
+            FinancialReport.created_at
+        )\
+        .where(FinancialReport.user_id == user_id)
+
+    if order == "desc":
+        stmt = stmt.order_by(FinancialReport.created_at.desc(), FinancialReport.id.desc())
+    else:
+        stmt = stmt.order_by(FinancialReport.created_at, FinancialReport.id)
+    if cursor is not None:
+        # Типы колонок, а не выведенные из значений: в SQLite created_at сравнивается как строка того же вида
+        last_key = tuple_(*decode_cursor(cursor, order), types=[c.type for c in key.clauses])
+        stmt = stmt.where(key < last_key if order == "desc" else key > last_key)
+    if organization:
+        stmt = stmt.where(FinancialReport.organization_name_folded.contains(organization.casefold(), autoescape=True))
+    if period:
+        stmt = stmt.where(FinancialReport.period == period)
+
+    rows = (await db.execute(stmt.limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id, order)
@@ -0,0 +1,117 @@
+"""
+
+Модели оценки вероятности банкротства в декларативном виде
+
+"""
+from typing import NamedTuple
+
+
+class ScoringModel(NamedTuple):
+    """
+    Оценка = intercept + сумма coefficients[k] * factors[k].
+    Формулы факторов - выражения над входами анализатора и промежуточными
+    показателями (total_assets, total_liabilities): + - * /, abs, max, min.
+    Деление безопасное, как _safe_div: ноль в знаменателе дает 0.0, результат округляется до 4 знаков.
+    bands проверяются по порядку: (оператор, порог, вывод), порог - число или формула
+    (в ней доступны и факторы модели); если ни одно условие не выполнено - otherwise.
+    zones - все выводы модели от худшего к лучшему.
+    """
+    name: str                               # Группа в ответе: bankruptcy_<name>
+    title: str                              # Заголовок раздела в PDF
+    factors: dict[str, str]
+    coefficients: dict[str, float]
+    bands: tuple[tuple[str, float | str, str], ...]
+    otherwise: str
+    zones: tuple[str, ...]
+    intercept: float = 0.0
+
+
+ALTMAN_ZONES = ("Высокая вероятность банкротства", "Зона неопределенности", "Финансовое состояние устойчивое")
+TAFFLER_ZONES = ("Риск банкротства высокий", "Ситуация неопределенная", "Риск банкротства низкий")
+SPRINGATE_ZONES = ("Высокая вероятность банкротства", "Финансовое состояние устойчивое")
+SAIFULLIN_ZONES = ("Финансовое состояние неудовлетворительное", "Финансовое состояние удовлетворительное")
+ZAITSEVA_ZONES = ("Риск банкротства высокий", "Риск банкротства низкий")
+
+
+SCORING_MODELS = (
+    # Модель Альтмана для частных компаний (5-факторная)
+    ScoringModel(
+        name="altman",
+        title="Altman Model",
+        factors={
+            "x1": "(current_assets - short_liabilities) / total_assets",
+            "x2": "retained_earnings / total_assets",
+            "x3": "profit_before_tax / total_assets",
+            "x4": "equity / total_liabilities",
+            "x5": "revenue / total_assets",
+        },
+        coefficients={"x1": 0.717, "x2": 0.847, "x3": 3.107, "x4": 0.420, "x5": 0.998},
+        bands=(("<", 1.23, ALTMAN_ZONES[0]), ("<=", 2.9, ALTMAN_ZONES[1])),
+        otherwise=ALTMAN_ZONES[2],
+        zones=ALTMAN_ZONES,
+    ),
+    # Модель Таффлера (4-факторная)
+    ScoringModel(
+        name="taffler",
+        title="Taffler Model",
+        factors={
+            "x1": "sales_profit / short_liabilities",
+            "x2": "current_assets / total_liabilities",
+            "x3": "short_liabilities / total_assets",
+            "x4": "revenue / total_assets",
+        },
+        coefficients={"x1": 0.53, "x2": 0.13, "x3": 0.18, "x4": 0.16},
+        bands=(("<", 0.2, TAFFLER_ZONES[0]), ("<=", 0.3, TAFFLER_ZONES[1])),
+        otherwise=TAFFLER_ZONES[2],
+        zones=TAFFLER_ZONES,
+    ),
+    # Модель Спрингейта; EBIT приближенно равен прибыли до налогообложения
+    ScoringModel(
+        name="springate",
+        title="Springate Model",
+        factors={
+            "a": "(current_assets - short_liabilities) / total_assets",
+            "b": "profit_before_tax / total_assets",
+            "c": "profit_before_tax / short_liabilities",
+            "d": "revenue / total_assets",
+        },
+        coefficients={"a": 1.03, "b": 3.07, "c": 0.66, "d": 0.4},
+        bands=(("<", 0.862, SPRINGATE_ZONES[0]),),
+        otherwise=SPRINGATE_ZONES[1],
+        zones=SPRINGATE_ZONES,
+    ),
+    # Рейтинговое число Сайфуллина - Кадыкова
+    ScoringModel(
+        name="saifullin",
+        title="Saifullin-Kadykov Model",
+        factors={
+            "k1": "(equity - non_current_assets) / current_assets",    # Обеспеченность собственными средствами
+            "k2": "current_assets / short_liabilities",                # Текущая ликвидность
+            "k3": "revenue / total_assets",                            # Оборачиваемость активов
+            "k4": "sales_profit / revenue",                            # Коммерческая маржа
+            "k5": "net_profit / equity",                               # Рентабельность собственного капитала
+        },
+        coefficients={"k1": 2, "k2": 0.1, "k3": 0.08, "k4": 0.45, "k5": 1},
+        bands=(("<", 1, SAIFULLIN_ZONES[0]),),
+        otherwise=SAIFULLIN_ZONES[1],
+        zones=SAIFULLIN_ZONES,
+    ),
+    # Модель Зайцевой. Нормативное значение 1.57 + 0.1 * Kзаг считается
+    # по Kзаг текущего периода (в оригинале - по предыдущему году)
+    ScoringModel(
+        name="zaitseva",
+        title="Zaitseva Model",
+        factors={
+            "ku": "max(-net_profit, 0) / equity",                      # Убыток к собственному капиталу
+            "kz": "payables / receivables",                            # Кредиторская к дебиторской
+            "kc": "short_liabilities / (cash + short_investments)",    # Обязательства к ликвидным активам
+            "kur": "max(-net_profit, 0) / revenue",                    # Убыточность продаж
+            "kfr": "total_liabilities / equity",                       # Финансовый рычаг
+            "kzag": "total_assets / revenue",                          # Загрузка активов
+        },
+        coefficients={"ku": 0.25, "kz": 0.1, "kc": 0.2, "kur": 0.25, "kfr": 0.1, "kzag": 0.1},
+        bands=((">", "1.57 + 0.1 * kzag", ZAITSEVA_ZONES[0]),),
+        otherwise=ZAITSEVA_ZONES[1],
+        zones=ZAITSEVA_ZONES,
+    ),
+)
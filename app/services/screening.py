@@ -0,0 +1,205 @@
+"""
+
+Отбор отчетов по условию на показатели анализа (risk screening)
+
+"""
+import operator
+import re
+
+from sqlalchemy import and_, not_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import FinancialReport, ReportAnalysis
+from .analysis_store import METRIC_COLUMNS
+from .math_engine import ANALYZER_VERSION
+
+
+# Ограничение длины условия (в лексемах), чтобы не строить огромные запросы
+MAX_EXPRESSION_TOKENS = 128
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+      | (?P<name>[A-Za-z_][A-Za-z_.]*)
+      | (?P<op><=|>=|!=|==|=|<|>)
+      | (?P<paren>[()])
+    )""", re.VERBOSE)
+
+_COMPARISONS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+# Для "1 > bankruptcy_altman.score": меняем стороны местами
+_MIRRORED = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "=": "=", "==": "==", "!=": "!="}
+
+
+class ScreenExpressionError(ValueError):
+    pass
+
+
+def _tokenize(expression: str) -> list[tuple[str, str]]:
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = _TOKEN_RE.match(expression, pos)
+        if match is None or match.end() == pos:
+            raise ScreenExpressionError(f"Unexpected character at position {pos}: {expression[pos:pos + 10]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "name" and value.lower() in ("and", "or", "not"):
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    Рекурсивный спуск по грамматике:
+        expr       := and_expr ("or" and_expr)*
+        and_expr   := not_expr ("and" not_expr)*
+        not_expr   := "not" not_expr | "(" expr ")" | comparison
+        comparison := field op number | number op field
+    Результат - выражение SQLAlchemy над колонками report_analysis,
+    числа передаются как параметры запроса.
+    """
+
+    def __init__(self, tokens: list[tuple[str, str]]):
+        self.tokens = tokens
+        self.pos = 0
+        self.fields: list[str] = []
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _take(self, kind: str | None = None, value: str | None = None) -> str:
+        token_kind, token_value = self._peek()
+        if token_kind is None or (kind and token_kind != kind) or (value and token_value != value):
+            expected = value or kind or "token"
+            found = token_value if token_value is not None else "end of expression"
+            raise ScreenExpressionError(f"Expected {expected}, found {found!r}")
+        self.pos += 1
+        return token_value
+
+    def parse(self):
+        expr = self._expr()
+        if self.pos != len(self.tokens):
+            raise ScreenExpressionError(f"Unexpected {self.tokens[self.pos][1]!r}")
+        return expr
+
+    def _expr(self):
+        terms = [self._and_expr()]
+        while self._peek() == ("keyword", "or"):
+            self._take()
+            terms.append(self._and_expr())
+        return terms[0] if len(terms) == 1 else or_(*terms)
+
+    def _and_expr(self):
+        terms = [self._not_expr()]
+        while self._peek() == ("keyword", "and"):
+            self._take()
+            terms.append(self._not_expr())
+        return terms[0] if len(terms) == 1 else and_(*terms)
+
+    def _not_expr(self):
+        if self._peek() == ("keyword", "not"):
+            self._take()
+            return not_(self._not_expr())
+        if self._peek() == ("paren", "("):
+            self._take()
+            expr = self._expr()
+            self._take("paren", ")")
+            return expr
+        return self._comparison()
+
+    def _field(self, name: str):
+        column = METRIC_COLUMNS.get(name)
+        if column is None:
+            raise ScreenExpressionError(f"Unknown field {name!r}, available: {', '.join(METRIC_COLUMNS)}")
+        if name not in self.fields:
+            self.fields.append(name)
+        return column
+
+    def _comparison(self):
+        kind, _ = self._peek()
+        if kind == "name":
+            column = self._field(self._take("name"))
+            op = self._take("op")
+            number = float(self._take("number"))
+        else:
+            number = float(self._take("number"))
+            op = _MIRRORED[self._take("op")]
+            column = self._field(self._take("name"))
+        return _COMPARISONS[op](column, number)
+
+
+def parse_screen_expression(expression: str):
+    """
+    "bankruptcy_altman.score < 1.23 and liquidity.current_ratio < 1 or bankruptcy_taffler.score < 0.2"
+    -> (условие SQLAlchemy, список упомянутых полей). Ошибка - ScreenExpressionError.
+    """
+    tokens = _tokenize(expression)
+    if not tokens:
+        raise ScreenExpressionError("Empty expression")
+    if len(tokens) > MAX_EXPRESSION_TOKENS:
+        raise ScreenExpressionError("Expression is too long")
+    parser = _Parser(tokens)
+    return parser.parse(), parser.fields
+
+
+async def screen_reports(
+    db: AsyncSession,
+    expression: str,
+    limit: int,
+    after_id: int | None = None,
+    user_id: int | None = None,
+    fields: list[str] = ()
+) -> tuple[list[dict], int | None]:
+    """
+    Отчеты, чей сохраненный анализ удовлетворяет условию, по возрастанию id.
+    Постраничная выдача по ключу: следующая страница - с after_id = последний id.
+    Учитываются только результаты текущей версии анализатора (см. backfill_analysis).
+    Возвращает (совпадения, after_id следующей страницы или None).
+    """
+    condition, used_fields = parse_screen_expression(expression)
+    for name in fields:
+        if name not in METRIC_COLUMNS:
+            raise ScreenExpressionError(f"Unknown field {name!r}")
+    shown = list(dict.fromkeys([*used_fields, *fields]))
+
+    stmt = select(
+            ReportAnalysis.report_id,
+            FinancialReport.organization_name,
+            FinancialReport.period,
+            *[METRIC_COLUMNS[name] for name in shown]
+        )\
+        .join(FinancialReport, FinancialReport.id == ReportAnalysis.report_id)\
+        .where(ReportAnalysis.analyzer_version == ANALYZER_VERSION)\
+        .where(condition)\
+        .order_by(ReportAnalysis.report_id)\
+        .limit(limit + 1)
+    if after_id is not None:
+        stmt = stmt.where(ReportAnalysis.report_id > after_id)
+    if user_id is not None:
+        stmt = stmt.where(FinancialReport.user_id == user_id)
+
+    rows = (await db.execute(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    matches = [
+        {
+            "report_id": row[0],
+            "organization_name": row[1],
+            "period": row[2],
+            "metrics": dict(zip(shown, row[3:])),
+        }
+        for row in rows
+    ]
+    return matches, (rows[-1][0] if has_more else None)
@@ -0,0 +1,66 @@
+"""
+
+Форматы файлов отчетности: определение формата и выбор парсера
+
+"""
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+from .excel_parser import Source, parse_balance_sheet, run_in_pool
+from .csv_parser import parse_csv_statement
+from .fns_xml_parser import parse_fns_xml_statement
+
+
+HEAD_BYTES = 512
+
+
+class StatementFormat(NamedTuple):
+    name: str
+    detect: Callable[[bytes], bool]
+    parse: Callable[[Source], dict]
+
+
+def _is_xlsx(head: bytes) -> bool:
+    return head.startswith(b"PK\x03\x04")
+
+
+def _is_xml(head: bytes) -> bool:
+    return head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<")
+
+
+def _is_csv(head: bytes) -> bool:
+    # Текст без нулевых байтов; проверяется последним
+    return b"\x00" not in head
+
+
+# Порядок важен: первый подошедший формат и используется.
+# Новый формат = функция разбора + запись в этом списке.
+FORMATS: list[StatementFormat] = [
+    StatementFormat("xlsx", _is_xlsx, parse_balance_sheet),
+    StatementFormat("fns_xml", _is_xml, parse_fns_xml_statement),
+    StatementFormat("csv", _is_csv, parse_csv_statement),
+]
+
+
+def _read_head(source: Source) -> bytes:
+    if isinstance(source, bytes):
+        return source[:HEAD_BYTES]
+    with open(Path(source), "rb") as f:
+        return f.read(HEAD_BYTES)
+
+
+def detect_format(source: Source) -> StatementFormat:
+    head = _read_head(source)
+    for fmt in FORMATS:
+        if fmt.detect(head):
+            return fmt
+    raise ValueError("Unsupported file format")
+
+
+def parse_statement(source: Source) -> dict:
+    """Разбор файла любого поддерживаемого формата в словарь "поле -> значение" """
+    return detect_format(source).parse(source)
+
+
+async def parse_statement_async(source: Source) -> dict:
+    return await run_in_pool(parse_statement, source)
@@ -0,0 +1,275 @@
+"""
+
+Реестр шаблонов Excel-отчетов: отпечаток разметки листа -> координаты ячеек
+
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+from openpyxl.utils import get_column_letter
+from xml.etree.ElementTree import fromstring, iterparse
+
+
+_DIGITS_RE = re.compile(r"\d+")
+_CELL_REF_RE = re.compile(r"([A-Z]+)(\d+)")
+# Открывающий тег строки листа; атрибут r (номер строки) необязателен и стоит где угодно
+_ROW_START_RE = re.compile(rb'<row\b([^>]*)>')
+_ROW_REF_RE = re.compile(rb'\sr="(\d+)"')
+# Пустые ячейки с одним лишь стилем: в печатных формах 1С их большинство
+_EMPTY_CELL_RE = re.compile(rb'<c r="[A-Z]+\d+"[^>]*/>')
+# Ячейка без атрибута r: ее колонка - следующая за предыдущей ячейкой строки
+_CELL_WITHOUT_REF_RE = re.compile(rb'<c(?=[\s/>])(?![^>]*\sr=")')
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+
+def fingerprint_header(header_row_idx: int, header_row: tuple) -> str:
+    """
+    Отпечаток разметки по строке заголовка таблицы (той, где стоит "Код").
+    Цифры в подписях заменяются, чтобы "На 31 декабря 2023 г." и
+    "На 31 декабря 2024 г." давали один и тот же шаблон.
+    """
+    parts = [str(header_row_idx)]
+    for col, cell in enumerate(header_row):
+        if isinstance(cell, str) and cell.strip():
+            label = _DIGITS_RE.sub("#", " ".join(cell.lower().split()))
+            parts.append(f"{col}:{label}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class TemplateRegistry:
+    """
+    Небольшой реестр в JSON-файле. Разбор идет в нескольких процессах,
+    поэтому каждый процесс перечитывает файл при изменении mtime,
+    а запись делается атомарно (временный файл + os.replace).
+    При переполнении вытесняются самые старые шаблоны.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._templates: dict[str, dict] = {}
+        self._mtime: float | None = None
+
+    def _load(self):
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            self._templates, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._templates = json.load(f)
+        except (OSError, ValueError):
+            self._templates = {}
+        self._mtime = mtime
+
+    def get(self, fingerprint: str) -> dict | None:
+        self._load()
+        return self._templates.get(fingerprint)
+
+    def remember(self, fingerprint: str, template: dict):
+        self._load()
+        self._templates.pop(fingerprint, None)
+        self._templates[fingerprint] = template
+        while len(self._templates) > self.max_entries:
+            self._templates.pop(next(iter(self._templates)))
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._templates, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+        self._mtime = self.path.stat().st_mtime
+
+
+
+# ============================
+# ЧТЕНИЕ ЛИСТА БЕЗ OPENPYXL
+# ============================
+
+def _column_index(letters: str) -> int:
+    """"A" -> 0, "AB" -> 27"""
+    idx = 0
+    for ch in letters:
+        idx = idx * 26 + ord(ch) - 64
+    return idx - 1
+
+
+def _cast_number(value: str):
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+def _ref_column(ref: str) -> int:
+    """Колонка из адреса ячейки: "B12" -> 1"""
+    match = _CELL_REF_RE.fullmatch(ref)
+    if match is None:
+        raise ValueError(f"Invalid cell reference {ref!r}")
+    return _column_index(match.group(1))
+
+
+def _text(elem) -> str:
+    return "".join(t.text or "" for t in elem.iter(f"{_NS}t"))
+
+
+class XlsxSheetReader:
+    """
+    Потоковое чтение активного листа напрямую из архива xlsx.
+    В отличие от openpyxl не разбирает стили и прочие части книги,
+    поэтому для шаблонов с известной разметкой работает на порядок быстрее.
+    Колонки считаются с 0, как в кортежах iter_rows. Атрибут r у строк и ячеек
+    необязателен: без него номер берется следующим по порядку, как в openpyxl.
+    """
+
+    def __init__(self, raw: bytes, max_row: int):
+        self._zf = zipfile.ZipFile(BytesIO(raw))
+        self.sheet_path = self._active_sheet_path()
+        self.max_row = max_row
+        self._strings: list[str] | None = None
+        self._head = None
+
+    def close(self):
+        self._zf.close()
+
+    def _active_sheet_path(self) -> str:
+        with self._zf.open("xl/workbook.xml") as source:
+            active = 0
+            sheet_ids = []
+            for _, elem in iterparse(source, events=("end",)):
+                if elem.tag == f"{_NS}workbookView":
+                    active = int(elem.get("activeTab", 0))
+                elif elem.tag == f"{_NS}sheet":
+                    sheet_ids.append(elem.get(f"{_REL_NS}id"))
+        rel_id = sheet_ids[active if active < len(sheet_ids) else 0]
+
+        with self._zf.open("xl/_rels/workbook.xml.rels") as source:
+            for _, elem in iterparse(source, events=("end",)):
+                if elem.get("Id") == rel_id:
+                    target = elem.get("Target")
+                    return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+        raise KeyError(rel_id)
+
+    def _shared_strings(self) -> list[str]:
+        if self._strings is None:
+            try:
+                root = fromstring(self._zf.read("xl/sharedStrings.xml"))
+            except KeyError:
+                self._strings = []
+            else:
+                self._strings = [_text(si) for si in root.iter(f"{_NS}si")]
+        return self._strings
+
+    def _cell_value(self, cell):
+        data_type = cell.get("t", "n")
+        if data_type == "inlineStr":
+            return _text(cell)
+        text = cell.findtext(f"{_NS}v")
+        if text is None:
+            return None
+        if data_type == "n":
+            return _cast_number(text)
+        if data_type == "s":
+            return self._shared_strings()[int(text)]
+        if data_type == "b":
+            return bool(int(text))
+        return text
+
+    def _sheet_head(self):
+        """
+        Разбирает XML листа только до строки max_row: распакованный поток
+        обрезается перед первой строкой с большим номером, остаток листа
+        не распаковывается. Пустые ячейки вырезаются до разбора XML, если
+        у всех ячеек есть адрес (иначе от них зависят колонки следующих).
+        """
+        if self._head is not None:
+            return self._head
+
+        buf = bytearray()
+        cut = None
+        pos = 0
+        row_idx = 0
+        with self._zf.open(self.sheet_path) as source:
+            while cut is None and (chunk := source.read(64 * 1024)):
+                buf += chunk
+                # Тег, разрезанный границей куска, не совпадет и будет найден со следующим куском
+                for match in _ROW_START_RE.finditer(buf, pos):
+                    ref = _ROW_REF_RE.search(match.group(1))
+                    row_idx = int(ref.group(1)) if ref else row_idx + 1
+                    if row_idx > self.max_row:
+                        cut = match.start()
+                        break
+                    pos = match.end()
+
+        if cut is None:
+            xml = bytes(buf)
+        else:
+            xml = bytes(buf[:cut]) + b"</sheetData></worksheet>"
+        if _CELL_WITHOUT_REF_RE.search(xml) is None:
+            xml = _EMPTY_CELL_RE.sub(b"", xml)
+        self._head = fromstring(xml)
+        return self._head
+
+    def iter_rows(self, max_row: int | None = None, columns: set[int] | None = None):
+        """
+        Выдает (номер строки, {колонка: значение}) до строки max_row.
+        Если задан columns, значения остальных колонок не разбираются.
+        """
+        max_row = min(max_row or self.max_row, self.max_row)
+        letters = {col: get_column_letter(col + 1) for col in columns} if columns is not None else None
+
+        row_idx = 0
+        for row in self._sheet_head().iter(f"{_NS}row"):
+            ref = row.get("r")
+            row_idx = int(ref) if ref is not None else row_idx + 1
+            if row_idx > max_row:
+                break
+            if letters is not None:
+                refs = {f"{letter}{row_idx}": col for col, letter in letters.items()}
+
+            values = {}
+            col = -1
+            skipped_ref = None  # адрес пропущенной ячейки: колонка нужна, только если за ней ячейка без r
+            for cell in row.iter(f"{_NS}c"):
+                ref = cell.get("r")
+                if ref is None:
+                    if skipped_ref is not None:
+                        col, skipped_ref = _ref_column(skipped_ref), None
+                    col += 1
+                    if columns is not None and col not in columns:
+                        continue
+                elif letters is not None:
+                    if ref not in refs:
+                        skipped_ref = ref
+                        continue
+                    col, skipped_ref = refs[ref], None
+                else:
+                    col = _ref_column(ref)
+                value = self._cell_value(cell)
+                if value is not None:
+                    values[col] = value
+            yield row_idx, values
+
+
+def row_tuple(values: dict[int, object]) -> tuple:
+    """{колонка: значение} -> кортеж, как его отдает openpyxl"""
+    if not values:
+        return ()
+    row = [None] * (max(values) + 1)
+    for col, value in values.items():
+        row[col] = value
+    return tuple(row)
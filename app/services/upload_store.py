@@ -0,0 +1,195 @@
+"""
+
+Хранилище загруженных файлов по содержимому (SHA-256) и кэш результатов разбора
+
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO
+
+from ..config import UPLOAD_STORE_DIR, UPLOAD_STORE_MAX_BYTES, PARSE_CACHE_MAX_BYTES
+from .excel_parser import PARSER_VERSION, parse_balance_sheet_periods_async
+from .statement_formats import parse_statement_async
+
+
+CHUNK_SIZE = 1024 * 1024
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_valid_digest(digest: str) -> bool:
+    return bool(_DIGEST_RE.match(digest))
+
+
+class UploadStore:
+    """
+    Файлы лежат в <root>/<первые 2 символа хэша>/<хэш>.
+    Хэш считается по ходу копирования загрузки, файл целиком в память не читается.
+    Запись атомарная: сначала во временный файл, потом os.replace.
+    Суммарный размер ограничен max_bytes (0 - без ограничения): при превышении удаляются
+    файлы, которые дольше всех не загружали и не разбирали повторно, до 90% лимита.
+    """
+
+    LOW_WATER = 0.9
+
+    def __init__(self, root: str | Path, max_bytes: int = 0):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._size: int | None = None
+        self._lock = threading.Lock()
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def exists(self, digest: str) -> bool:
+        """Есть ли файл; обращение продлевает ему жизнь при вытеснении"""
+        try:
+            os.utime(self.path_for(digest))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _files(self) -> list[os.DirEntry]:
+        # В корне лежат и чужие каталоги (tmp, pdf): файлы загрузок - только в <2 символа>/<хэш>
+        if not self.root.is_dir():
+            return []
+        return [
+            entry
+            for bucket in os.scandir(self.root) if bucket.is_dir() and len(bucket.name) == 2
+            for entry in os.scandir(bucket.path) if is_valid_digest(entry.name)
+        ]
+
+    def _save_sync(self, source: BinaryIO) -> str:
+        tmp_dir = self.root / "tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        sha = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while chunk := source.read(CHUNK_SIZE):
+                    sha.update(chunk)
+                    tmp.write(chunk)
+
+            digest = sha.hexdigest()
+            target = self.path_for(digest)
+            if target.exists():
+                os.unlink(tmp_path)
+                os.utime(target)
+                return digest
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        if self.max_bytes > 0:
+            with self._lock:
+                if self._size is None:
+                    self._size = sum(entry.stat().st_size for entry in self._files())
+                else:
+                    self._size += target.stat().st_size
+                if self._size > self.max_bytes:
+                    self._evict(keep=target)
+        return digest
+
+    def _evict(self, keep: Path):
+        """Удаляет самые давно использованные файлы, пока размер не станет LOW_WATER от лимита"""
+        entries = []
+        for entry in self._files():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        size = sum(entry[1] for entry in entries)
+        for _, file_size, path in entries:
+            if size <= self.max_bytes * self.LOW_WATER:
+                break
+            if path == str(keep):
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+        self._size = size
+
+    async def save(self, source: BinaryIO) -> str:
+        """Сохраняет поток и возвращает SHA-256 содержимого"""
+        source.seek(0)
+        return await asyncio.to_thread(self._save_sync, source)
+
+
+class ParseCache:
+    """
+    LRU-кэш результатов разбора, ограниченный суммарным размером.
+    Размер записи оценивается по длине ее JSON-представления.
+    Кэш свой у каждого процесса приложения.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[tuple, tuple[object, int]] = OrderedDict()
+        self._size = 0
+
+    def get(self, key: tuple):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        self._items.move_to_end(key)
+        return copy.deepcopy(item[0])
+
+    def put(self, key: tuple, value):
+        size = len(json.dumps(value, ensure_ascii=False))
+        if size > self.max_bytes:
+            return
+
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._size -= old[1]
+
+        self._items[key] = (copy.deepcopy(value), size)
+        self._size += size
+
+        while self._size > self.max_bytes:
+            _, (_, evicted_size) = self._items.popitem(last=False)
+            self._size -= evicted_size
+
+    def __len__(self):
+        return len(self._items)
+
+
+upload_store = UploadStore(UPLOAD_STORE_DIR, UPLOAD_STORE_MAX_BYTES)
+parse_cache = ParseCache(PARSE_CACHE_MAX_BYTES)
+
+
+async def _parse_cached(digest: str, kind: str, parser):
+    key = (digest, kind, PARSER_VERSION)
+    data = parse_cache.get(key)
+    if data is None:
+        data = await parser(upload_store.path_for(digest))
+        parse_cache.put(key, data)
+    return data
+
+
+async def parse_stored_balance_sheet(digest: str) -> dict:
+    """
+    Разбор сохраненного файла с кэшированием по хэшу и версии парсера.
+    Формат (xlsx, XML ФНС, CSV) определяется по содержимому.
+    """
+    return await _parse_cached(digest, "balance_sheet", parse_statement_async)
+
+
+async def parse_stored_periods(digest: str) -> list[dict]:
+    return await _parse_cached(digest, "periods", parse_balance_sheet_periods_async)
@@ -0,0 +1,61 @@
+"""
+Benchmark: scalar FinancialAnalyzer loop vs BatchFinancialAnalyzer.
+
+Run from the project root:
+    python -m benchmarks.bench_batch_analyzer [reports]
+"""
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from app.services.math_engine import ANALYZER_INPUTS, BatchFinancialAnalyzer, FinancialAnalyzer
+
+
+SECTIONS = {"ReportAssets": "assets", "ReportLiabilities": "liabilities", "ReportProfitLoss": "profit_loss"}
+
+
+def build_reports(count: int):
+    rnd = random.Random(0)
+    reports = []
+    for _ in range(count):
+        sections = {name: {} for name in SECTIONS.values()}
+        for column in ANALYZER_INPUTS.values():
+            sections[SECTIONS[column.class_.__name__]][column.key] = round(rnd.uniform(0, 1e7), 2)
+        reports.append(SimpleNamespace(**{k: SimpleNamespace(**v) for k, v in sections.items()}))
+    return reports
+
+
+def main(count: int):
+    reports = build_reports(count)
+
+    start = time.perf_counter()
+    for report in reports:
+        FinancialAnalyzer(report).get_full_analysis()
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    BatchFinancialAnalyzer.from_reports(reports).get_full_analysis()
+    batch = time.perf_counter() - start
+
+    # Так данные приходят в POST /analysis/batch: кортежи колонок из одного SELECT
+    rows = [
+        tuple(getattr(getattr(r, SECTIONS[c.class_.__name__]), c.key) for c in ANALYZER_INPUTS.values())
+        for r in reports
+    ]
+    start = time.perf_counter()
+    BatchFinancialAnalyzer.from_rows(rows).get_full_analysis()
+    batch_rows = time.perf_counter() - start
+
+    print(f"{count} reports: scalar {scalar:.2f} s, "
+          f"batch from objects {batch:.2f} s ({scalar / batch:.0f}x), "
+          f"batch from rows {batch_rows:.2f} s ({scalar / batch_rows:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
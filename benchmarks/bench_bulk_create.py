@@ -0,0 +1,89 @@
+"""
+Benchmark: creating reports over HTTP, POST /reports/ per report versus POST /reports/bulk.
+
+The per-report loop is what the ETL did: one request per report, each doing
+flush, three ORM adds, commit and refresh. The bulk endpoint takes all
+reports in one request and inserts them in multi-row INSERT chunks.
+Both go through the ASGI app; authentication is replaced by a fixed user.
+
+Run from the project root:
+    python -m benchmarks.bench_bulk_create [reports] [loop_reports]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+
+import httpx
+import numpy as np
+from sqlalchemy import func, insert, select
+
+from app.api.auth import get_current_user
+from app.database import AsyncSessionLocal, async_engine
+from app.main import app
+from app.models import Base, FinancialReport, User
+from app.schemas import TokenData
+from app.services.excel_parser import build_report_payload
+from benchmarks.bench_consistency import consistent_columns
+from benchmarks.samples import BENCH_USER
+
+
+def payloads(count: int, seed: int = 0) -> list[dict]:
+    """Отчеты со сходящимися итогами, как в основном потоке ETL"""
+    columns = consistent_columns(np.random.default_rng(seed), count)
+    return [
+        build_report_payload(f"org{i % 5000}", str(2015 + i % 10),
+                             {name: float(values[i]) for name, values in columns.items()})
+        .model_dump(mode="json")
+        for i in range(count)
+    ]
+
+
+async def setup():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [BENCH_USER])
+    app.dependency_overrides[get_current_user] = lambda: TokenData(username="bench", id=1, role="accountant")
+
+
+async def count_reports() -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.count()).select_from(FinancialReport))).scalar_one()
+
+
+async def main(count: int, loop_count: int):
+    await setup()
+    bulk_payload = payloads(count)
+    loop_payload = payloads(loop_count, seed=1)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        for report in loop_payload:
+            (await client.post("/reports/", json=report)).raise_for_status()
+        loop_rate = loop_count / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        response = await client.post("/reports/bulk", json=bulk_payload)
+        response.raise_for_status()
+        bulk_rate = count / (time.perf_counter() - start)
+
+    assert None not in response.json()["ids"] and not response.json()["errors"]
+    assert await count_reports() == count + loop_count
+
+    print(f"POST /reports/ loop ({loop_count} reports): {loop_rate:10.0f} reports/s")
+    print(f"POST /reports/bulk ({count} reports):   {bulk_rate:10.0f} reports/s  ({bulk_rate / loop_rate:.1f}x)")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+    ))
@@ -0,0 +1,62 @@
+"""
+Benchmark: ZIP import of many statements into a fresh SQLite database.
+
+Run from the project root:
+    python -m benchmarks.bench_bulk_import [files]
+"""
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+import zipfile
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+
+from sqlalchemy import insert
+
+from app.config import EXCEL_PARSER_WORKERS
+from app.database import AsyncSessionLocal, async_engine
+from app.models import Base, User
+from app.services.bulk_import import import_zip
+from app.services.excel_parser import shutdown_executor
+from benchmarks.samples import BENCH_USER, build_rsbu_workbook
+
+
+def build_archive(path: str, files: int):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i in range(files):
+            zf.writestr(f"client_{i:05d}.xlsx", build_rsbu_workbook(periods=2, seed=i))
+
+
+async def main(files: int):
+    archive_path = os.path.join(_tmp, "import.zip")
+    build_archive(archive_path, files)
+    print(f"{files} files, archive {os.path.getsize(archive_path) / 1024 / 1024:.1f} MB, "
+          f"{EXCEL_PARSER_WORKERS} parser workers")
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [BENCH_USER])
+
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        with open(archive_path, "rb") as archive:
+            manifest = await import_zip(db, user_id=1, archive=archive)
+    elapsed = time.perf_counter() - start
+
+    created = sum(len(entry.report_ids) for entry in manifest)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"imported {created} reports in {elapsed:.2f} s "
+          f"({files / elapsed:.0f} files/s), peak RSS {rss:.0f} MB")
+
+    shutdown_executor()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
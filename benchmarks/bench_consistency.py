@@ -0,0 +1,101 @@
+"""
+Benchmark: full consistency scan over stored reports.
+
+Fills a fresh SQLite database with synthetic reports (about 2% with broken
+totals), then runs scan_consistency and reports time and peak memory.
+
+Run from the project root:
+    python -m benchmarks.bench_consistency [reports]
+"""
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+
+from sqlalchemy import func, insert, select
+
+from app.database import AsyncSessionLocal, async_engine
+from app.models import Base, FinancialReport, ReportAssets, ReportFinding, ReportLiabilities, ReportProfitLoss, User
+from app.services.consistency import CONSISTENCY_RULES, scan_consistency
+from app.services.math_engine import LINE_ITEM_COLUMNS
+from benchmarks.samples import BENCH_USER
+
+
+CHUNK = 5000
+BROKEN_SHARE = 0.02
+
+
+def consistent_columns(rnd: np.random.Generator, size: int) -> dict[str, np.ndarray]:
+    """Строки со сходящимися итогами: итоги считаются по правилам из составляющих"""
+    columns = {name: np.round(rnd.uniform(0, 1e6, size)) for name in LINE_ITEM_COLUMNS}
+    columns["total_balance_liabilities"] = np.zeros(size)
+    for rule in CONSISTENCY_RULES:
+        if rule.name == "balance":
+            continue
+        total = sum(-np.abs(columns[p[1:]]) if p.startswith("-") else columns[p] for p in rule.parts)
+        if rule.name == "balance_liabilities":
+            # Пассив равен активу: разница уходит в нераспределенную прибыль
+            gap = columns["total_non_current_assets"] + columns["total_current_assets"] - total
+            columns["retained_earnings"] += gap
+            columns["total_capital"] += gap
+            total = total + gap
+        columns[rule.totals[0]] = total
+    return columns
+
+
+async def fill(count: int):
+    rnd = np.random.default_rng(0)
+    models = {model: [c.key for c in LINE_ITEM_COLUMNS.values() if c.class_ is model]
+              for model in (ReportAssets, ReportLiabilities, ReportProfitLoss)}
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [BENCH_USER])
+        for start in range(0, count, CHUNK):
+            ids = np.arange(start + 1, min(start + CHUNK, count) + 1)
+            columns = consistent_columns(rnd, len(ids))
+            broken = rnd.random(len(ids)) < BROKEN_SHARE
+            columns["total_current_assets"] = np.where(broken, columns["total_current_assets"] * 1.05,
+                                                       columns["total_current_assets"])
+
+            await conn.execute(insert(FinancialReport), [
+                {"id": int(i), "user_id": 1, "organization_name": f"org{i % 5000}", "period": str(2015 + i % 10)}
+                for i in ids
+            ])
+            for model, keys in models.items():
+                await conn.execute(insert(model), [
+                    {"report_id": int(i), **{key: float(columns[key][n]) for key in keys}}
+                    for n, i in enumerate(ids)
+                ])
+
+
+async def main(count: int):
+    start = time.perf_counter()
+    await fill(count)
+    print(f"filled {count} reports in {time.perf_counter() - start:.1f} s")
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        checked, flagged = await scan_consistency(db)
+        elapsed = time.perf_counter() - start
+        findings = (await db.execute(select(func.count()).select_from(ReportFinding))).scalar_one()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(f"scan: {checked} reports in {elapsed:.1f} s ({checked / elapsed:,.0f} reports/s)")
+    print(f"flagged reports: {flagged}, findings: {findings}")
+    print(f"peak RSS growth during scan: {(rss_after - rss_before) / 1024:.1f} MB")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000))
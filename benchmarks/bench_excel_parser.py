@@ -0,0 +1,105 @@
+"""
+Benchmark: latency of an unrelated endpoint while Excel files are being parsed.
+
+Run from the project root:
+    python -m benchmarks.bench_excel_parser
+
+Compares the old behaviour (full workbook load inside the event loop) with
+parse_balance_sheet_async (streaming read in the process pool).
+"""
+import asyncio
+import os
+import statistics
+import time
+from io import BytesIO
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+import httpx
+import openpyxl
+from fastapi import File, UploadFile
+
+from app.api.auth import get_current_user
+from app.main import app
+from app.schemas import TokenData
+from app.services.excel_parser import CODE_MAP, shutdown_executor
+from benchmarks.samples import build_rsbu_workbook
+
+CONCURRENT_PARSES = 20
+PROBE_INTERVAL = 0.01
+
+
+def legacy_parse(content: bytes) -> dict:
+    # Старый вариант: полная загрузка книги и повторный поиск кода в строке
+    wb = openpyxl.load_workbook(BytesIO(content), data_only=True)
+    data = {}
+    for row in wb.active.iter_rows(min_row=1, max_row=100, values_only=True):
+        for cell in row:
+            if str(cell) in CODE_MAP:
+                idx = row.index(cell)
+                for val in row[idx + 1:]:
+                    if isinstance(val, (int, float)):
+                        data[CODE_MAP[str(cell)]] = float(val)
+                        break
+    return data
+
+
+@app.post("/_bench/parse_inline")
+async def parse_inline(file: UploadFile = File(...)):
+    return legacy_parse(await file.read())
+
+
+async def run(client: httpx.AsyncClient, parse_url: str, payload: bytes) -> list[float]:
+    latencies: list[float] = []
+    done = asyncio.Event()
+
+    async def parse():
+        files = {"file": ("sheet.xlsx", payload)}
+        r = await client.post(parse_url, files=files)
+        r.raise_for_status()
+
+    async def parse_all():
+        await asyncio.gather(*(parse() for _ in range(CONCURRENT_PARSES)))
+        done.set()
+
+    async def probe():
+        # Запросы идут с фиксированным интервалом; задержка считается
+        # от запланированного момента отправки, поэтому время, пока
+        # event loop был заблокирован, тоже попадает в замер.
+        start = time.perf_counter()
+        i = 0
+        while not done.is_set():
+            planned = start + i * PROBE_INTERVAL
+            await asyncio.sleep(max(0.0, planned - time.perf_counter()))
+            await client.get("/login")
+            latencies.append((time.perf_counter() - planned) * 1000)
+            i += 1
+
+    await asyncio.gather(probe(), parse_all())
+    return latencies
+
+
+def report(name: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<28} p50={p50:8.2f} ms  p99={p99:8.2f} ms  max={latencies[-1]:8.2f} ms")
+
+
+async def main():
+    payload = build_rsbu_workbook(periods=1, filler_rows=100000)
+    print(f"workbook size: {len(payload) / 1024 / 1024:.1f} MB, {CONCURRENT_PARSES} concurrent parses")
+
+    app.dependency_overrides[get_current_user] = lambda: TokenData(username="bench", id=1, role="accountant")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        report("inline (event loop)", await run(client, "/_bench/parse_inline", payload))
+        report("process pool", await run(client, "/reports/parse_excel", payload))
+
+    shutdown_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
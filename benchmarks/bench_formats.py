@@ -0,0 +1,46 @@
+"""
+Benchmark: parse throughput per input format (same statements in every format).
+
+Run from the project root:
+    python -m benchmarks.bench_formats
+"""
+import os
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("TEMPLATE_REGISTRY_PATH", os.path.join(tempfile.mkdtemp(), "templates.json"))
+
+from app.services.excel_parser import CODE_MAP
+from app.services.statement_formats import parse_statement
+from benchmarks.samples import (build_csv_statement, build_fns_xml_statement,
+                                build_xlsx_statement, sample_values)
+
+FILES = 200
+
+
+def main():
+    statements = [sample_values(seed) for seed in range(FILES)]
+    expected = [{CODE_MAP[code]: value for code, value in values.items()} for values in statements]
+    builders = {
+        "xlsx": build_xlsx_statement,
+        "fns_xml": build_fns_xml_statement,
+        "csv": build_csv_statement,
+    }
+    for name, builder in builders.items():
+        files = [builder(values) for values in statements]
+        size_mb = sum(len(content) for content in files) / 1024 / 1024
+
+        start = time.perf_counter()
+        results = [parse_statement(content) for content in files]
+        elapsed = time.perf_counter() - start
+
+        assert results == expected, f"{name}: parsed values differ"
+        print(f"{name:<8} {FILES / elapsed:8.0f} files/s  {size_mb / elapsed:7.2f} MB/s  "
+              f"{elapsed / FILES * 1000:6.2f} ms/file")
+
+
+if __name__ == "__main__":
+    main()
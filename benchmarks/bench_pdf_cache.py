@@ -0,0 +1,86 @@
+"""
+Benchmark: GET /reports/{id}/export/pdf latency on a pdf_cache miss, hit and 304.
+
+Each report is exported three times through the ASGI app. The first request
+renders with ReportLab and writes the file to the cache. The second is served
+from disk without loading the analysis. The third sends If-None-Match and
+gets 304 after the version lookup. Authentication is replaced by a fixed user.
+
+Run from the project root:
+    python -m benchmarks.bench_pdf_cache [reports]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+os.environ.setdefault("PDF_CACHE_DIR", f"{_tmp}/pdf")
+
+import httpx
+from sqlalchemy import insert
+
+from app.api.auth import get_current_user
+from app.database import AsyncSessionLocal, async_engine
+from app.main import app
+from app.models import Base, User
+from app.schemas import FinancialReportCreate, TokenData
+from app.services.bulk_import import bulk_insert_reports
+from benchmarks.bench_bulk_create import payloads
+from benchmarks.samples import BENCH_USER
+
+
+async def setup(count: int) -> list[int]:
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [BENCH_USER])
+    async with AsyncSessionLocal() as db:
+        ids = await bulk_insert_reports(db, 1, [FinancialReportCreate(**p) for p in payloads(count)])
+        await db.commit()
+    app.dependency_overrides[get_current_user] = lambda: TokenData(username="bench", id=1, role="accountant")
+    return ids
+
+
+async def export_all(client, report_ids: list[int], etags: dict[int, str] | None = None) -> list[float]:
+    """Время каждого запроса, мс; etags - отправить If-None-Match"""
+    timings = []
+    for report_id in report_ids:
+        headers = {"If-None-Match": etags[report_id]} if etags else {}
+        start = time.perf_counter()
+        response = await client.get(f"/reports/{report_id}/export/pdf", headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == (304 if etags else 200), response.text
+    return timings
+
+
+def summary(timings: list[float]) -> str:
+    p95 = statistics.quantiles(timings, n=20)[-1]
+    return f"median {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms"
+
+
+async def main(count: int):
+    report_ids = await setup(count)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        miss = await export_all(client, report_ids)
+        hit = await export_all(client, report_ids)
+        etags = {}
+        for report_id in report_ids:
+            etags[report_id] = (await client.get(f"/reports/{report_id}/export/pdf")).headers["etag"]
+        not_modified = await export_all(client, report_ids, etags)
+
+    print(f"{count} reports, PDF export latency")
+    print(f"miss (render + write): {summary(miss)}")
+    print(f"hit (file from disk):  {summary(hit)}   ({statistics.median(miss) / statistics.median(hit):.1f}x)")
+    print(f"304 (If-None-Match):   {summary(not_modified)}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
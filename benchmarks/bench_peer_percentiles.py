@@ -0,0 +1,94 @@
+"""
+Benchmark: percentile rank from QuantileSketch vs exact computation.
+
+Exact = what an on-demand answer costs: analyze every report of the period,
+then count values below. Sketch = what GET /analysis/{id}/json?percentiles=true
+does: decode the stored sketch and sum bucket counts.
+
+Run from the project root:
+    python -m benchmarks.bench_peer_percentiles [reports]
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from app.services.math_engine import ANALYZER_INPUTS, BatchFinancialAnalyzer
+from app.services.peer_sketch import PEER_METRICS, QuantileSketch
+
+
+QUERIES = 200
+
+
+def build_inputs(count: int, rnd: np.random.Generator) -> dict[str, np.ndarray]:
+    """Логнормальные суммы, часть прибылей отрицательные, часть строк пустые"""
+    columns = {}
+    for name in ANALYZER_INPUTS:
+        values = rnd.lognormal(mean=13, sigma=2, size=count)
+        if name in ("net_profit", "profit_before_tax", "sales_profit", "retained_earnings"):
+            values *= rnd.choice([-1, 1], size=count, p=[0.3, 0.7])
+        values[rnd.random(count) < 0.05] = np.nan
+        columns[name] = values
+    return columns
+
+
+def exact_rank(values: np.ndarray, value: float) -> float:
+    return (np.sum(values < value) + 0.5 * np.sum(values == value)) / len(values)
+
+
+def main(count: int):
+    rnd = np.random.default_rng(0)
+    columns = build_inputs(count, rnd)
+    analysis = BatchFinancialAnalyzer(columns).get_full_analysis()
+    metrics = {field: np.array(analysis[field.split(".")[0]][field.split(".")[1]]) for field in PEER_METRICS}
+
+    start = time.perf_counter()
+    stored = {}
+    for field, values in metrics.items():
+        sketch = QuantileSketch()
+        for value in values.tolist():
+            sketch.add(value)
+        sketch.compact()
+        stored[field] = json.loads(json.dumps(sketch.to_dict()))
+    build = time.perf_counter() - start
+    size = len(json.dumps(stored))
+
+    picks = rnd.integers(0, count, size=QUERIES)
+    errors = []
+    start = time.perf_counter()
+    for i in picks:
+        for field in PEER_METRICS:
+            QuantileSketch.from_dict(stored[field]).rank(metrics[field][i])
+    sketch_time = (time.perf_counter() - start) / QUERIES
+
+    for i in picks:
+        for field, values in metrics.items():
+            approx = QuantileSketch.from_dict(stored[field]).rank(values[i])
+            errors.append(abs(approx - exact_rank(values, values[i])) * 100)
+
+    start = time.perf_counter()
+    for i in picks[:5]:
+        fresh = BatchFinancialAnalyzer(columns).get_full_analysis()
+        for field in PEER_METRICS:
+            group, name = field.split(".")
+            values = np.array(fresh[group][name])
+            exact_rank(values, values[i])
+    exact_time = (time.perf_counter() - start) / 5
+
+    errors = np.array(errors)
+    print(f"{count} reports, {len(PEER_METRICS)} metrics, sketches {size / 1024:.0f} KB as JSON "
+          f"(built in {build:.2f} s)")
+    print(f"rank error, percentile points: mean {errors.mean():.3f}, p99 {np.percentile(errors, 99):.3f}, "
+          f"max {errors.max():.3f}")
+    print(f"per report, all metrics: sketch {sketch_time * 1000:.2f} ms, "
+          f"exact on demand {exact_time * 1000:.0f} ms ({exact_time / sketch_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,96 @@
+"""
+Benchmark: GET /reports/ pages, OFFSET versus keyset on (created_at, id).
+
+One user owns all reports. For each depth the page that starts there is
+fetched with LIMIT/OFFSET (what a page-number API would do) and with
+list_reports, whose cursor points at the row before that page.
+
+Run from the project root:
+    python -m benchmarks.bench_report_list [reports] [page_size]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+
+from sqlalchemy import insert, select
+
+from app.database import AsyncSessionLocal, async_engine
+from app.models import Base, FinancialReport, User
+from app.services.report_list import encode_cursor, list_reports
+from benchmarks.samples import BENCH_USER
+
+
+CHUNK = 5000
+REPEATS = 50
+
+
+async def fill(count: int):
+    start = datetime(2020, 1, 1)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [BENCH_USER])
+        for first in range(1, count + 1, CHUNK):
+            await conn.execute(insert(FinancialReport), [
+                {
+                    "id": i, "user_id": 1, "organization_name": f"org{i % 5000}", "period": str(2015 + i % 10),
+                    # По нескольку отчетов на одну секунду - проверка порядка при равных created_at
+                    "created_at": start + timedelta(seconds=i // 3),
+                }
+                for i in range(first, min(first + CHUNK, count + 1))
+            ])
+
+
+async def offset_page(db, depth: int, size: int):
+    stmt = select(FinancialReport.id, FinancialReport.organization_name,
+                  FinancialReport.period, FinancialReport.created_at)\
+        .where(FinancialReport.user_id == 1)\
+        .order_by(FinancialReport.created_at.desc(), FinancialReport.id.desc())\
+        .offset(depth)\
+        .limit(size)
+    return (await db.execute(stmt)).all()
+
+
+async def timed(load) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        async with AsyncSessionLocal() as db:
+            await load(db)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+async def main(count: int, size: int):
+    await fill(count)
+
+    print(f"{count} reports of one user, page of {size}, ms per page")
+    print(f"{'depth':>10} {'OFFSET':>10} {'keyset':>10}")
+    for depth in (0, count // 100, count // 10, count // 2, count - size):
+        cursor = None
+        if depth:
+            async with AsyncSessionLocal() as db:
+                before = (await offset_page(db, depth - 1, 1))[0]
+            cursor = encode_cursor(before.created_at, before.id, "desc")
+
+        async with AsyncSessionLocal() as db:
+            expected = await offset_page(db, depth, size)
+            rows, _ = await list_reports(db, 1, size, cursor=cursor)
+        assert [row.id for row in rows] == [row.id for row in expected]
+
+        offset_ms = await timed(lambda db: offset_page(db, depth, size))
+        keyset_ms = await timed(lambda db: list_reports(db, 1, size, cursor=cursor))
+        print(f"{depth:>10} {offset_ms:>10.3f} {keyset_ms:>10.3f}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+    ))
@@ -0,0 +1,127 @@
+"""
+Benchmark: loading reports with their line items, before and after line_items.
+
+Before: select + three selectinload on report_assets / report_liabilities /
+report_profit_loss (four queries). After: one select of financial_reports with
+the packed line_items column. Both are timed for the compare_reports case
+(two reports per request), without and with indexes on the child report_id.
+
+Run from the project root:
+    python -m benchmarks.bench_report_loading [reports] [requests]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.orm import selectinload
+
+from app.database import AsyncSessionLocal, async_engine
+from app.models import Base, FinancialReport, ReportAssets, ReportLiabilities, ReportProfitLoss, User
+from app.services.line_items import LINE_ITEM_CODES, SECTIONS, line_item_values
+from app.services.math_engine import LINE_ITEM_COLUMNS, ReportComparator
+from benchmarks.samples import BENCH_USER
+
+
+CHUNK = 5000
+MODELS = (ReportAssets, ReportLiabilities, ReportProfitLoss)
+
+
+async def fill(count: int):
+    rnd = np.random.default_rng(0)
+    keys = {model: [c.key for c in LINE_ITEM_COLUMNS.values() if c.class_ is model] for model in MODELS}
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [BENCH_USER])
+        for start in range(0, count, CHUNK):
+            ids = range(start + 1, min(start + CHUNK, count) + 1)
+            values = np.round(rnd.uniform(0, 1e6, (len(ids), len(LINE_ITEM_COLUMNS))), 2)
+            rows = [dict(zip(LINE_ITEM_COLUMNS, map(float, row))) for row in values]
+
+            await conn.execute(insert(FinancialReport), [
+                {
+                    "id": i, "user_id": 1, "organization_name": f"org{i % 5000}", "period": str(2015 + i % 10),
+                    "line_items": {LINE_ITEM_CODES[name]: value for name, value in row.items()},
+                }
+                for i, row in zip(ids, rows)
+            ])
+            for model in MODELS:
+                await conn.execute(insert(model), [
+                    {"report_id": i, **{key: row[key] for key in keys[model]}} for i, row in zip(ids, rows)
+                ])
+
+
+async def before(db, ids):
+    stmt = select(FinancialReport).options(
+        selectinload(FinancialReport.assets),
+        selectinload(FinancialReport.liabilities),
+        selectinload(FinancialReport.profit_loss)
+    ).where(FinancialReport.id.in_(ids))
+    reports = (await db.execute(stmt)).scalars().all()
+    sections = {model: section for section, model in SECTIONS.items()}
+    values = [
+        tuple(getattr(getattr(report, sections[column.class_]), column.key) for column in LINE_ITEM_COLUMNS.values())
+        for report in reports
+    ]
+    return ReportComparator.compare(reports[0].organization_name, (reports[0].period, reports[1].period), values)
+
+
+async def after(db, ids):
+    stmt = select(
+        FinancialReport.id, FinancialReport.user_id, FinancialReport.organization_name,
+        FinancialReport.period, FinancialReport.line_items
+    ).where(FinancialReport.id.in_(ids))
+    reports = (await db.execute(stmt)).all()
+    return ReportComparator.compare(reports[0].organization_name, (reports[0].period, reports[1].period),
+                                    [line_item_values(row.line_items) for row in reports])
+
+
+async def timed(load, pairs) -> float:
+    start = time.perf_counter()
+    for ids in pairs:
+        # Новая сессия на запрос, как в get_db
+        async with AsyncSessionLocal() as db:
+            await load(db, ids)
+    return (time.perf_counter() - start) / len(pairs) * 1000
+
+
+async def main(count: int, requests: int):
+    await fill(count)
+    rnd = random.Random(0)
+    pairs = [rnd.sample(range(1, count + 1), 2) for _ in range(requests)]
+
+    # create_all уже создал индексы по report_id (миграция 0006); первый проход - без них
+    async with async_engine.begin() as conn:
+        for model in MODELS:
+            await conn.execute(text(f"DROP INDEX ix_{model.__tablename__}_report_id"))
+
+    print(f"{count} reports, {requests} requests of 2 reports, ms per request")
+    for label in ("no index on child report_id", "with index on child report_id"):
+        if label.startswith("with"):
+            async with async_engine.begin() as conn:
+                for model in MODELS:
+                    await conn.execute(text(f"CREATE INDEX ix_{model.__tablename__}_report_id "
+                                            f"ON {model.__tablename__} (report_id)"))
+        slow_pairs = pairs[:max(1, requests // 20)] if label.startswith("no") else pairs
+        print(f"{label}:")
+        print(f"  select + 3 selectinload: {await timed(before, slow_pairs):8.3f}")
+        print(f"  packed line_items:       {await timed(after, pairs):8.3f}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+    ))
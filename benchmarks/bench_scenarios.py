@@ -0,0 +1,46 @@
+"""
+Benchmark: Monte Carlo scenarios and tornado sensitivities for one report.
+
+Run from the project root:
+    python -m benchmarks.bench_scenarios [scenarios]
+"""
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from app.schemas import ScenarioPerturbation
+from app.services.math_engine import ANALYZER_INPUTS, ScenarioAnalyzer
+
+
+def main(scenarios: int, repeats: int = 20):
+    rnd = random.Random(0)
+    analyzer = ScenarioAnalyzer({name: round(rnd.uniform(1e5, 1e7), 2) for name in ANALYZER_INPUTS})
+    perturbations = [
+        ScenarioPerturbation(input="revenue", distribution="normal", std=0.2),
+        ScenarioPerturbation(input="receivables", distribution="uniform", low=-0.3, high=0.1),
+        ScenarioPerturbation(input="cash", distribution="triangular", low=-0.5, mode=0.0, high=0.1),
+        ScenarioPerturbation(input="short_liabilities", distribution="normal", mean=0.05, std=0.1),
+    ]
+
+    start = time.perf_counter()
+    for seed in range(repeats):
+        analyzer.simulate(perturbations, scenarios, seed)
+    simulate = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        analyzer.sensitivities(0.15)
+    tornado = (time.perf_counter() - start) / repeats
+
+    print(f"{scenarios} scenarios, {len(perturbations)} perturbed inputs")
+    print(f"monte carlo:  {simulate * 1000:.1f} ms")
+    print(f"sensitivity:  {tornado * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
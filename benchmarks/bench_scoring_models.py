@@ -0,0 +1,61 @@
+"""
+Benchmark: cost of compiled scoring models per report as models are added.
+
+Run from the project root:
+    python -m benchmarks.bench_scoring_models [reports]
+"""
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+import numpy as np
+
+from app.services.math_engine import ANALYZER_INPUTS, compile_scoring_model, evaluate_nodes
+from app.services.scoring_models import SCORING_MODELS
+
+
+FIELDS = set(ANALYZER_INPUTS) | {"total_assets", "total_liabilities"}
+
+
+def compiled_models(count: int):
+    """count моделей: копии SCORING_MODELS по кругу под разными именами"""
+    return [
+        compile_scoring_model(SCORING_MODELS[i % len(SCORING_MODELS)]._replace(name=f"model_{i}"), FIELDS)
+        for i in range(count)
+    ]
+
+
+def main(count: int):
+    rnd = np.random.default_rng(0)
+    columns = evaluate_nodes(FIELDS, {name: rnd.uniform(-1e6, 1e7, count) for name in ANALYZER_INPUTS}, batch=True)
+    rows = [
+        {name: float(columns[name][i]) for name in FIELDS}
+        for i in random.Random(0).sample(range(count), min(count, 2000))
+    ]
+
+    print(f"{count} reports")
+    print(f"{'models':>6} {'batch us/report':>16} {'per model':>10} {'scalar us/report':>17}")
+    for models in (1, 2, 5, 10, 20):
+        compiled = compiled_models(models)
+
+        start = time.perf_counter()
+        for model in compiled:
+            model.batch(*[columns[name] for name in model.inputs])
+        batch = (time.perf_counter() - start) / count * 1e6
+
+        start = time.perf_counter()
+        for row in rows:
+            for model in compiled:
+                model.scalar(*[row[name] for name in model.inputs])
+        scalar = (time.perf_counter() - start) / len(rows) * 1e6
+
+        print(f"{models:>6} {batch:>16.3f} {batch / models:>10.3f} {scalar:>17.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,88 @@
+"""
+Benchmark: POST /analysis/screen query over stored metric columns.
+
+Fills a fresh SQLite database with synthetic reports and their stored
+analysis, then times screen_reports for a typical risk filter and a rare one.
+
+Run from the project root:
+    python -m benchmarks.bench_screening [reports]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+
+from sqlalchemy import insert
+
+from app.database import AsyncSessionLocal, async_engine
+from app.models import Base, FinancialReport, ReportAnalysis, User
+from app.services.analysis_store import METRIC_COLUMNS
+from app.services.math_engine import ANALYZER_VERSION
+from app.services.screening import screen_reports
+from benchmarks.samples import BENCH_USER
+
+
+RISK_FILTER = "bankruptcy_altman.score < 1.23 and liquidity.current_ratio < 1 or bankruptcy_taffler.score < 0.2"
+RARE_FILTER = "bankruptcy_altman.score < -3 and liquidity.current_ratio < 0.05"
+CHUNK = 2000
+
+
+async def fill(count: int):
+    rnd = np.random.default_rng(0)
+    metrics = {column.key: np.round(rnd.normal(1.5, 1.2, size=count), 4) for column in METRIC_COLUMNS.values()}
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [BENCH_USER])
+        for start in range(0, count, CHUNK):
+            ids = range(start + 1, min(start + CHUNK, count) + 1)
+            await conn.execute(insert(FinancialReport), [
+                {"id": i, "user_id": 1, "organization_name": f"org{i % 5000}", "period": str(2015 + i % 10)}
+                for i in ids
+            ])
+            await conn.execute(insert(ReportAnalysis), [
+                {
+                    "report_id": i,
+                    "analyzer_version": ANALYZER_VERSION,
+                    "result": {},
+                    **{key: float(values[i - 1]) for key, values in metrics.items()},
+                }
+                for i in ids
+            ])
+
+
+async def timed(label: str, expression: str, limit: int, pages: int = 1):
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        after_id = None
+        total = 0
+        for _ in range(pages):
+            items, after_id = await screen_reports(db, expression, limit=limit, after_id=after_id)
+            total += len(items)
+            if after_id is None:
+                break
+        elapsed = time.perf_counter() - start
+    print(f"{label}: {total} matches in {elapsed * 1000:.0f} ms")
+
+
+async def main(count: int):
+    start = time.perf_counter()
+    await fill(count)
+    print(f"{count} reports loaded in {time.perf_counter() - start:.0f} s")
+
+    await timed("risk filter, first page of 100", RISK_FILTER, 100)
+    await timed("risk filter, 10 pages of 1000", RISK_FILTER, 1000, pages=10)
+    await timed("rare filter, all matches", RARE_FILTER, 1000, pages=1000)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
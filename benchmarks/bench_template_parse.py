@@ -0,0 +1,59 @@
+"""
+Benchmark: full scan vs learned template for repeat layouts.
+
+Run from the project root:
+    python -m benchmarks.bench_template_parse
+"""
+import os
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ["TEMPLATE_REGISTRY_PATH"] = os.path.join(_tmp, "templates.json")
+
+from app.services import excel_parser
+from benchmarks.samples import build_1c_like_workbook, build_rsbu_workbook
+
+FILES = 50
+
+
+class _NoTemplates:
+    def get(self, fingerprint):
+        return None
+
+    def remember(self, fingerprint, template):
+        pass
+
+
+def timed(files: list[bytes]) -> tuple[float, list[dict]]:
+    start = time.perf_counter()
+    results = [excel_parser.parse_balance_sheet(content) for content in files]
+    return (time.perf_counter() - start) / len(files) * 1000, results
+
+
+def main():
+    learned = excel_parser.template_registry
+    layouts = {
+        "plain form": lambda seed: build_rsbu_workbook(periods=3, seed=seed),
+        "1C-like printed form": lambda seed: build_1c_like_workbook(seed=seed),
+    }
+    for name, builder in layouts.items():
+        files = [builder(seed) for seed in range(FILES)]
+
+        excel_parser.template_registry = _NoTemplates()
+        full_ms, expected = timed(files)
+
+        excel_parser.template_registry = learned
+        excel_parser.parse_balance_sheet(files[0])  # выучить шаблон
+        template_ms, results = timed(files)
+
+        assert results == expected, "template path diverged from the full scan"
+        print(f"{name:<22} full scan {full_ms:6.2f} ms/file   template {template_ms:6.2f} ms/file   "
+              f"x{full_ms / template_ms:.1f}")
+
+
+if __name__ == "__main__":
+    main()
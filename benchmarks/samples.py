@@ -0,0 +1,114 @@
+"""
+Generators of synthetic RSBU workbooks for benchmarks.
+"""
+import random
+from io import BytesIO
+
+import openpyxl
+
+from app.services.excel_parser import CODE_MAP
+
+
+# Owner of the benchmark reports: SQLite foreign keys are enforced (app.database.make_engine)
+BENCH_USER = {"id": 1, "username": "bench", "hashed_password": "-", "email": "bench@example.com", "role": "accountant"}
+
+
+def build_rsbu_workbook(periods: int = 3, filler_rows: int = 0, seed: int | None = None) -> bytes:
+    """Balance sheet and income statement on one sheet, `periods` value columns."""
+    rnd = random.Random(seed)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Наименование показателя", "Код"] + [f"На 31 декабря {2024 - i} г." for i in range(periods)])
+    for code in CODE_MAP:
+        ws.append([f"Показатель {code}", code] + [round(rnd.uniform(1, 1e6), 2) for _ in range(periods)])
+    for i in range(filler_rows):
+        ws.append([f"row {i}", "прочие данные", i, i * 1.5])
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def build_1c_like_workbook(seed: int | None = None, width: int = 40, notes_rows: int = 400) -> bytes:
+    """
+    Layout close to a printed 1C form: a styled grid of `width` columns,
+    a title block, the form itself and a long tail of notes and signatures.
+    """
+    from openpyxl.styles import Alignment, Border, Font, Side
+
+    rnd = random.Random(seed)
+    thin = Side(style="thin")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    font = Font(name="Arial", size=8)
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+
+    def styled_row(values: dict[int, object]):
+        row = [values.get(col) for col in range(width)]
+        ws.append(row)
+        for cell in ws[ws.max_row]:
+            cell.border = border
+            cell.font = font
+            cell.alignment = Alignment(wrap_text=True)
+
+    for i in range(18):
+        styled_row({0: f"Шапка формы, строка {i}", 10: "ООО Ромашка" if i == 5 else None})
+    styled_row({0: "Пояснения", 3: "Наименование показателя", 20: "Код",
+                24: "На 31 декабря 2024 г.", 30: "На 31 декабря 2023 г.", 36: "На 31 декабря 2022 г."})
+    for code in CODE_MAP:
+        styled_row({3: f"Показатель {code}", 20: code,
+                    24: round(rnd.uniform(1, 1e6), 2), 30: round(rnd.uniform(1, 1e6), 2),
+                    36: round(rnd.uniform(1, 1e6), 2)})
+    for i in range(notes_rows):
+        styled_row({0: f"Примечание {i}", 15: "Руководитель", 25: i})
+
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def sample_values(seed: int | None = None) -> dict[str, float]:
+    """Line code -> value for the current period"""
+    rnd = random.Random(seed)
+    return {code: float(rnd.randint(1, 10**6)) for code in CODE_MAP}
+
+
+def build_xlsx_statement(values: dict[str, float]) -> bytes:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Наименование показателя", "Код", "На 31 декабря 2024 г."])
+    for code, value in values.items():
+        ws.append([f"Показатель {code}", code, value])
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def build_csv_statement(values: dict[str, float], encoding: str = "cp1251") -> bytes:
+    lines = ["Наименование показателя;Код;На 31.12.2024"]
+    for code, value in values.items():
+        amount = f"{abs(value):,.0f}".replace(",", " ")
+        lines.append(f"Показатель {code};{code};{'(' + amount + ')' if value < 0 else amount}")
+    return ("\r\n".join(lines) + "\r\n").encode(encoding)
+
+
+def build_fns_xml_statement(values: dict[str, float], encoding: str = "windows-1251") -> bytes:
+    from app.services.fns_xml_parser import ELEMENT_CODES
+
+    by_parent: dict[str, list[tuple[str, str]]] = {}
+    for (parent, tag), code in ELEMENT_CODES.items():
+        by_parent.setdefault(parent, []).append((tag, code))
+
+    def render(tag: str, code: str | None) -> str:
+        attrs = f' СумОтч="{values[code]:.0f}" СумПрдщ="0"' if code in values else ""
+        children = "".join(render(child, child_code) for child, child_code in by_parent.get(tag, []))
+        return f"<{tag}{attrs}>{children}</{tag}>" if children else f"<{tag}{attrs}/>"
+
+    body = (
+        '<Документ КНД="0710099" ДатаДок="31.03.2025" ОКЕИ="384">'
+        + render("Баланс", None)
+        + render("ФинРез", None)
+        + "</Документ>"
+    )
+    xml = f'<?xml version="1.0" encoding="{encoding}"?><Файл ИдФайл="NO_BOUPR" ВерсФорм="5.08">{body}</Файл>'
+    return xml.encode(encoding)
@@ -0,0 +1,87 @@
+"""
+
+Окружение Alembic: асинхронный движок приложения и метаданные моделей
+
+"""
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import Column, pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import async_engine_from_config
+
+from app.config import SQLALCHEMY_DATABASE_URL
+from app.models import Base
+
+
+config = context.config
+
+# При вызове из кода (тесты, проверки) логирование приложения не трогаем
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+# Адрес можно передать в Config явно (тесты), иначе - из настроек приложения
+if not config.get_main_option("sqlalchemy.url"):
+    config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL)
+
+target_metadata = Base.metadata
+
+# Индексы с выражениями (created_at DESC) SQLite отражает неточно, и autogenerate
+# каждый раз предлагал бы их пересоздать. Такие индексы пишутся в миграциях вручную
+_EXPRESSION_INDEXES = {
+    index.name
+    for table in target_metadata.tables.values()
+    for index in table.indexes
+    if any(not isinstance(expr, Column) for expr in index.expressions)
+}
+
+
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    return not (type_ == "index" and name in _EXPRESSION_INDEXES)
+
+
+def run_migrations_offline() -> None:
+    """SQL-скрипт миграции без подключения к БД (alembic upgrade head --sql)"""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    # batch-режим нужен SQLite: ALTER TABLE там почти ничего не умеет
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        render_as_batch=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    connectable = async_engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_async_migrations())
@@ -0,0 +1,71 @@
+"""report analysis
+
+Сохраненные результаты анализа отчета (AnalysisResultSchema) и числовые показатели
+из них отдельными индексированными колонками - для отбора по показателям.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 23:57:41.308215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('report_analysis',
+    sa.Column('report_id', sa.Integer(), nullable=False),
+    sa.Column('analyzer_version', sa.Integer(), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.Column('current_ratio', sa.Float(), nullable=True),
+    sa.Column('quick_ratio', sa.Float(), nullable=True),
+    sa.Column('absolute_ratio', sa.Float(), nullable=True),
+    sa.Column('ros', sa.Float(), nullable=True),
+    sa.Column('roa', sa.Float(), nullable=True),
+    sa.Column('roe', sa.Float(), nullable=True),
+    sa.Column('asset_turnover', sa.Float(), nullable=True),
+    sa.Column('inventory_days', sa.Float(), nullable=True),
+    sa.Column('altman_score', sa.Float(), nullable=True),
+    sa.Column('taffler_score', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['report_id'], ['financial_reports.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('report_id')
+    )
+    with op.batch_alter_table('report_analysis', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_report_analysis_absolute_ratio'), ['absolute_ratio'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_analysis_altman_score'), ['altman_score'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_analysis_asset_turnover'), ['asset_turnover'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_analysis_current_ratio'), ['current_ratio'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_analysis_inventory_days'), ['inventory_days'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_analysis_quick_ratio'), ['quick_ratio'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_analysis_roa'), ['roa'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_analysis_roe'), ['roe'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_analysis_ros'), ['ros'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_analysis_taffler_score'), ['taffler_score'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('report_analysis', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_report_analysis_taffler_score'))
+        batch_op.drop_index(batch_op.f('ix_report_analysis_ros'))
+        batch_op.drop_index(batch_op.f('ix_report_analysis_roe'))
+        batch_op.drop_index(batch_op.f('ix_report_analysis_roa'))
+        batch_op.drop_index(batch_op.f('ix_report_analysis_quick_ratio'))
+        batch_op.drop_index(batch_op.f('ix_report_analysis_inventory_days'))
+        batch_op.drop_index(batch_op.f('ix_report_analysis_current_ratio'))
+        batch_op.drop_index(batch_op.f('ix_report_analysis_asset_turnover'))
+        batch_op.drop_index(batch_op.f('ix_report_analysis_altman_score'))
+        batch_op.drop_index(batch_op.f('ix_report_analysis_absolute_ratio'))
+
+    op.drop_table('report_analysis')
@@ -0,0 +1,37 @@
+"""peer sketches
+
+Скетчи квантилей показателей по периодам: процентиль отчета среди отчетов
+того же периода без чтения всех их результатов анализа.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 23:57:43.912406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('peer_sketches',
+    sa.Column('period', sa.String(), nullable=False),
+    sa.Column('report_count', sa.Integer(), nullable=False),
+    sa.Column('sketches', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('period')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('peer_sketches')
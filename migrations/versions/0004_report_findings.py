@@ -0,0 +1,48 @@
+"""report findings
+
+Нарушенные контрольные соотношения отчета (проверка итогов при загрузке
+и повторная проверка всей базы).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 23:57:46.150377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('report_findings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('report_id', sa.Integer(), nullable=False),
+    sa.Column('rule', sa.String(), nullable=False),
+    sa.Column('expected', sa.Float(), nullable=False),
+    sa.Column('actual', sa.Float(), nullable=False),
+    sa.Column('difference', sa.Float(), nullable=False),
+    sa.Column('checked_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['report_id'], ['financial_reports.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('report_findings', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_report_findings_report_id'), ['report_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_report_findings_rule'), ['rule'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('report_findings', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_report_findings_rule'))
+        batch_op.drop_index(batch_op.f('ix_report_findings_report_id'))
+
+    op.drop_table('report_findings')
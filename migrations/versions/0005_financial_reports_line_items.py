@@ -0,0 +1,95 @@
+"""financial reports line items
+
+Строки отчета, упакованные в саму запись: financial_reports.line_items = {код строки: значение}.
+Для существующих отчетов колонка заполняется из дочерних таблиц пачками по id.
+Соответствие колонок кодам зафиксировано здесь, а не берется из приложения,
+чтобы миграция не менялась вместе с моделями.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16 23:57:48.527190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+# Дочерняя таблица -> {колонка: код строки формы}
+LINE_ITEM_CODES = {
+    'report_assets': {
+        'intangible_assets': '1110', 'research_and_dev_results': '1120', 'intangible_search_assets': '1130',
+        'tangible_search_assets': '1140', 'fixed_assets': '1150', 'income_bearing_investments': '1160',
+        'long_term_financial_investments': '1170', 'deferred_tax_assets': '1180',
+        'other_non_current_assets': '1190', 'total_non_current_assets': '1100', 'inventory': '1210',
+        'vat_receivable': '1220', 'accounts_receivable': '1230', 'financial_investments_sec_section': '1240',
+        'cash_and_equivalents': '1250', 'other_current_assets': '1260', 'total_current_assets': '1200',
+    },
+    'report_liabilities': {
+        'authorized_capital': '1310', 'own_shares_bought': '1320', 'non_current_assets_revaluation': '1340',
+        'additional_capital': '1350', 'reserve_capital': '1360', 'retained_earnings': '1370',
+        'total_capital': '1300', 'long_term_borrowings': '1410', 'deferred_tax_liabilities': '1420',
+        'estimated_liabilities': '1430', 'other_long_term_liabilities': '1450',
+        'total_long_term_liabilities': '1400', 'short_term_borrowings': '1510', 'accounts_payable': '1520',
+        'future_income': '1530', 'estimated_short_term_liabilities': '1540',
+        'other_short_term_liabilities': '1550', 'total_short_term_liabilities': '1500',
+        'total_balance_liabilities': '1700',
+    },
+    'report_profit_loss': {
+        'revenue': '2110', 'cost_of_sales': '2120', 'gross_profit': '2100', 'commercial_expenses': '2210',
+        'administrative_expenses': '2220', 'sales_profit': '2200', 'participation_income': '2310',
+        'interest_receivable': '2320', 'interest_payable': '2330', 'other_income': '2340',
+        'other_expenses': '2350', 'profit_before_tax': '2300', 'income_tax': '2410',
+        'current_income_tax': '2411', 'deferred_income_tax': '2412', 'other_operations': '2460',
+        'net_profit': '2400',
+    },
+}
+
+
+def _fill_line_items() -> None:
+    reports = sa.table('financial_reports', sa.column('id', sa.Integer), sa.column('line_items', sa.JSON))
+    tables = {
+        name: sa.table(name, sa.column('report_id', sa.Integer), *[sa.column(c, sa.Float) for c in columns])
+        for name, columns in LINE_ITEM_CODES.items()
+    }
+    codes = [code for columns in LINE_ITEM_CODES.values() for code in columns.values()]
+
+    stmt = sa.select(reports.c.id, *[tables[name].c[c] for name, columns in LINE_ITEM_CODES.items() for c in columns])
+    for name, table in tables.items():
+        stmt = stmt.outerjoin(table, table.c.report_id == reports.c.id)
+    update = reports.update()\
+        .where(reports.c.id == sa.bindparam('report_id'))\
+        .values(line_items=sa.bindparam('packed', type_=sa.JSON))
+
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(stmt.where(reports.c.id > last_id).order_by(reports.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            return
+        bind.execute(update, [
+            {'report_id': row[0], 'packed': {code: value for code, value in zip(codes, row[1:]) if value is not None}}
+            for row in rows
+        ])
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('financial_reports', sa.Column('line_items', sa.JSON(), nullable=True))
+    _fill_line_items()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('financial_reports', schema=None) as batch_op:
+        batch_op.drop_column('line_items')
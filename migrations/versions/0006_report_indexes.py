@@ -0,0 +1,42 @@
+"""report indexes
+
+Индексы для списка отчетов пользователя и для чтения дочерних таблиц по report_id.
+Отдельного индекса по user_id нет: его заменяет составной (user_id, created_at DESC).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16 23:57:54.836790
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_financial_reports_user_id_created_at', 'financial_reports',
+        ['user_id', sa.text('created_at DESC')], unique=False
+    )
+    op.create_index('ix_financial_reports_created_at', 'financial_reports', ['created_at'], unique=False)
+    op.create_index('ix_report_assets_report_id', 'report_assets', ['report_id'], unique=False)
+    op.create_index('ix_report_liabilities_report_id', 'report_liabilities', ['report_id'], unique=False)
+    op.create_index('ix_report_profit_loss_report_id', 'report_profit_loss', ['report_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_report_profit_loss_report_id', table_name='report_profit_loss')
+    op.drop_index('ix_report_liabilities_report_id', table_name='report_liabilities')
+    op.drop_index('ix_report_assets_report_id', table_name='report_assets')
+    op.drop_index('ix_financial_reports_created_at', table_name='financial_reports')
+    op.drop_index('ix_financial_reports_user_id_created_at', table_name='financial_reports')
@@ -0,0 +1,39 @@
+"""report list keyset index
+
+Составной индекс списка отчетов дополнен id: постраничная выдача идет по ключу
+(created_at, id), и с id в индексе порядок при равных created_at тоже берется из него.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 00:25:11.402318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_financial_reports_user_id_created_at_id', 'financial_reports',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False
+    )
+    op.drop_index('ix_financial_reports_user_id_created_at', table_name='financial_reports')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        'ix_financial_reports_user_id_created_at', 'financial_reports',
+        ['user_id', sa.text('created_at DESC')], unique=False
+    )
+    op.drop_index('ix_financial_reports_user_id_created_at_id', table_name='financial_reports')
@@ -0,0 +1,33 @@
+"""financial reports insert sentinel
+
+Колонка для многострочного INSERT ... RETURNING в bulk_insert_reports: SQLAlchemy пишет
+в нее номер строки в пачке и по нему раскладывает вернувшиеся id в порядке отчетов.
+Без нее на SQLite такой INSERT выполнялся по одной строке.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 00:06:42.359125
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('financial_reports', sa.Column('insert_sentinel', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('financial_reports', schema=None) as batch_op:
+        batch_op.drop_column('insert_sentinel')
@@ -0,0 +1,58 @@
+"""on delete cascade
+
+Удаление пользователя и отчета одним DELETE: строки отчетов пользователя
+и строки разделов отчета удаляет сама БД по ON DELETE CASCADE.
+В 0001 у внешних ключей нет имен: в PostgreSQL это <таблица>_<колонка>_fkey,
+в SQLite такое же имя дает naming_convention для пересоздаваемой таблицы.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 00:09:12.504217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NAMING_CONVENTION = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+
+FOREIGN_KEYS = [
+    ("financial_reports", "user_id", "users"),
+    ("report_assets", "report_id", "financial_reports"),
+    ("report_liabilities", "report_id", "financial_reports"),
+    ("report_profit_loss", "report_id", "financial_reports"),
+]
+
+
+def _replace_foreign_keys(ondelete: str | None) -> None:
+    for table, column, referred in FOREIGN_KEYS:
+        name = f"{table}_{column}_fkey"
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(name, type_="foreignkey")
+            batch_op.create_foreign_key(name, referred, [column], ["id"], ondelete=ondelete)
+
+    if op.get_bind().dialect.name == "sqlite":
+        # batch-режим пересоздал financial_reports с индексами из отражения, а SQLite отражает их без DESC
+        op.drop_index('ix_financial_reports_user_id_created_at_id', table_name='financial_reports')
+        op.create_index(
+            'ix_financial_reports_user_id_created_at_id', 'financial_reports',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _replace_foreign_keys("CASCADE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _replace_foreign_keys(None)
@@ -0,0 +1,33 @@
+"""financial reports version
+
+Номер версии строк отчета: растет при каждом их изменении.
+Из него (вместе с версиями анализатора и генератора PDF) строится ETag
+ответов GET /analysis/{id}/json и GET /reports/{id}/export/pdf.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 00:11:37.218904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('financial_reports', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('financial_reports', schema=None) as batch_op:
+        batch_op.drop_column('version')
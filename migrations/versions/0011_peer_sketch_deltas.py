@@ -0,0 +1,43 @@
+"""peer sketch deltas
+
+Изменения скетчей сравнения, еще не слитые в peer_sketches: загрузка и удаление
+отчетов только добавляют сюда строки, а не блокируют и не обновляют строку периода.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17 00:35:22.663988
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('peer_sketch_deltas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(), nullable=False),
+    sa.Column('report_count', sa.Integer(), nullable=False),
+    sa.Column('sketches', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('peer_sketch_deltas', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_peer_sketch_deltas_period'), ['period'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('peer_sketch_deltas', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_peer_sketch_deltas_period'))
+
+    op.drop_table('peer_sketch_deltas')
@@ -0,0 +1,47 @@
+"""scoring model score columns
+
+Колонки баллов для моделей оценки банкротства, добавленных в реестр SCORING_MODELS
+после altman и taffler, - чтобы по ним работал отбор (/analysis/screen). Для уже
+сохраненных результатов анализа баллы переносятся из JSON-колонки result.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17 00:37:27.918197
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, Sequence[str], None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MODELS = ('springate', 'saifullin', 'zaitseva')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('report_analysis', schema=None) as batch_op:
+        for name in MODELS:
+            batch_op.add_column(sa.Column(f'{name}_score', sa.Float(), nullable=True))
+            batch_op.create_index(batch_op.f(f'ix_report_analysis_{name}_score'), [f'{name}_score'], unique=False)
+
+    report_analysis = sa.table('report_analysis', sa.column('result', sa.JSON),
+                               *[sa.column(f'{name}_score', sa.Float) for name in MODELS])
+    op.execute(report_analysis.update().values({
+        f'{name}_score': report_analysis.c.result[(f'bankruptcy_{name}', 'score')].as_float()
+        for name in MODELS
+    }))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('report_analysis', schema=None) as batch_op:
+        for name in MODELS:
+            batch_op.drop_index(batch_op.f(f'ix_report_analysis_{name}_score'))
+            batch_op.drop_column(f'{name}_score')
@@ -0,0 +1,58 @@
+"""financial reports organization name folded
+
+Название организации в str.casefold() для поиска без учета регистра:
+lower() в SQLite меняет регистр только латиницы. Для существующих отчетов
+колонка заполняется в Python пачками по id.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17 01:02:14.603118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0013'
+down_revision: Union[str, Sequence[str], None] = '0012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def _fill_folded_names() -> None:
+    reports = sa.table('financial_reports', sa.column('id', sa.Integer),
+                       sa.column('organization_name', sa.String), sa.column('organization_name_folded', sa.String))
+    update = reports.update()\
+        .where(reports.c.id == sa.bindparam('report_id'))\
+        .values(organization_name_folded=sa.bindparam('folded'))
+
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(reports.c.id, reports.c.organization_name)
+            .where(reports.c.id > last_id).order_by(reports.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        bind.execute(update, [{'report_id': row[0], 'folded': row[1].casefold()} for row in rows])
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('financial_reports', sa.Column('organization_name_folded', sa.String(), nullable=True))
+    _fill_folded_names()
+    with op.batch_alter_table('financial_reports', schema=None) as batch_op:
+        batch_op.alter_column('organization_name_folded', existing_type=sa.String(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('financial_reports', schema=None) as batch_op:
+        batch_op.drop_column('organization_name_folded')
@@ -0,0 +1,13 @@
+"""
+
+Общие настройки тестов: окружение задается до первого импорта app (app.config читает его при импорте)
+
+"""
+import os
+import tempfile
+
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+# Загрузки, выученные шаблоны и кэш PDF - во временном каталоге, а не в uploads/ проекта
+os.environ.setdefault("UPLOAD_STORE_DIR", tempfile.mkdtemp(prefix="test-uploads-"))
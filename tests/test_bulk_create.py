@@ -0,0 +1,61 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from app.config import BULK_CREATE_MAX_REPORTS, BULK_INSERT_BATCH_SIZE
+from app.main import app
+from app.models import FinancialReport, ReportAnalysis, ReportAssets, ReportLiabilities, ReportProfitLoss
+from tests.utils import client, login, report_data, setup_database
+
+
+def _post_bulk(tmp_path, *bodies):
+    """POST /reports/bulk с каждым из bodies; возвращает (ответы, число строк по таблицам, id -> период)"""
+    async def run():
+        engine, sessions = await setup_database(tmp_path / "t.db", 1)
+        login(1)
+        try:
+            async with client() as http:
+                responses = [await http.post("/reports/bulk", json=body) for body in bodies]
+            async with sessions() as db:
+                counts = {
+                    model.__tablename__: (await db.execute(select(func.count()).select_from(model))).scalar_one()
+                    for model in (FinancialReport, ReportAssets, ReportLiabilities, ReportProfitLoss, ReportAnalysis)
+                }
+                periods = dict((await db.execute(select(FinancialReport.id, FinancialReport.period))).all())
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+        return responses, counts, periods
+
+    return asyncio.run(run())
+
+
+def test_bulk_create_keeps_request_positions(tmp_path):
+    # Больше одной пачки INSERT; два отчета с ошибками - в середине и в конце
+    size = 2 * BULK_INSERT_BATCH_SIZE + 10
+    body = [report_data(period=f"P{i}") for i in range(size)]
+    body[7] = report_data(period="P7", organization_name=None)
+    body.append({"period": "broken"})
+
+    [response], counts, periods = _post_bulk(tmp_path, body)
+    assert response.status_code == 201, response.text
+    result = response.json()
+
+    assert [error["index"] for error in result["errors"]] == [7, size]
+    assert result["ids"][7] is None and result["ids"][size] is None
+    saved = {i: report_id for i, report_id in enumerate(result["ids"]) if report_id is not None}
+    assert len(saved) == size - 1
+    # id на позиции i - отчет i из запроса
+    assert all(periods[report_id] == f"P{i}" for i, report_id in saved.items())
+    assert counts == dict.fromkeys(counts, size - 1)
+
+
+def test_bulk_create_rejects_empty_and_oversized_requests(tmp_path):
+    oversized = [{}] * (BULK_CREATE_MAX_REPORTS + 1)
+    (invalid, too_long, empty), counts, _ = _post_bulk(tmp_path, [{"period": "2024"}], oversized, [])
+
+    assert invalid.status_code == 400
+    assert invalid.json()["detail"]["errors"][0]["index"] == 0
+    assert too_long.status_code == 422
+    assert empty.status_code == 400
+    assert counts == dict.fromkeys(counts, 0)
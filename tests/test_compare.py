@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from app.main import app
+from app.services.bulk_import import bulk_insert_reports
+from app.services.line_items import LINE_ITEM_CODES, line_item_values, pack_line_items
+from app.services.math_engine import COMPARE_INDICATORS, ReportComparator
+from tests.utils import client, login, report, setup_database
+
+
+def test_compare_matrix():
+    base = line_item_values(pack_line_items(report()))
+    curr = line_item_values(pack_line_items(report(assets__inventory=None, profit_loss__revenue=1500)))
+    matrix = ReportComparator.compare_matrix([base, curr])
+
+    row = {name: i for i, name in enumerate(matrix["indicators"])}
+    revenue, inventory, total = row["revenue"], row["inventory"], row["balance_total"]
+    assert matrix["indicators"][:-1] == list(LINE_ITEM_CODES)
+
+    assert matrix["values"][revenue] == [1000.0, 1500.0]
+    assert matrix["abs_change"][revenue] == [0.0, 500.0]
+    assert matrix["growth_rate"][revenue] == [0.0, 50.0]
+    # NULL - это 0.0: запасы упали на 100%
+    assert matrix["values"][inventory] == [40.0, 0.0]
+    assert matrix["growth_rate"][inventory] == [0.0, -100.0]
+    # Доля строки баланса - от валюты баланса, строки ОФР - от выручки
+    assert matrix["values"][total] == [200.0, 200.0]
+    assert matrix["share"][inventory] == [20.0, 0.0]
+    assert matrix["share"][row["net_profit"]] == [32.0, pytest.approx(21.33)]
+    # Базовое значение 0 - темп прироста 0, а не деление на ноль
+    assert matrix["growth_rate"][row["total_long_term_liabilities"]] == [0.0, 0.0]
+
+
+def test_compare_endpoint_matches_matrix(tmp_path):
+    async def run():
+        engine, sessions = await setup_database(tmp_path / "t.db", 1)
+        login(1)
+        try:
+            async with sessions() as db:
+                ids = await bulk_insert_reports(db, 1, [
+                    report(period="2023"),
+                    report(period="2024", liabilities__total_capital=150, profit_loss__net_profit=-80),
+                ])
+                await db.commit()
+            async with client() as http:
+                pair = await http.post("/reports/compare", params={"base_report_id": ids[0], "curr_report_id": ids[1]})
+                matrix = await http.post("/reports/compare/matrix", json={"report_ids": ids})
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+        return pair, matrix
+
+    pair, matrix = asyncio.run(run())
+    assert pair.status_code == 200 and matrix.status_code == 200
+    body, matrix = pair.json(), matrix.json()
+    assert (body["period_base"], body["period_curr"]) == ("2023", "2024")
+
+    row = {name: i for i, name in enumerate(matrix["indicators"])}
+    expected = [
+        {
+            "indicator": title,
+            "value_base": matrix["values"][row[name]][0],
+            "value_curr": matrix["values"][row[name]][1],
+            "abs_change": matrix["abs_change"][row[name]][1],
+            "growth_rate": matrix["growth_rate"][row[name]][1],
+        }
+        for title, name in COMPARE_INDICATORS.items()
+    ]
+    assert body["rows"] == expected
+    assert body["rows"][1] == {"indicator": "Чистая прибыль", "value_base": 320.0, "value_curr": -80.0,
+                               "abs_change": -400.0, "growth_rate": -125.0}
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+from app.services.consistency import ConsistencyValidator
+from tests.utils import report
+
+
+def test_consistent_report_has_no_findings():
+    # Себестоимость без скобок тоже вычитается
+    reports = [report(), report(profit_loss__cost_of_sales=600)]
+    assert ConsistencyValidator(1.0, 0.0).check_reports(reports) == [[], []]
+
+
+def test_broken_totals_are_reported_within_tolerance():
+    validator = ConsistencyValidator(abs_tolerance=1.0, rel_tolerance=0.0)
+    findings = validator.check_reports([
+        report(assets__total_current_assets=150),
+        report(assets__total_current_assets=100.5),
+    ])
+
+    assert [f["rule"] for f in findings[0]] == ["current_assets", "balance"]
+    assert findings[0][0]["expected"] == 100 and findings[0][0]["actual"] == 150
+    assert findings[1] == []
+
+
+def test_unknown_consistency_mode_fails_at_startup():
+    # Отдельный процесс: app.config читает окружение один раз при импорте
+    def import_config(mode):
+        return subprocess.run([sys.executable, "-c", "import app.config"], capture_output=True, text=True,
+                              env=dict(os.environ, CONSISTENCY_MODE=mode))
+
+    assert import_config("reject").returncode == 0
+    failed = import_config("strict")
+    assert failed.returncode != 0
+    assert "CONSISTENCY_MODE must be warn or reject, got 'strict'" in failed.stderr
@@ -0,0 +1,100 @@
+import asyncio
+import io
+import re
+import zipfile
+
+import openpyxl
+
+from app.schemas import FinancialReportCreate
+from app.services import excel_parser
+from app.services.excel_parser import (build_report_payload, parse_balance_sheet, parse_balance_sheet_async,
+                                       parse_balance_sheet_periods_async, shutdown_executor)
+from app.services.template_registry import TemplateRegistry, XlsxSheetReader, row_tuple
+from tests.utils import report_data, statement_rows, xlsx_bytes
+
+
+def test_parse_round_trip_in_process_pool():
+    current = report_data(period="2024")
+    previous = report_data(period="2023", assets__inventory=30, assets__cash_and_equivalents=70,
+                           profit_loss__revenue=800, profit_loss__net_profit=250)
+    raw = xlsx_bytes(statement_rows(current, previous))
+
+    async def run():
+        try:
+            return await asyncio.gather(parse_balance_sheet_async(raw), parse_balance_sheet_periods_async(raw))
+        finally:
+            shutdown_executor()
+
+    single, periods = asyncio.run(run())
+
+    # Одна колонка - первое число правее кода, то есть отчетный период
+    assert single == {field: float(value) for section in ("assets", "liabilities", "profit_loss")
+                      for field, value in current[section].items()}
+
+    assert [entry["period"] for entry in periods] == ["2024", "2023"]
+    for entry, data in zip(periods, (current, previous)):
+        assert build_report_payload("Test", entry["period"], entry["values"]) == FinancialReportCreate(**data)
+
+
+def test_template_fast_path_falls_back_on_unknown_code(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_parser, "template_registry", TemplateRegistry(tmp_path / "templates.json", 16))
+    full_scans = []
+    full_scan = excel_parser._full_scan
+    monkeypatch.setattr(excel_parser, "_full_scan", lambda rows: full_scans.append(1) or full_scan(rows))
+
+    # Та же форма, но у второго файла есть строка ниже всех известных шаблону (чистая прибыль)
+    learned = xlsx_bytes(statement_rows(report_data(profit_loss__net_profit=None)))
+    extended = xlsx_bytes(statement_rows(report_data()))
+
+    parse_balance_sheet(learned)
+    assert "net_profit" not in parse_balance_sheet(learned)
+    assert len(full_scans) == 1  # второй раз - по шаблону
+
+    assert parse_balance_sheet(extended)["net_profit"] == 320.0
+    assert len(full_scans) == 2
+
+
+def _strip_refs(raw: bytes) -> bytes:
+    """Та же книга без атрибутов r у строк и ячеек (в OOXML они необязательны)"""
+    source = zipfile.ZipFile(io.BytesIO(raw))
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as target:
+        for item in source.infolist():
+            data = source.read(item)
+            if item.filename.startswith("xl/worksheets/"):
+                data = re.sub(rb'(<(?:row|c)\b[^>]*?)\sr="[A-Z]*\d+"', rb"\1", data)
+            target.writestr(item, data)
+    return out.getvalue()
+
+
+def test_sheet_without_row_and_cell_refs(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_parser, "template_registry", TemplateRegistry(tmp_path / "templates.json", 16))
+    full_scans = []
+    full_scan = excel_parser._full_scan
+    monkeypatch.setattr(excel_parser, "_full_scan", lambda rows: full_scans.append(1) or full_scan(rows))
+
+    raw = xlsx_bytes(statement_rows(report_data()))
+    stripped = _strip_refs(raw)
+    assert b' r="' not in zipfile.ZipFile(io.BytesIO(stripped)).read("xl/worksheets/sheet1.xml")
+
+    # Номера строк и колонок - как у openpyxl
+    reader = XlsxSheetReader(stripped, 100)
+    wb = openpyxl.load_workbook(io.BytesIO(stripped), read_only=True)
+    try:
+        assert [row_tuple(values) for _, values in reader.iter_rows()] == \
+            [row_tuple({i: v for i, v in enumerate(row) if v is not None}) for row in wb.active.iter_rows(values_only=True)]
+    finally:
+        reader.close()
+        wb.close()
+
+    expected = parse_balance_sheet(raw)
+    assert len(full_scans) == 1
+    # Шаблон уже известен: файл без r читается быстрым путем и дает то же самое
+    assert parse_balance_sheet(stripped) == expected
+    assert len(full_scans) == 1
+    assert expected["net_profit"] == 320.0
+
+    # Незнакомая разметка без r - полный просмотр openpyxl
+    monkeypatch.setattr(excel_parser, "template_registry", TemplateRegistry(tmp_path / "other.json", 16))
+    assert parse_balance_sheet(stripped) == expected
+    assert len(full_scans) == 2
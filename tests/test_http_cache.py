@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import os
+
+import httpx
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.api.auth import get_current_user
+from app.database import get_read_db, make_engine
+from app.main import app
+from app.models import Base, ReportAssets, User
+from app.schemas import TokenData
+from app.services.bulk_import import bulk_insert_reports
+from app.services.http_cache import etag_matches
+from app.services.pdf_cache import PdfCache, pdf_cache
+from tests.utils import client, login, report, setup_database, statements, user_row
+
+
+def test_etag_matches():
+    assert etag_matches('"a-1"', '"a-1"')
+    assert etag_matches('"b", W/"a-1"', '"a-1"')
+    assert etag_matches("*", '"a-1"')
+    assert not etag_matches('"a-2"', '"a-1"')
+    assert not etag_matches(None, '"a-1"')
+
+
+def test_pdf_cache_evicts_least_recently_used(tmp_path):
+    async def run():
+        cache = PdfCache(tmp_path, max_bytes=2500)
+        for name in ("a", "b"):
+            await cache.put(name, b"x" * 1000)
+            os.utime(cache.path_for(name), (1, 1))  # оба файла "старые"
+        assert await cache.get("a") is not None     # a прочитан - теперь b самый старый
+        await cache.put("c", b"x" * 1000)
+        return [await cache.get(name) is not None for name in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == [True, False, True]
+    assert not list((tmp_path / "tmp").iterdir())
+
+
+def test_conditional_analysis_and_pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, "root", tmp_path / "pdf")
+
+    async def run():
+        engine = make_engine(f"sqlite+aiosqlite:///{tmp_path}/t.db")
+        sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User), [user_row(1), user_row(2)])
+        async with sessions() as db:
+            [report_id] = await bulk_insert_reports(db, 1, [report()])
+            await db.commit()
+
+        async def override_get_read_db():
+            async with sessions() as session:
+                yield session
+
+        current = {"user": TokenData(username="user1", id=1, role="accountant")}
+        app.dependency_overrides[get_read_db] = override_get_read_db
+        app.dependency_overrides[get_current_user] = lambda: current["user"]
+        responses = {}
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                url = f"/analysis/{report_id}/json"
+                responses["json"] = first = await client.get(url)
+                responses["json_304"] = await client.get(url, headers={"If-None-Match": first.headers["etag"]})
+                responses["fields"] = await client.get(url, params={"fields": "liquidity"},
+                                                       headers={"If-None-Match": first.headers["etag"]})
+                responses["percentiles"] = await client.get(url, params={"percentiles": "true"},
+                                                            headers={"If-None-Match": first.headers["etag"]})
+
+                pdf_url = f"/reports/{report_id}/export/pdf"
+                responses["pdf"] = pdf = await client.get(pdf_url)
+                # Второй раз - из pdf_cache: без загрузки анализа и отрисовки
+                responses["pdf_again"] = await client.get(pdf_url)
+                responses["pdf_304"] = await client.get(pdf_url, headers={"If-None-Match": pdf.headers["etag"]})
+
+                current["user"] = TokenData(username="user2", id=2, role="accountant")
+                responses["other_user"] = await client.get(url, headers={"If-None-Match": first.headers["etag"]})
+                current["user"] = TokenData(username="user1", id=1, role="accountant")
+
+                # Изменение строк отчета через ORM меняет версию, старый ETag больше не подходит
+                async with sessions() as db:
+                    assets = (await db.execute(select(ReportAssets).where(ReportAssets.report_id == report_id)))\
+                        .scalar_one()
+                    assets.inventory = 50
+                    await db.commit()
+                responses["changed"] = await client.get(url, headers={"If-None-Match": first.headers["etag"]})
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+        return responses
+
+    r = asyncio.run(run())
+    assert r["json"].status_code == 200
+    assert r["json"].headers["cache-control"] == "private, no-cache"
+
+    assert r["json_304"].status_code == 304 and r["json_304"].content == b""
+    assert r["json_304"].headers["etag"] == r["json"].headers["etag"]
+    # Только запрос версии отчета: ни анализа, ни строк
+    assert statements(r["json_304"]) == 1
+
+    assert r["fields"].status_code == 200 and r["fields"].headers["etag"] != r["json"].headers["etag"]
+    assert r["percentiles"].status_code == 200 and "etag" not in r["percentiles"].headers
+
+    assert r["pdf"].status_code == 200 and r["pdf"].headers["etag"] != r["json"].headers["etag"]
+    # Одинаковые данные - одинаковые байты: ETag строгий
+    assert r["pdf_again"].content == r["pdf"].content
+    assert r["pdf_again"].headers["etag"] == r["pdf"].headers["etag"]
+    assert statements(r["pdf"]) > 1 and statements(r["pdf_again"]) == 1
+    assert r["pdf_304"].status_code == 304 and statements(r["pdf_304"]) == 1
+
+    assert r["other_user"].status_code == 403
+    assert r["changed"].status_code == 200 and r["changed"].headers["etag"] != r["json"].headers["etag"]
+
+
+def test_pdf_served_from_memory_when_cache_write_fails(tmp_path, monkeypatch, caplog):
+    def disk_full(identity, data):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(pdf_cache, "root", tmp_path / "pdf")
+    monkeypatch.setattr(pdf_cache, "_put_sync", disk_full)
+
+    async def run():
+        engine, sessions = await setup_database(tmp_path / "t.db", 1)
+        login(1)
+        try:
+            async with sessions() as db:
+                [report_id] = await bulk_insert_reports(db, 1, [report()])
+                await db.commit()
+            async with client() as http:
+                return await http.get(f"/reports/{report_id}/export/pdf")
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+
+    with caplog.at_level(logging.WARNING, logger="app.api.reports"):
+        response = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF") and "etag" in response.headers
+    assert any("PDF cache write failed" in record.getMessage() for record in caplog.records)
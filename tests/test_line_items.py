@@ -0,0 +1,56 @@
+import asyncio
+
+from sqlalchemy import select, update
+
+from app.main import app
+from app.models import FinancialReport, ReportAssets, ReportProfitLoss
+from app.services.bulk_import import bulk_insert_reports
+from app.services.line_items import find_line_item_drift, repack_line_items
+from tests.utils import REPORT, client, login, report, setup_database
+
+
+def test_write_paths_keep_line_items_in_sync(tmp_path):
+    async def run():
+        engine, sessions = await setup_database(tmp_path / "t.db", 1)
+        login(1)
+        try:
+            # Создание: INSERT через Core (bulk) и через ORM (POST /reports/)
+            async with sessions() as db:
+                bulk_ids = await bulk_insert_reports(db, 1, [report(period="2023"), report(period="2024")])
+                await db.commit()
+            async with client() as http:
+                response = await http.post("/reports/", json=REPORT)
+            assert response.status_code == 201, response.text
+            orm_id = response.json()["id"]
+
+            async with sessions() as db:
+                created = await find_line_item_drift(db, batch_size=2)
+
+                # Изменение через ORM переносится в line_items в before_flush
+                assets = (await db.execute(select(ReportAssets).where(ReportAssets.report_id == orm_id))).scalar_one()
+                assets.inventory = 55.0
+                await db.commit()
+                after_orm = await find_line_item_drift(db, batch_size=2)
+
+                # UPDATE в обход ORM без repack_line_items - расхождение
+                await db.execute(update(ReportProfitLoss)
+                                 .where(ReportProfitLoss.report_id == bulk_ids[1])
+                                 .values(revenue=1500.0))
+                await db.commit()
+                after_core = await find_line_item_drift(db, batch_size=2)
+
+                await repack_line_items(db, after_core)
+                await db.commit()
+                repacked = await find_line_item_drift(db, batch_size=2)
+                line_items = dict((await db.execute(select(FinancialReport.id, FinancialReport.line_items))).all())
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+        return bulk_ids, orm_id, created, after_orm, after_core, repacked, line_items
+
+    bulk_ids, orm_id, created, after_orm, after_core, repacked, line_items = asyncio.run(run())
+    assert created == [] and after_orm == []
+    assert after_core == [bulk_ids[1]]
+    assert repacked == []
+    assert line_items[orm_id]["1210"] == 55.0
+    assert line_items[bulk_ids[1]]["2110"] == 1500.0
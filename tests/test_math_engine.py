@@ -0,0 +1,140 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.math_engine import (FinancialAnalyzer, BatchFinancialAnalyzer, ANALYZER_INPUTS,
+                                     resolve_fields, required_inputs, evaluate_metrics, evaluate_metrics_batch,
+                                     TrendAnalyzer, compile_scoring_model, ALL_FIELDS)
+from app.services.scoring_models import ScoringModel
+
+
+def random_report(rnd: random.Random):
+    def value():
+        roll = rnd.random()
+        if roll < 0.1:
+            return None
+        if roll < 0.2:
+            return 0.0
+        return round(rnd.uniform(-1e6, 1e7), 2)
+
+    sections = {"ReportAssets": {}, "ReportLiabilities": {}, "ReportProfitLoss": {}}
+    for column in ANALYZER_INPUTS.values():
+        sections[column.class_.__name__][column.key] = value()
+
+    return SimpleNamespace(
+        assets=SimpleNamespace(**sections["ReportAssets"]),
+        liabilities=SimpleNamespace(**sections["ReportLiabilities"]),
+        profit_loss=SimpleNamespace(**sections["ReportProfitLoss"]),
+    )
+
+
+def empty_report():
+    return SimpleNamespace(
+        assets=SimpleNamespace(**{c.key: None for c in ANALYZER_INPUTS.values() if c.class_.__name__ == "ReportAssets"}),
+        liabilities=SimpleNamespace(**{c.key: 0.0 for c in ANALYZER_INPUTS.values() if c.class_.__name__ == "ReportLiabilities"}),
+        profit_loss=SimpleNamespace(**{c.key: None for c in ANALYZER_INPUTS.values() if c.class_.__name__ == "ReportProfitLoss"}),
+    )
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_batch_analyzer_matches_scalar(seed):
+    rnd = random.Random(seed)
+    reports = [random_report(rnd) for _ in range(500)] + [empty_report()]
+
+    batch = BatchFinancialAnalyzer.from_reports(reports).get_analysis_list()
+
+    assert len(batch) == len(reports)
+    # Один граф METRICS и одинаковое округление: совпадение точное, а не приближенное
+    for report, vectorized in zip(reports, batch):
+        assert vectorized.model_dump() == FinancialAnalyzer(report).get_full_analysis().model_dump()
+
+
+def test_rounding_ties_match_numpy():
+    # round(0.00025, 4) == 0.0003, а np.round дает 0.0002; оба пути должны дать одно
+    inputs = {name: 0.0 for name in ANALYZER_INPUTS}
+    inputs.update(current_assets=0.00025, short_liabilities=1.0)
+    columns = {name: np.array([value]) for name, value in inputs.items()}
+
+    scalar = evaluate_metrics(["liquidity.current_ratio"], inputs)
+    batch = evaluate_metrics_batch(["liquidity.current_ratio"], columns)
+    assert scalar["liquidity"]["current_ratio"] == batch["liquidity"]["current_ratio"].item()
+
+
+def test_batch_analyzer_empty():
+    result = BatchFinancialAnalyzer.from_rows([]).get_full_analysis()
+    assert result["liquidity"]["current_ratio"] == []
+    assert result["bankruptcy_altman"]["conclusion"] == []
+
+
+def test_selected_fields_need_only_their_inputs():
+    fields = resolve_fields(["liquidity.current_ratio", "bankruptcy_altman.score"])
+    assert required_inputs(["liquidity.current_ratio"]) == ["current_assets", "short_liabilities"]
+
+    report = random_report(random.Random(3))
+    full = FinancialAnalyzer(report).get_full_analysis()
+    inputs = {name: FinancialAnalyzer(report).inputs[name] for name in required_inputs(fields)}
+
+    assert evaluate_metrics(fields, inputs) == {
+        "liquidity": {"current_ratio": full.liquidity["current_ratio"]},
+        "bankruptcy_altman": {"score": full.bankruptcy_altman["score"]},
+    }
+
+
+def test_scoring_model_is_compiled_for_scalar_and_batch():
+    model = ScoringModel(
+        name="test",
+        title="Test Model",
+        factors={"x1": "abs(revenue - cost_of_sales) / total_assets", "x2": "max(net_profit, 0) / revenue"},
+        coefficients={"x1": 1.0, "x2": 2.0},
+        bands=(("<", "1 + x2", "bad"),),
+        otherwise="good",
+        zones=("bad", "good"),
+    )
+    compiled = compile_scoring_model(model, set(ANALYZER_INPUTS) | {"total_assets"})
+    assert compiled.inputs == ("revenue", "cost_of_sales", "total_assets", "net_profit")
+
+    # x1 = 0.5, x2 = 0.25: z = 1.0 < 1.25
+    assert compiled.scalar(100.0, 50.0, 100.0, 25.0) == (1.0, 0)
+    z, zone = compiled.batch(np.array([100.0, 100.0]), np.array([50.0, -150.0]),
+                             np.array([100.0, 100.0]), np.array([25.0, 0.0]))
+    assert z.tolist() == [1.0, 2.5]
+    assert zone.tolist() == [0, 1]
+
+
+@pytest.mark.parametrize("formula", ["revenue ** 2", "__import__('os')", "revenue.real", "unknown / revenue"])
+def test_scoring_model_rejects_unsafe_formulas(formula):
+    model = ScoringModel("bad", "Bad", {"x1": formula}, {"x1": 1.0}, (), "ok", ("ok",))
+    with pytest.raises(ValueError):
+        compile_scoring_model(model, set(ANALYZER_INPUTS))
+
+
+def test_new_scoring_models_are_in_full_analysis():
+    assert {"bankruptcy_springate.score", "bankruptcy_zaitseva.conclusion"} <= set(ALL_FIELDS)
+    result = FinancialAnalyzer(random_report(random.Random(4))).get_full_analysis()
+    assert set(result.bankruptcy_saifullin) == {"score", "conclusion"}
+
+
+def test_unknown_field_is_rejected():
+    with pytest.raises(ValueError):
+        resolve_fields(["liquidity.unknown"])
+
+
+def test_trend_changes_and_cagr():
+    rows = [
+        (3, "2024", 121.0, None),
+        (1, "2022", 100.0, 5.0),
+        (2, "2023", 110.0, 0.0),
+    ]
+    trend = TrendAnalyzer.from_rows(sorted(rows), ["revenue", "net_profit"]).get_trend()
+
+    assert trend["periods"] == ["2022", "2023", "2024"]
+    assert trend["report_ids"] == [1, 2, 3]
+    revenue, net_profit = trend["series"]
+    assert revenue["abs_change"] == [None, 10.0, 11.0]
+    assert revenue["growth_rate"] == [None, 10.0, 10.0]
+    assert revenue["cagr"] == 10.0
+    assert net_profit["values"] == [5.0, 0.0, None]
+    assert net_profit["growth_rate"] == [None, -100.0, None]
+    assert net_profit["cagr"] is None
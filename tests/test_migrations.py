@@ -0,0 +1,94 @@
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import desc, select, tuple_
+from sqlalchemy.dialects import sqlite
+
+from app.database import ALEMBIC_INI
+from app.models import FinancialReport, ReportAssets, ReportLiabilities, ReportProfitLoss
+
+
+@pytest.fixture(scope="module")
+def migrated_db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("migrations") / "test.db"
+    cfg = Config(str(ALEMBIC_INI))
+    cfg.attributes["configure_logger"] = False
+    cfg.set_main_option("sqlalchemy.url", f"sqlite+aiosqlite:///{path}")
+    command.upgrade(cfg, "head")
+    return cfg, path
+
+
+def _plan(path, stmt) -> str:
+    sql = str(stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    with sqlite3.connect(path) as conn:
+        return "\n".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+
+
+def test_models_match_migrations(migrated_db):
+    cfg, _ = migrated_db
+    command.check(cfg)
+
+
+@pytest.mark.parametrize("order", ["desc", "asc"])
+def test_user_reports_page_uses_composite_index(migrated_db, order):
+    _, path = migrated_db
+    key = tuple_(FinancialReport.created_at, FinancialReport.id)
+    last_key = tuple_(datetime(2024, 1, 1), 100)
+    stmt = select(FinancialReport.id, FinancialReport.created_at)\
+        .where(FinancialReport.user_id == 1)\
+        .limit(51)
+    if order == "desc":
+        stmt = stmt.where(key < last_key).order_by(desc(FinancialReport.created_at), desc(FinancialReport.id))
+    else:
+        stmt = stmt.where(key > last_key).order_by(FinancialReport.created_at, FinancialReport.id)
+
+    plan = _plan(path, stmt)
+    assert "ix_financial_reports_user_id_created_at_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+@pytest.mark.parametrize("model", [ReportAssets, ReportLiabilities, ReportProfitLoss])
+def test_line_items_by_report_use_index(migrated_db, model):
+    _, path = migrated_db
+    plan = _plan(path, select(model).where(model.report_id.in_([1, 2, 3])))
+    assert f"ix_{model.__tablename__}_report_id" in plan
+
+    joined = select(FinancialReport.id, model.id)\
+        .outerjoin(model, model.report_id == FinancialReport.id)\
+        .where(FinancialReport.id.in_([1, 2, 3]))
+    assert f"ix_{model.__tablename__}_report_id" in _plan(path, joined)
+
+
+def test_baseline_database_upgrades_to_head(tmp_path):
+    # База в исходной схеме (create_all до миграций), переведенная на миграции через stamp 0001
+    path = tmp_path / "baseline.db"
+    cfg = Config(str(ALEMBIC_INI))
+    cfg.attributes["configure_logger"] = False
+    cfg.set_main_option("sqlalchemy.url", f"sqlite+aiosqlite:///{path}")
+    command.upgrade(cfg, "0001")
+
+    with sqlite3.connect(path) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert tables == {"alembic_version", "users", "financial_reports",
+                          "report_assets", "report_liabilities", "report_profit_loss"}
+        conn.execute("INSERT INTO users (id, username, hashed_password, email, role) "
+                     "VALUES (1, 'user1', '-', 'user1@example.com', 'ACCOUNTANT')")
+        conn.executemany("INSERT INTO financial_reports (id, user_id, organization_name, period) VALUES (?, 1, 'Org', ?)",
+                         [(1, "2023"), (2, "2024")])
+        conn.executemany("INSERT INTO report_assets (report_id, inventory, total_current_assets) VALUES (?, ?, ?)",
+                         [(1, 40.0, 100.0), (2, None, 80.0)])
+        conn.execute("INSERT INTO report_profit_loss (report_id, revenue, net_profit) VALUES (1, 1000.0, -5.0)")
+
+    command.upgrade(cfg, "head")
+    command.check(cfg)
+
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("SELECT id, line_items FROM financial_reports ORDER BY id").fetchall()
+    assert [(report_id, json.loads(packed)) for report_id, packed in rows] == [
+        (1, {"1210": 40.0, "1200": 100.0, "2110": 1000.0, "2400": -5.0}),
+        (2, {"1200": 80.0}),
+    ]
@@ -0,0 +1,129 @@
+import asyncio
+from collections import Counter
+
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+
+from app.models import PeerSketch, PeerSketchDelta
+from app.services import peer_sketch
+from app.services.bulk_import import bulk_insert_reports
+from app.services.peer_sketch import (QuantileSketch, merge_peer_sketch_deltas, merge_peer_sketches_periodically,
+                                      peer_percentiles, update_peer_sketches)
+from tests.utils import report, setup_database
+
+ACCURACY = 0.01
+
+
+def _values(rng: np.random.Generator, size: int) -> np.ndarray:
+    """Логнормальные суммы разных знаков и точные нули - как показатели отчетов"""
+    values = rng.lognormal(mean=0, sigma=3, size=size) * rng.choice([-1, 1], size=size, p=[0.3, 0.7])
+    values[rng.random(size) < 0.05] = 0.0
+    return values
+
+
+def _sketch(values) -> QuantileSketch:
+    sketch = QuantileSketch(accuracy=ACCURACY, max_buckets=100_000)
+    for value in values:
+        sketch.add(float(value))
+    return sketch
+
+
+def test_quantile_relative_error_bound():
+    values = _values(np.random.default_rng(0), 20_000)
+    sketch = _sketch(values)
+
+    for q in np.linspace(0, 1, 101):
+        # quantile берет значение с номером floor(q * (n - 1)) - это method="lower"
+        exact = np.quantile(values, q, method="lower")
+        assert abs(sketch.quantile(q) - exact) <= ACCURACY * abs(exact) + 1e-12, q
+
+
+def test_rank_error_bound():
+    rng = np.random.default_rng(1)
+    values = _values(rng, 20_000)
+    sketch = _sketch(values)
+    gamma = sketch.gamma
+
+    for value in rng.choice(values[values != 0], 500):
+        # Ошибка ранга - только в пределах бакета значения: (x / gamma, x * gamma) по модулю
+        low, high = sorted((value / gamma, value * gamma))
+        assert np.mean(values <= low) <= sketch.rank(value) <= np.mean(values < high), value
+
+    assert np.mean(values < 0) <= sketch.rank(0.0) <= np.mean(values <= 0)
+
+
+def test_merged_deltas_equal_direct_sketch():
+    values = _values(np.random.default_rng(2), 3000)
+    base, added, removed = values[:2000], values[2000:], values[:500]
+
+    merged = _sketch(base)
+    merged.merge(_sketch(added))
+    merged.merge(_sketch(removed), sign=-1)
+    direct = _sketch(np.concatenate([values[500:2000], added]))
+
+    assert (merged.positive, merged.negative, merged.zero_count) == \
+           (direct.positive, direct.negative, direct.zero_count)
+
+
+def test_ingest_appends_deltas_and_merge_folds_them(tmp_path):
+    async def run():
+        engine, sessions = await setup_database(tmp_path / "t.db", 1)
+        try:
+            async with sessions() as db:
+                ids = await bulk_insert_reports(db, 1, [report(profit_loss__net_profit=value)
+                                                        for value in (100, 200, 300, 400)])
+                await db.commit()
+            async with sessions() as db:
+                # Первая загрузка периода не создает строку peer_sketches - только дельты
+                before = await db.scalar(select(func.count()).select_from(PeerSketch))
+                await db.run_sync(update_peer_sketches, removed=[("2024", {"profitability": {"ros": 10.0}})])
+                await db.commit()
+                pending = await peer_percentiles(db, "2024", {"profitability": {"ros": 25.0}})
+
+                assert await merge_peer_sketch_deltas(db) == 1
+                merged = await peer_percentiles(db, "2024", {"profitability": {"ros": 25.0}})
+                left = await db.scalar(select(func.count()).select_from(PeerSketchDelta))
+                # Повторное слияние без новых дельт ничего не меняет
+                assert await merge_peer_sketch_deltas(db) == 0
+        finally:
+            await engine.dispose()
+        return ids, before, pending, merged, left
+
+    ids, before, pending, merged, left = asyncio.run(run())
+    assert len(ids) == 4 and before == 0 and left == 0
+    # ROS 10, 20, 30, 40 %; удален один 10 % -> ниже 25 % один из трех
+    assert pending == merged
+    assert merged["peers"] == 3
+    assert merged["ranks"]["profitability.ros"] == pytest.approx(100 / 3, abs=0.1)
+
+
+def test_merge_starts_early_when_period_has_too_many_deltas(tmp_path, monkeypatch):
+    monkeypatch.setattr(peer_sketch, "PEER_SKETCH_MAX_PENDING_DELTAS", 3)
+    monkeypatch.setattr(peer_sketch, "_pending_deltas", Counter())
+
+    async def run():
+        engine, sessions = await setup_database(tmp_path / "t.db", 1)
+        # Интервал слияния - час: дельты сливаются только по порогу
+        merger = asyncio.create_task(merge_peer_sketches_periodically(3600, sessions))
+        await asyncio.sleep(0)
+        pending = []
+        try:
+            for value in (100, 200, 300):
+                async with sessions() as db:
+                    await bulk_insert_reports(db, 1, [report(profit_loss__net_profit=value)])
+                    await db.commit()
+                await asyncio.sleep(0.05)
+                async with sessions() as db:
+                    pending.append(await db.scalar(select(func.count()).select_from(PeerSketchDelta)))
+            async with sessions() as db:
+                merged = await peer_percentiles(db, "2024", {"profitability": {"ros": 25.0}})
+        finally:
+            merger.cancel()
+            await asyncio.gather(merger, return_exceptions=True)
+            await engine.dispose()
+        return pending, merged
+
+    pending, merged = asyncio.run(run())
+    assert pending == [1, 2, 0]
+    assert merged["peers"] == 3
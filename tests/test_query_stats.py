@@ -0,0 +1,52 @@
+import asyncio
+import logging
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.services.query_stats import QueryStatsMiddleware, instrument_engine, statement_shape
+
+
+def test_statement_shape_ignores_parameters():
+    assert statement_shape("SELECT * FROM t WHERE id IN (?, ?, ?) LIMIT 10") == \
+        statement_shape("SELECT *\n  FROM t WHERE id IN (?) LIMIT 50")
+    assert statement_shape("SELECT * FROM t WHERE a = ?") != statement_shape("SELECT * FROM t WHERE b = ?")
+
+
+def _app(engine) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware, n_plus_one_limit=3)
+
+    @app.get("/loop")
+    async def loop(n: int):
+        async with engine.connect() as conn:
+            for i in range(n):
+                await conn.execute(text("SELECT :i UNION ALL SELECT :i"), {"i": i})
+        return {}
+
+    return app
+
+
+def test_server_timing_and_n_plus_one(caplog):
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        instrument_engine(engine)
+        transport = httpx.ASGITransport(app=_app(engine))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            few = await client.get("/loop", params={"n": 2})
+            many = await client.get("/loop", params={"n": 5})
+        await engine.dispose()
+        return few, many
+
+    with caplog.at_level(logging.WARNING, logger="app.services.query_stats"):
+        few, many = asyncio.run(run())
+
+    assert few.headers["server-timing"].startswith('db;dur=')
+    assert 'desc="2 queries"' in few.headers["server-timing"]
+    assert 'desc="5 queries"' in many.headers["server-timing"]
+
+    warnings = [r.getMessage() for r in caplog.records if "N+1" in r.getMessage()]
+    assert len(warnings) == 1
+    assert "GET /loop ran 5 times" in warnings[0]
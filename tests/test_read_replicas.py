@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.database import RecentWrites, ReplicaPool, RoutingSession
+from app.main import app
+from app.models import Base, ReportAnalysis, User
+from app.services.bulk_import import bulk_insert_reports
+from tests.utils import client, login, report, setup_database, statements
+
+
+def _user(user_id: int, name: str) -> dict:
+    return {"id": user_id, "username": name, "hashed_password": "-", "email": f"{name}@example.com", "role": "accountant"}
+
+
+async def _database(path, name: str):
+    """Файл SQLite с одним пользователем name: по нему видно, из какой БД прочитали"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [_user(1, name)])
+    return engine
+
+
+async def _usernames(db) -> list[str]:
+    return list((await db.execute(select(User.username).order_by(User.id))).scalars())
+
+
+def test_reads_go_to_replica_and_writes_to_primary(tmp_path, monkeypatch):
+    async def run():
+        primary = await _database(tmp_path / "primary.db", "primary")
+        replica = await _database(tmp_path / "replica.db", "replica")
+        writes = RecentWrites(window_seconds=60)
+        monkeypatch.setattr("app.database.recent_writes", writes)
+        sessions = async_sessionmaker(bind=primary, class_=AsyncSession, sync_session_class=RoutingSession,
+                                      expire_on_commit=False)
+
+        async with sessions(info={"writer": "token", "replica": ReplicaPool([replica]).choose()}) as db:
+            before = await _usernames(db)
+            await db.execute(insert(User), [_user(2, "written")])
+            after = await _usernames(db)
+            await db.commit()
+
+        async with primary.connect() as conn:
+            in_primary = list((await conn.execute(select(User.username).order_by(User.id))).scalars())
+
+        await primary.dispose()
+        await replica.dispose()
+        return before, after, in_primary, writes
+
+    before, after, in_primary, writes = asyncio.run(run())
+    assert before == ["replica"]
+    # После записи сессия читает из основной БД и видит свою строку
+    assert after == ["primary", "written"]
+    assert in_primary == ["primary", "written"]
+    assert writes.recent("token") and not writes.recent("other")
+
+
+def test_unreachable_replica_is_ejected(tmp_path):
+    async def run():
+        healthy = await _database(tmp_path / "replica.db", "replica")
+        broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/replica.db")
+        pool = ReplicaPool([broken, healthy], eject_seconds=60)
+
+        assert pool.choose() is broken
+        assert pool.choose() is healthy
+        with pytest.raises(Exception):
+            async with broken.connect() as conn:
+                await conn.execute(select(1))
+        chosen = [pool.choose() for _ in range(3)]
+
+        await healthy.dispose()
+        await broken.dispose()
+        return chosen, healthy
+
+    chosen, healthy = asyncio.run(run())
+    assert chosen == [healthy] * 3
+
+
+def test_missing_analysis_is_computed_without_writes(tmp_path):
+    async def run():
+        engine, sessions = await setup_database(tmp_path / "t.db", 1)
+        login(1)
+        try:
+            async with sessions() as db:
+                [report_id] = await bulk_insert_reports(db, 1, [report()])
+                stored = (await db.execute(select(ReportAnalysis.result))).scalar_one()
+                # Как после смены версии анализатора: сохраненного результата нет
+                await db.execute(delete(ReportAnalysis))
+                await db.commit()
+
+            async with client() as http:
+                response = await http.get(f"/analysis/{report_id}/json")
+            async with sessions() as db:
+                left = (await db.execute(select(ReportAnalysis.report_id))).all()
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+        return stored, response, left
+
+    stored, response, left = asyncio.run(run())
+    assert response.status_code == 200 and response.json() == stored
+    # Отчет с анализом и строки отчета; ни DELETE, ни INSERT, ни COMMIT
+    assert statements(response) == 2
+    assert left == []
@@ -0,0 +1,113 @@
+import asyncio
+import io
+import os
+import zipfile
+
+from sqlalchemy import select
+
+from app.main import app
+from app.models import FinancialReport, ReportAnalysis
+from app.services.excel_parser import shutdown_executor
+from app.services.upload_store import UploadStore
+from tests.utils import client, login, report_data, setup_database, statement_rows, xlsx_bytes
+
+
+def _run(path, requests):
+    """Выполняет requests(http) против базы в path; возвращает (результат requests, отчеты в БД)"""
+    async def run():
+        engine, sessions = await setup_database(path, 1)
+        login(1)
+        try:
+            async with client() as http:
+                result = await requests(http)
+            async with sessions() as db:
+                rows = (await db.execute(
+                    select(FinancialReport.organization_name, FinancialReport.period, FinancialReport.line_items,
+                           ReportAnalysis.analyzer_version)
+                    .outerjoin(ReportAnalysis, ReportAnalysis.report_id == FinancialReport.id)
+                    .order_by(FinancialReport.id)
+                )).all()
+        finally:
+            app.dependency_overrides.clear()
+            shutdown_executor()
+            await engine.dispose()
+        return result, rows
+
+    return asyncio.run(run())
+
+
+def test_import_multi_merges_sheets_by_year(tmp_path):
+    current = report_data(period="2024")
+    # За 2023 нет чистой прибыли - обязательного итога
+    previous = report_data(period="2023", profit_loss__net_profit=None)
+    # Баланс и ОФР - на разных листах, колонки за один год склеиваются
+    raw = xlsx_bytes(statement_rows(current, previous, sections=("assets", "liabilities")),
+                     statement_rows(current, previous, sections=("profit_loss",)))
+
+    async def requests(http):
+        return await http.post("/reports/import_multi", data={"organization_name": "Org"},
+                               files={"file": ("report.xlsx", raw)})
+
+    response, rows = _run(tmp_path / "t.db", requests)
+    assert response.status_code == 201, response.text
+    body = response.json()
+    assert [item["period"] for item in body["created"]] == ["2024"]
+    assert [item["period"] for item in body["skipped"]] == ["2023"]
+    assert "net_profit" in body["skipped"][0]["detail"]
+
+    [(organization, period, line_items, analyzer_version)] = rows
+    assert (organization, period) == ("Org", "2024")
+    assert line_items["2110"] == 1000 and line_items["1250"] == 60
+    assert analyzer_version is not None
+
+
+def test_zip_import_manifest(tmp_path):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("Alpha.xlsx", xlsx_bytes(statement_rows(report_data(period="2024"), report_data(period="2023"))))
+        zf.writestr("readme.txt", "not a statement")
+        zf.writestr("Broken.xlsx", b"PK\x03\x04 not really a workbook")
+        zf.writestr("Empty.xlsx", xlsx_bytes([["Наименование показателя", "Код", "За 2024 г."]]))
+        zf.writestr("__MACOSX/._Alpha.xlsx", b"")
+
+    async def requests(http):
+        return await http.post("/reports/import_zip", files={"file": ("reports.zip", archive.getvalue())})
+
+    response, rows = _run(tmp_path / "t.db", requests)
+    assert response.status_code == 201, response.text
+    body = response.json()
+    files = {entry["file"]: entry for entry in body["files"]}
+
+    assert body["total_files"] == 4 and body["created_reports"] == 2
+    assert files["Alpha.xlsx"]["status"] == "created" and len(files["Alpha.xlsx"]["report_ids"]) == 2
+    assert files["readme.txt"]["status"] == "skipped"
+    assert files["readme.txt"]["detail"] == "Unsupported file type"
+    assert files["Broken.xlsx"]["status"] == "error"
+    assert files["Broken.xlsx"]["detail"].startswith("Error parsing file")
+    assert files["Empty.xlsx"]["status"] == "skipped" and files["Empty.xlsx"]["report_ids"] == []
+
+    # Название организации - из имени файла
+    assert [(row.organization_name, row.period) for row in rows] == [("Alpha", "2024"), ("Alpha", "2023")]
+    assert all(row.analyzer_version is not None for row in rows)
+
+
+def test_upload_store_evicts_least_recently_used(tmp_path):
+    store = UploadStore(tmp_path, max_bytes=2500)
+    digests = []
+    for content in (b"a" * 1000, b"b" * 1000):
+        digest = store._save_sync(io.BytesIO(content))
+        os.utime(store.path_for(digest), (1, 1))  # оба файла "старые"
+        digests.append(digest)
+    assert store.exists(digests[0])             # a запрошен повторно - теперь b самый старый
+    digests.append(store._save_sync(io.BytesIO(b"c" * 1000)))
+
+    assert [store.exists(digest) for digest in digests] == [True, False, True]
+    assert not list((tmp_path / "tmp").iterdir())
+
+
+def test_parse_excel_requires_auth():
+    async def run():
+        async with client() as http:
+            return await http.post("/reports/parse_excel", files={"file": ("r.xlsx", b"")})
+
+    assert asyncio.run(run()).status_code == 401
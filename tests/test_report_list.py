@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, text, update
+
+from app.main import app
+from app.models import FinancialReport
+from app.services.bulk_import import bulk_insert_reports
+from tests.utils import client, login, report, report_data, setup_database
+
+
+def _pages(tmp_path, order: str, limit: int):
+    """Все страницы GET /reports/ по next_cursor: (id по страницам, ответы)"""
+    async def run():
+        engine, sessions = await setup_database(tmp_path / "t.db", 1, 2)
+        try:
+            async with sessions() as db:
+                ids = await bulk_insert_reports(db, 1, [report(period=str(year)) for year in range(2019, 2025)])
+                await bulk_insert_reports(db, 2, [report()])
+                # Все отчеты - в одну секунду (как пишет func.now()), кроме первого - на день раньше
+                await db.execute(update(FinancialReport).values(created_at=func.now()))
+                await db.execute(update(FinancialReport).where(FinancialReport.id == ids[0])
+                                 .values(created_at=text("datetime('now', '-1 day')")))
+                await db.commit()
+
+            login(1)
+            pages, responses, cursor = [], [], None
+            async with client() as http:
+                while True:
+                    params = {"limit": limit, "order": order, **({"cursor": cursor} if cursor else {})}
+                    response = await http.get("/reports/", params=params)
+                    responses.append(response)
+                    assert response.status_code == 200, response.text
+                    body = response.json()
+                    pages.append([item["id"] for item in body["items"]])
+                    cursor = body["next_cursor"]
+                    if cursor is None or len(pages) > 10:
+                        break
+                wrong_order = await http.get("/reports/", params={"cursor": responses[0].json()["next_cursor"],
+                                                                  "order": "asc" if order == "desc" else "desc"})
+                garbage = await http.get("/reports/", params={"cursor": "not-a-cursor"})
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+        return ids, pages, wrong_order, garbage
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("order", ["desc", "asc"])
+def test_pages_through_reports_created_in_the_same_second(tmp_path, order):
+    ids, pages, wrong_order, garbage = _pages(tmp_path, order, limit=2)
+
+    # Новые первыми: равные created_at - по убыванию id, самый старый отчет - последним
+    expected = [*reversed(ids[1:]), ids[0]] if order == "desc" else ids
+    assert pages == [expected[0:2], expected[2:4], expected[4:6]]
+    assert wrong_order.status_code == 400
+    assert garbage.status_code == 400
+
+
+def test_organization_filter_ignores_case_of_cyrillic_names(tmp_path):
+    async def run():
+        engine, sessions = await setup_database(tmp_path / "t.db", 1)
+        login(1)
+        try:
+            async with sessions() as db:
+                bulk_ids = await bulk_insert_reports(db, 1, [report(organization_name="ООО «Ромашка»"),
+                                                             report(organization_name="АО Лютик")])
+                await db.commit()
+            async with client() as http:
+                created = await http.post("/reports/", json=report_data(organization_name="Ромашка-Юг"))
+                found = {}
+                for query in ("ромашка", "РОМАШКА", "лютик", "100%"):
+                    response = await http.get("/reports/", params={"organization": query})
+                    assert response.status_code == 200, response.text
+                    found[query] = sorted(item["id"] for item in response.json()["items"])
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+        return bulk_ids, created.json()["id"], found
+
+    bulk_ids, orm_id, found = asyncio.run(run())
+    assert found["ромашка"] == found["РОМАШКА"] == sorted([bulk_ids[0], orm_id])
+    assert found["лютик"] == [bulk_ids[1]]
+    assert found["100%"] == []
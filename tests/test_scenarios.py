@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from app.main import app
+from app.schemas import ScenarioPerturbation
+from app.services.bulk_import import bulk_insert_reports
+from app.services.line_items import analyzer_inputs, pack_line_items
+from app.services.math_engine import ANALYZER_INPUTS, ScenarioAnalyzer, evaluate_metrics
+from tests.utils import client, login, report, setup_database
+
+
+SCORES = ["bankruptcy_altman.score", "bankruptcy_altman.conclusion",
+          "bankruptcy_taffler.score", "bankruptcy_taffler.conclusion"]
+
+PERTURBATIONS = [
+    ScenarioPerturbation(input="revenue", mean=-0.1, std=0.2),
+    ScenarioPerturbation(input="inventory", distribution="uniform", low=-0.5, high=0.5),
+    ScenarioPerturbation(input="payables", distribution="triangular", low=0.0, mode=0.1, high=0.4),
+]
+
+
+def _inputs(**overrides) -> dict:
+    return analyzer_inputs(pack_line_items(report(**overrides)))
+
+
+def test_same_seed_same_distributions():
+    analyzer = ScenarioAnalyzer(_inputs())
+    first = analyzer.simulate(PERTURBATIONS, 2000, seed=7)
+
+    assert analyzer.simulate(PERTURBATIONS, 2000, seed=7) == first
+    assert analyzer.simulate(PERTURBATIONS, 2000, seed=8) != first
+
+    for model in ("altman", "taffler"):
+        distribution = first[model]
+        assert sum(distribution["histogram_counts"]) == 2000
+        assert sum(distribution["zones"].values()) == pytest.approx(1.0)
+        percentiles = list(distribution["percentiles"].values())
+        assert percentiles == sorted(percentiles)
+
+
+def test_fixed_change_matches_scalar_analysis():
+    inputs = _inputs()
+    # low == high: каждый сценарий - выручка минус 50%, изменение переносится в прибыль
+    change = ScenarioPerturbation(input="revenue", distribution="uniform", low=-0.5, high=-0.5)
+    result = ScenarioAnalyzer(inputs).simulate([change], 100, seed=1)
+
+    base = evaluate_metrics(SCORES, {name: value or 0.0 for name, value in inputs.items()})
+    shifted = dict({name: value or 0.0 for name, value in inputs.items()},
+                   revenue=500.0, sales_profit=-100.0, profit_before_tax=-100.0, net_profit=-180.0)
+    expected = evaluate_metrics(SCORES, shifted)
+
+    for model in ("altman", "taffler"):
+        distribution, group = result[model], f"bankruptcy_{model}"
+        assert distribution["base"] == base[group]["score"]
+        assert distribution["mean"] == round(expected[group]["score"], 3)
+        assert distribution["std"] == 0.0
+        assert distribution["zones"][expected[group]["conclusion"]] == 1.0
+
+
+@pytest.mark.parametrize("cost_of_sales", [-600, 600])
+def test_cost_shock_lowers_profit_whatever_the_stored_sign(cost_of_sales):
+    inputs = _inputs(profit_loss__cost_of_sales=cost_of_sales)
+    # Себестоимость по модулю плюс 20%: прибыль от продаж и ниже - минус 120
+    change = ScenarioPerturbation(input="cost_of_sales", distribution="uniform", low=0.2, high=0.2)
+    result = ScenarioAnalyzer(inputs).simulate([change], 100, seed=1)
+
+    shifted = dict({name: value or 0.0 for name, value in inputs.items()}, cost_of_sales=cost_of_sales * 1.2)
+    for total in ("sales_profit", "profit_before_tax", "net_profit"):
+        shifted[total] -= 120.0
+    expected = evaluate_metrics(SCORES, shifted)
+
+    for model in ("altman", "taffler"):
+        distribution, group = result[model], f"bankruptcy_{model}"
+        assert distribution["mean"] == round(expected[group]["score"], 3)
+        assert distribution["mean"] < distribution["base"]
+
+    sensitivity = ScenarioAnalyzer(inputs).sensitivities(0.15)
+    for rows in sensitivity.values():
+        [row] = [row for row in rows if row["input"] == "cost_of_sales"]
+        assert row["high"] < row["low"]
+
+
+def test_sensitivities_are_sorted_by_range():
+    sensitivity = ScenarioAnalyzer(_inputs()).sensitivities(0.15)
+    for rows in sensitivity.values():
+        assert {row["input"] for row in rows} == set(ANALYZER_INPUTS)
+        ranges = [abs(row["high"] - row["low"]) for row in rows]
+        assert ranges == sorted(ranges, reverse=True)
+
+
+def test_unknown_input_is_rejected():
+    with pytest.raises(ValueError, match="Unknown inputs: goodwill"):
+        ScenarioAnalyzer(_inputs()).simulate([ScenarioPerturbation(input="goodwill")], 100)
+
+
+def test_scenarios_endpoint_is_reproducible(tmp_path):
+    body = {"perturbations": [p.model_dump() for p in PERTURBATIONS], "scenarios": 1000, "seed": 42}
+
+    async def run():
+        engine, sessions = await setup_database(tmp_path / "t.db", 1, 2)
+        try:
+            async with sessions() as db:
+                [report_id] = await bulk_insert_reports(db, 1, [report()])
+                await db.commit()
+            async with client() as http:
+                login(1)
+                first = await http.post(f"/analysis/{report_id}/scenarios", json=body)
+                second = await http.post(f"/analysis/{report_id}/scenarios", json=body)
+                unknown = await http.post(f"/analysis/{report_id}/scenarios",
+                                          json={"perturbations": [{"input": "goodwill"}], "scenarios": 100})
+                login(2)
+                foreign = await http.post(f"/analysis/{report_id}/scenarios", json=body)
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+        return report_id, first, second, unknown, foreign
+
+    report_id, first, second, unknown, foreign = asyncio.run(run())
+    assert first.status_code == 200, first.text
+    assert first.json() == second.json()
+    assert first.json() == {
+        "report_id": report_id,
+        "scenarios": 1000,
+        "sensitivity_shock": 0.15,
+        **ScenarioAnalyzer(_inputs()).simulate(PERTURBATIONS, 1000, seed=42),
+        **{f"{model}_sensitivity": rows for model, rows in ScenarioAnalyzer(_inputs()).sensitivities(0.15).items()},
+    }
+    assert unknown.status_code == 400
+    assert foreign.status_code == 403
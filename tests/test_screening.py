@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import sqlite
+
+from app.main import app
+from app.models import ReportAnalysis
+from app.services.analysis_store import METRIC_COLUMNS
+from app.services.bulk_import import bulk_insert_reports
+from app.services.scoring_models import SCORING_MODELS
+from app.services.screening import ScreenExpressionError, MAX_EXPRESSION_TOKENS, parse_screen_expression
+from tests.utils import client, login, report, setup_database
+
+
+def _sql(expression: str) -> str:
+    condition, _ = parse_screen_expression(expression)
+    return str(condition.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_every_scoring_model_is_screenable():
+    for model in SCORING_MODELS:
+        assert f"bankruptcy_{model.name}.score" in METRIC_COLUMNS
+
+
+def test_and_binds_tighter_than_or():
+    condition, fields = parse_screen_expression(
+        "bankruptcy_altman.score < 1.23 and liquidity.current_ratio < 1 or bankruptcy_springate.score < 0.862")
+    assert fields == ["bankruptcy_altman.score", "liquidity.current_ratio", "bankruptcy_springate.score"]
+    assert str(condition.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True})) == (
+        "report_analysis.altman_score < 1.23 AND report_analysis.current_ratio < 1.0"
+        " OR report_analysis.springate_score < 0.862"
+    )
+
+
+def test_parentheses_and_not():
+    assert _sql("not (profitability.roe > 0 or profitability.ros > 0) and bankruptcy_zaitseva.score >= 1") == (
+        "NOT (report_analysis.roe > 0.0 OR report_analysis.ros > 0.0) AND report_analysis.zaitseva_score >= 1.0"
+    )
+
+
+def test_number_on_the_left_is_mirrored():
+    assert _sql("1 > bankruptcy_saifullin.score") == "report_analysis.saifullin_score < 1.0"
+    assert _sql("-2.5e1 <= activity.inventory_days") == "report_analysis.inventory_days >= -25.0"
+
+
+def test_numbers_are_bound_parameters():
+    condition, _ = parse_screen_expression("liquidity.quick_ratio != 0.5")
+    compiled = condition.compile(dialect=sqlite.dialect())
+    assert str(compiled) == "report_analysis.quick_ratio != ?"
+    assert list(compiled.params.values()) == [0.5]
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("", "Empty expression"),
+    ("liquidity.unknown < 1", "Unknown field 'liquidity.unknown'"),
+    ("liquidity.current_ratio <", "Expected number, found 'end of expression'"),
+    ("(liquidity.current_ratio < 1", "Expected ), found 'end of expression'"),
+    ("liquidity.current_ratio < 1 1", "Unexpected '1'"),
+    ("liquidity.current_ratio < 1; drop table users", "Unexpected character at position 27"),
+    (" or ".join(["profitability.roa > 0"] * MAX_EXPRESSION_TOKENS), "Expression is too long"),
+])
+def test_invalid_expressions(expression, message):
+    with pytest.raises(ScreenExpressionError, match=message.replace("(", r"\(").replace(")", r"\)")):
+        parse_screen_expression(expression)
+
+
+def test_screen_endpoint_by_new_model_score(tmp_path):
+    async def run():
+        engine, sessions = await setup_database(tmp_path / "t.db", 1, 2)
+        try:
+            async with sessions() as db:
+                ids = await bulk_insert_reports(db, 1, [
+                    report(period="2022"),
+                    report(period="2023", profit_loss__net_profit=-500, profit_loss__profit_before_tax=-500),
+                    report(period="2024"),
+                ])
+                await bulk_insert_reports(db, 2, [report(period="2024", profit_loss__net_profit=-500)])
+                await db.commit()
+                scores = dict((await db.execute(
+                    select(ReportAnalysis.report_id, ReportAnalysis.springate_score)
+                )).all())
+
+            login(1)
+            async with client() as http:
+                threshold = (scores[ids[0]] + scores[ids[1]]) / 2
+                first = await http.post("/analysis/screen", json={
+                    "filter": f"bankruptcy_springate.score < {threshold}", "fields": ["bankruptcy_zaitseva.score"],
+                    "limit": 1,
+                })
+                invalid = await http.post("/analysis/screen", json={"filter": "bankruptcy_unknown.score < 1"})
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+        return ids, scores, first, invalid
+
+    ids, scores, first, invalid = asyncio.run(run())
+    assert scores[ids[1]] < scores[ids[0]] == scores[ids[2]]
+
+    assert first.status_code == 200, first.text
+    body = first.json()
+    # Отчет пользователя 2 с тем же убытком не виден пользователю 1
+    assert [item["report_id"] for item in body["items"]] == [ids[1]]
+    assert body["next_after_id"] is None
+    assert set(body["items"][0]["metrics"]) == {"bankruptcy_springate.score", "bankruptcy_zaitseva.score"}
+    assert body["items"][0]["metrics"]["bankruptcy_springate.score"] == scores[ids[1]]
+
+    assert invalid.status_code == 400
@@ -0,0 +1,57 @@
+import pytest
+
+from app.services.statement_formats import detect_format, parse_statement
+from tests.utils import REPORT, statement_rows, xlsx_bytes
+
+
+def test_detect_format():
+    assert detect_format(xlsx_bytes(statement_rows(REPORT))).name == "xlsx"
+    assert detect_format(b"\xef\xbb\xbf\n<?xml version='1.0'?>").name == "fns_xml"
+    assert detect_format("Код;Сумма\n1110;1\n".encode("cp1251")).name == "csv"
+    with pytest.raises(ValueError):
+        detect_format(b"\x00\x01binary")
+
+
+def test_parse_csv_cp1251_with_decimal_comma(tmp_path):
+    lines = [
+        "Наименование показателя;Код;За 2024 г.;За 2023 г.",
+        "Запасы;1210;\"1 234,5\";1000",
+        "Денежные средства;1250;-;50",          # прочерк - берется следующее число
+        "Себестоимость продаж;2120;(600);(500)",
+        "Выручка;2110;1000;900",
+    ]
+    path = tmp_path / "report"
+    path.write_bytes("\r\n".join(lines).encode("cp1251"))
+
+    assert parse_statement(path) == {"inventory": 1234.5, "cash_and_equivalents": 50.0,
+                                     "cost_of_sales": -600.0, "revenue": 1000.0}
+
+
+def test_parse_fns_xml():
+    xml = """<?xml version="1.0" encoding="windows-1251"?>
+<Файл><Документ>
+  <Баланс>
+    <Актив СумОтч="200">
+      <ОбА СумОтч="100">
+        <Запасы СумОтч="40" СумПрдщ="30"/>
+        <ФинВлож СумОтч="5"/>
+        <ДенежнСр СумОтч="55"/>
+      </ОбА>
+    </Актив>
+    <Пассив СумОтч="200">
+      <КраткосрОбяз СумОтч="100"><ФинВлож СумОтч="7"/><ЗаемСредств СумОтч="20"/></КраткосрОбяз>
+    </Пассив>
+  </Баланс>
+  <ФинРез><Выруч СумОтч="1000"/><СебестПрод СумОтч="(600)"/><Строка Код="2400" СумОтч="320"/></ФинРез>
+</Документ></Файл>""".encode("cp1251")
+
+    data = parse_statement(xml)
+    # ФинВлож под ОбА - строка 1240; под КраткосрОбяз такого элемента нет.
+    # Итога актива (1600) нет среди полей отчета
+    assert data == {
+        "total_current_assets": 100.0, "inventory": 40.0,
+        "financial_investments_sec_section": 5.0, "cash_and_equivalents": 55.0,
+        "total_balance_liabilities": 200.0, "total_short_term_liabilities": 100.0,
+        "short_term_borrowings": 20.0,
+        "revenue": 1000.0, "cost_of_sales": -600.0, "net_profit": 320.0,
+    }
@@ -0,0 +1,123 @@
+import asyncio
+
+import httpx
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.api.auth import bcrypt_context, get_current_user
+from app.database import get_db, make_engine
+from app.main import app
+from app.models import (Base, FinancialReport, PeerSketch, PeerSketchDelta, ReportAnalysis, ReportAssets,
+                        ReportLiabilities, ReportProfitLoss, User)
+from app.schemas import TokenData
+from app.services.bulk_import import bulk_insert_reports
+from app.services.peer_sketch import merge_peer_sketch_deltas
+from tests.utils import report, statements, user_row
+
+
+async def _setup(path, reports_per_user: int):
+    engine = make_engine(f"sqlite+aiosqlite:///{path}")
+    sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        password_hash = bcrypt_context.hash("secret")
+        await conn.execute(insert(User), [user_row(1, password_hash), user_row(2, password_hash)])
+    async with sessions() as db:
+        for user_id in (1, 2):
+            await bulk_insert_reports(db, user_id, [report()] * reports_per_user)
+        await db.commit()
+
+    async def override_get_db():
+        async with sessions() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    return engine, sessions
+
+
+async def _count(sessions, model, *criteria) -> int:
+    async with sessions() as db:
+        return (await db.execute(select(func.count()).select_from(model).where(*criteria))).scalar_one()
+
+
+async def _ids(sessions, user_id: int) -> list[int]:
+    async with sessions() as db:
+        return list((await db.execute(select(FinancialReport.id).where(FinancialReport.user_id == user_id))).scalars())
+
+
+def test_write_endpoints_statement_count(tmp_path):
+    async def run():
+        engine, sessions = await _setup(tmp_path / "t.db", reports_per_user=3)
+        current = {"user": TokenData(username="user1", id=1, role="accountant")}
+        app.dependency_overrides[get_current_user] = lambda: current["user"]
+        counts = {}
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.put("/users/me", json={"first_name": "Ivan", "last_name": "Petrov"})
+                assert response.status_code == 200 and response.json()["first_name"] == "Ivan"
+                counts["profile"] = statements(response)
+
+                response = await client.put("/users/me", json={"first_name": None, "last_name": None,
+                                                               "email": "user2@example.com"})
+                assert response.status_code == 400
+
+                response = await client.put("/users/password", json={"old_password": "secret",
+                                                                      "new_password": "secret2"})
+                assert response.status_code == 200
+                counts["password"] = statements(response)
+
+                report_id = (await _ids(sessions, 1))[0]
+                response = await client.delete(f"/reports/{(await _ids(sessions, 2))[0]}")
+                assert response.status_code == 403
+                response = await client.delete(f"/reports/{report_id}")
+                assert response.status_code == 204
+                counts["delete_report"] = statements(response)
+                assert await _count(sessions, ReportAssets, ReportAssets.report_id == report_id) == 0
+
+                current["user"] = TokenData(username="admin", id=99, role="admin")
+                response = await client.put("/users/2/role", json={"role": "analyst"})
+                assert response.status_code == 200 and response.json()["role"] == "analyst"
+                counts["role"] = statements(response)
+
+                response = await client.delete("/users/1")
+                assert response.status_code == 204
+                counts["delete_user"] = statements(response)
+            remaining = [await _count(sessions, model) for model in
+                         (FinancialReport, ReportAssets, ReportLiabilities, ReportProfitLoss, ReportAnalysis)]
+            async with sessions() as db:
+                await merge_peer_sketch_deltas(db)
+                peers = (await db.execute(select(PeerSketch.report_count))).scalar_one()
+            remaining.append(await _count(sessions, PeerSketchDelta))
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+        return counts, remaining, peers
+
+    counts, remaining, peers = asyncio.run(run())
+    # UPDATE ... RETURNING; чтение хеша и UPDATE; SELECT анализа для скетчей, INSERT дельты скетча, DELETE
+    assert counts == {"profile": 1, "password": 2, "role": 1, "delete_report": 3, "delete_user": 3}
+    # Остались только отчеты второго пользователя, скетч сравнения после слияния дельт их и учитывает
+    assert remaining == [3] * 5 + [0]
+    assert peers == 3
+
+
+def test_delete_user_is_one_cascading_delete(tmp_path):
+    async def run():
+        engine, sessions = await _setup(tmp_path / "t.db", reports_per_user=500)
+        app.dependency_overrides[get_current_user] = lambda: TokenData(username="user1", id=1, role="accountant")
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.delete("/users/1")
+            left = await _count(sessions, FinancialReport, FinancialReport.user_id == 1)
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+        return response, left
+
+    response, left = asyncio.run(run())
+    assert response.status_code == 204
+    # Число запросов не зависит от числа отчетов
+    assert statements(response) == 3
+    assert left == 0
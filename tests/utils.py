@@ -0,0 +1,118 @@
+"""
+
+Общие данные и помощники тестов
+
+"""
+import copy
+import io
+import re
+
+import httpx
+import openpyxl
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.api.auth import get_current_user
+from app.database import get_db, get_read_db, make_engine
+from app.main import app
+from app.models import Base, User
+from app.schemas import FinancialReportCreate, TokenData
+from app.services.excel_parser import CODE_MAP
+
+
+# Сходящийся отчет: итоги разделов равны сумме строк, актив равен пассиву
+REPORT = {
+    "organization_name": "Test",
+    "period": "2024",
+    "assets": {"fixed_assets": 100, "total_non_current_assets": 100,
+               "inventory": 40, "cash_and_equivalents": 60, "total_current_assets": 100},
+    "liabilities": {"authorized_capital": 10, "retained_earnings": 90, "total_capital": 100,
+                    "total_long_term_liabilities": 0, "accounts_payable": 100,
+                    "total_short_term_liabilities": 100, "total_balance_liabilities": 200},
+    "profit_loss": {"revenue": 1000, "cost_of_sales": -600, "gross_profit": 400,
+                    "sales_profit": 400, "profit_before_tax": 400, "net_profit": 320},
+}
+
+
+def report_data(**overrides) -> dict:
+    """REPORT с заменой полей: report_data(period="2023", assets__inventory=50)"""
+    data = copy.deepcopy(REPORT)
+    for key, value in overrides.items():
+        if "__" in key:
+            section, field = key.split("__")
+            data[section][field] = value
+        else:
+            data[key] = value
+    return data
+
+
+def report(**overrides) -> FinancialReportCreate:
+    return FinancialReportCreate(**report_data(**overrides))
+
+
+def user_row(user_id: int, password_hash: str = "-") -> dict:
+    """Строка users для insert(User)"""
+    return {"id": user_id, "username": f"user{user_id}", "hashed_password": password_hash,
+            "email": f"user{user_id}@example.com", "role": "accountant"}
+
+
+def statements(response: httpx.Response) -> int:
+    """Число SQL-запросов за HTTP-запрос - из Server-Timing (QueryStatsMiddleware)"""
+    return int(re.search(r'desc="(\d+) queries', response.headers["server-timing"]).group(1))
+
+
+def statement_rows(*reports: dict, sections=("assets", "liabilities", "profit_loss")) -> list[list]:
+    """
+    Лист формы РСБУ для отчетов в виде REPORT: заголовок с колонкой "Код"
+    и по колонке значений на отчет (в порядке аргументов), строки - по кодам CODE_MAP
+    из разделов sections
+    """
+    rows = [["Бухгалтерская отчетность"],
+            ["Наименование показателя", "Код", *[f"За {data['period']} г." for data in reports]]]
+    for code, field in CODE_MAP.items():
+        values = [next((data[s][field] for s in sections if field in data[s]), None) for data in reports]
+        if any(value is not None for value in values):
+            rows.append([field, code, *values])
+    return rows
+
+
+def xlsx_bytes(*sheets: list[list]) -> bytes:
+    """Книга xlsx: по листу на каждый список строк"""
+    wb = openpyxl.Workbook()
+    for i, rows in enumerate(sheets):
+        sheet = wb.active if i == 0 else wb.create_sheet()
+        for row in rows:
+            sheet.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+async def setup_database(path, *user_ids: int):
+    """
+    Файл SQLite со схемой и пользователями user_ids; get_db и get_read_db приложения
+    подменяются на сессии этой базы. Возвращает (engine, sessionmaker)
+    """
+    engine = make_engine(f"sqlite+aiosqlite:///{path}")
+    sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if user_ids:
+            await conn.execute(insert(User), [user_row(user_id) for user_id in user_ids])
+
+    async def override_get_db():
+        async with sessions() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    return engine, sessions
+
+
+def login(user_id: int, role: str = "accountant"):
+    """Запросы к app идут от имени пользователя user_id"""
+    app.dependency_overrides[get_current_user] = lambda: TokenData(username=f"user{user_id}", id=user_id, role=role)
+
+
+def client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")